@@ -1,11 +1,19 @@
+import logging
+import os
+
 from flask import Flask
 from flask_cors import CORS
 from app.routes import setup_routes
 from app.db import init_db
 
 def create_app():
+    # Module loggers (logging.getLogger(__name__)) report through the root logger
+    logging.basicConfig(
+        level=os.environ.get("LOG_LEVEL", "INFO"),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
     app = Flask(__name__)
-    CORS(app)
+    CORS(app, expose_headers=["X-Next-Cursor"])
     init_db()
     setup_routes(app)
     return app
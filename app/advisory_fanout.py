@@ -0,0 +1,90 @@
+import os
+import uuid
+from string import Formatter
+
+# Advisories per multi-row INSERT; keeps each statement well under max_allowed_packet
+ADVISORY_INSERT_BATCH_SIZE = int(os.environ.get("ADVISORY_INSERT_BATCH_SIZE", 500))
+
+BULK_ADVISORY_TEMPLATE = """**Cybersecurity Advisory: {update_type} for {tech_stack_name}**
+
+**Client:** {client_name}
+**Date:** {date}
+
+**1. Overview**
+This advisory provides critical information regarding a recent {update_type} for your {tech_stack_name} environment (Version Pattern: {version}).
+
+**2. Description**
+{description}
+
+**3. Potential Impact**
+{impact}
+
+**4. Recommended Actions**
+{recommended_actions}
+
+---
+*This is a manually dispatched advisory from the SOC Advisory System.*
+"""
+
+ADVISORY_COLUMNS = (
+    'client_id', 'client_name', 'service_or_os', 'update_type', 'description',
+    'impact', 'recommended_actions', 'advisory_content', 'status', 'dispatch_batch'
+)
+
+
+class AdvisoryTemplate:
+    """A ``str.format``-style template with the fields shared by every client filled in up front.
+
+    What's left is a list of (literal, field) pieces, so rendering one client's
+    advisory is a join over a handful of strings. Shared values are substituted
+    after parsing, so braces inside them (e.g. in a pasted description) are
+    kept as-is.
+    """
+
+    def __init__(self, template, **shared):
+        self._parts = []
+        literal = ''
+        for text, field, _, _ in Formatter().parse(template):
+            literal += text
+            if field is None:
+                continue
+            if field in shared:
+                literal += str(shared[field])
+            else:
+                self._parts.append((literal, field))
+                literal = ''
+        self._tail = literal
+
+    def render(self, values):
+        return ''.join(literal + str(values[field]) for literal, field in self._parts) + self._tail
+
+
+def fan_out_advisories(cursor, clients, template, fields, status='Sent'):
+    """Insert one advisory per client in multi-row batches; returns ``{client_id: advisory_id}``.
+
+    ``clients`` rows need client_id, client_name and tech_stack_name, which
+    are also the per-client template fields. ``fields`` holds update_type,
+    description, impact and recommended_actions. Every row of the call is
+    tagged with one dispatch_batch value and the ids are read back through
+    its index, so they don't depend on auto-increment values being
+    consecutive. The caller owns the transaction.
+    """
+    dispatch_batch = uuid.uuid4().hex
+    row_placeholders = '(' + ', '.join(['%s'] * len(ADVISORY_COLUMNS)) + ', NOW())'
+    for start in range(0, len(clients), ADVISORY_INSERT_BATCH_SIZE):
+        batch = clients[start:start + ADVISORY_INSERT_BATCH_SIZE]
+        params = []
+        for client in batch:
+            params.extend((
+                client['client_id'], client['client_name'], client['tech_stack_name'],
+                fields['update_type'], fields['description'], fields['impact'],
+                fields['recommended_actions'], template.render(client), status, dispatch_batch
+            ))
+        cursor.execute(
+            f"INSERT INTO advisories ({', '.join(ADVISORY_COLUMNS)}, timestamp) "
+            f"VALUES {', '.join([row_placeholders] * len(batch))}",
+            params
+        )
+
+    cursor.execute("SELECT id, client_id FROM advisories WHERE dispatch_batch = %s", (dispatch_batch,))
+    return {row['client_id']: row['id'] for row in cursor.fetchall()}
@@ -0,0 +1,91 @@
+import base64
+from datetime import datetime
+
+from app.drafts import RENDER_COLUMNS, render_advisories
+
+ADVISORY_PAGE_SIZE = 50
+ADVISORY_MAX_PAGE_SIZE = 500
+
+# What the advisory lists show; the text columns are fetched per advisory on demand
+SUMMARY_COLUMNS = "id, client_id, client_name, service_or_os, update_type, status, timestamp"
+CONTENT_COLUMNS = f"description, impact, recommended_actions, advisory_content, {RENDER_COLUMNS}"
+
+# Filter parameter -> column; each has a (column, timestamp, id) index so a filtered page is one range scan
+FILTERS = {
+    "client_id": "client_id",
+    "status": "status",
+    "service_or_os": "service_or_os",
+}
+
+
+class AdvisoryCursorError(ValueError):
+    """A pagination cursor that wasn't issued by ``encode_cursor``."""
+
+
+def encode_cursor(row):
+    """Opaque cursor continuing after ``row`` in (timestamp DESC, id DESC) order."""
+    timestamp = row['timestamp'].isoformat() if row['timestamp'] is not None else ''
+    return base64.urlsafe_b64encode(f"{timestamp}|{row['id']}".encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, advisory_id = raw.rsplit('|', 1)
+        return (datetime.fromisoformat(timestamp) if timestamp else None), int(advisory_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise AdvisoryCursorError(f"Invalid cursor: {cursor}") from e
+
+
+def list_advisories(conn, filters=None, after=None, limit=ADVISORY_PAGE_SIZE, include_content=False):
+    """One page of advisories, newest first; returns ``(rows, next_cursor)``.
+
+    Keyset pagination on (timestamp, id): ``after`` is a cursor from a
+    previous page, and each page is an index range scan of ``limit + 1``
+    rows however much history precedes it. ``filters`` maps FILTERS keys to
+    values. Rows carry SUMMARY_COLUMNS unless ``include_content``, which
+    adds the text columns with drafts rendered (see app/drafts.py).
+    """
+    columns = f"{SUMMARY_COLUMNS}, {CONTENT_COLUMNS}" if include_content else SUMMARY_COLUMNS
+    conditions = []
+    params = []
+    for name, value in (filters or {}).items():
+        conditions.append(f"{FILTERS[name]} = %s")
+        params.append(value)
+    if after is not None:
+        timestamp, advisory_id = decode_cursor(after)
+        if timestamp is None:
+            # Rows without a timestamp sort last (NULLs are smallest in MySQL)
+            conditions.append("timestamp IS NULL AND id < %s")
+            params.append(advisory_id)
+        else:
+            conditions.append("(timestamp < %s OR (timestamp = %s AND id < %s) OR timestamp IS NULL)")
+            params.extend([timestamp, timestamp, advisory_id])
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(
+        f"SELECT {columns} FROM advisories {where} ORDER BY timestamp DESC, id DESC LIMIT %s",
+        (*params, limit + 1)
+    )
+    rows = cursor.fetchall()
+    cursor.close()
+
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    rows = rows[:limit]
+    if include_content:
+        rows = render_advisories(conn, rows)
+    return rows, next_cursor
+
+
+def get_advisory(conn, advisory_id):
+    """One advisory with its full (rendered) content, or None."""
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(
+        f"SELECT {SUMMARY_COLUMNS}, {CONTENT_COLUMNS} FROM advisories WHERE id = %s", (advisory_id,)
+    )
+    row = cursor.fetchone()
+    cursor.close()
+    if row is None:
+        return None
+    return render_advisories(conn, [row])[0]
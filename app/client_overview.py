@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+
+from app.advisory_query import list_advisories
+from app.loaders import attach_related
+
+# Seconds a cached overview is served before being rebuilt, bounding staleness from writes in other processes
+CLIENT_OVERVIEW_TTL = float(os.environ.get("CLIENT_OVERVIEW_TTL", 60))
+CLIENT_OVERVIEW_MAX_ENTRIES = int(os.environ.get("CLIENT_OVERVIEW_MAX_ENTRIES", 1000))
+
+# Section name -> per-client query, each an indexed lookup on the client id
+SECTIONS = {
+    "assets": "SELECT * FROM client_assets WHERE client_id = %s",
+    "escalation_matrix": "SELECT * FROM escalation_matrix WHERE client_id = %s",
+    "sla": "SELECT * FROM sla_policies WHERE client_id = %s",
+    "passwords": (
+        "SELECT ap.id, ca.asset_name, ca.mode, ap.username, ap.password "
+        "FROM asset_passwords ap JOIN client_assets ca ON ap.asset_id = ca.id "
+        "WHERE ca.client_id = %s"
+    ),
+    "tech": (
+        "SELECT ctm.id, ts.name as tech_stack_name, ctm.version "
+        "FROM client_tech_map ctm JOIN tech_stacks ts ON ctm.tech_stack_id = ts.id "
+        "WHERE ctm.client_id = %s"
+    ),
+}
+
+
+def load_client_overview(conn, client_id, pdf_dir):
+    """Everything the client detail page shows, read over one connection; None if the client doesn't exist.
+
+    The sections are independent per-client lookups, but a MySQL connection
+    runs one statement at a time, so they go back to back on the same
+    connection rather than each request checking out its own.
+    """
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT * FROM clients WHERE id = %s", (client_id,))
+        client = cursor.fetchone()
+        if client is None:
+            return None
+        overview = {"client": client}
+        for name, query in SECTIONS.items():
+            cursor.execute(query, (client_id,))
+            overview[name] = cursor.fetchall()
+        attach_related(
+            cursor, overview["tech"], 'contacts',
+            "SELECT id, client_tech_map_id, email FROM client_tech_contacts "
+            "WHERE client_tech_map_id IN ({keys}) ORDER BY id",
+            'client_tech_map_id'
+        )
+    finally:
+        cursor.close()
+    # Summaries of the newest advisories only; the rest page through /api/clients/<id>/advisories
+    overview["advisories"], overview["advisories_next_cursor"] = list_advisories(conn, {"client_id": client_id})
+
+    filename = f"client_{client_id}.pdf"
+    overview["pdf"] = {"fileName": filename if os.path.exists(os.path.join(pdf_dir, filename)) else None}
+    return overview
+
+
+class ClientOverviewCache:
+    """Serialized overview responses per client, with their ETags.
+
+    Write endpoints call ``invalidate(client_id)`` (or ``invalidate()`` when
+    the client isn't known, which drops everything). Each entry remembers
+    the invalidation generation it was read under, so a response built
+    while a write was landing is never cached.
+    """
+
+    def __init__(self, ttl=CLIENT_OVERVIEW_TTL, max_entries=CLIENT_OVERVIEW_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._generations = {}
+        self._global_generation = 0
+
+    def generation(self, client_id):
+        with self._lock:
+            return self._global_generation, self._generations.get(client_id, 0)
+
+    def get(self, client_id):
+        """``(etag, body)`` if a fresh entry is cached, else None."""
+        with self._lock:
+            entry = self._entries.get(client_id)
+            if entry is None:
+                return None
+            generation, stored_at, etag, body = entry
+            if (generation != (self._global_generation, self._generations.get(client_id, 0))
+                    or time.monotonic() - stored_at > self.ttl):
+                del self._entries[client_id]
+                return None
+            return etag, body
+
+    def put(self, client_id, generation, etag, body):
+        with self._lock:
+            if generation != (self._global_generation, self._generations.get(client_id, 0)):
+                return
+            if client_id not in self._entries and len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[client_id] = (generation, time.monotonic(), etag, body)
+
+    def invalidate(self, client_id=None):
+        with self._lock:
+            if client_id is None:
+                self._global_generation += 1
+                self._entries.clear()
+                return
+            try:
+                client_id = int(client_id)
+            except (TypeError, ValueError):
+                return
+            self._generations[client_id] = self._generations.get(client_id, 0) + 1
+            self._entries.pop(client_id, None)
+
+    def invalidate_many(self, client_ids):
+        for client_id in set(client_ids):
+            self.invalidate(client_id)
+
+
+client_overview_cache = ClientOverviewCache()
@@ -1,16 +1,345 @@
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
 import mysql.connector
-from app.db_config import db_config
+from app.db_config import db_config, pool_config
+
+logger = logging.getLogger(__name__)
+
+
+class PoolExhaustedError(Exception):
+    """Raised when no pooled connection frees up within the checkout timeout."""
+
+
+class ConnectionPool:
+    """Thread-safe MySQL connection pool with health-check-on-borrow.
+
+    Connections are opened lazily up to ``pool_size``. Borrowers wait up to
+    ``checkout_timeout`` seconds for a free connection; connections that have
+    been idle longer than ``health_check_interval`` are pinged (and reconnected
+    if needed) before being handed out.
+    """
+
+    def __init__(self, config, pool_size=10, checkout_timeout=5.0, health_check_interval=30.0):
+        self.config = dict(config, consume_results=True)
+        self.pool_size = pool_size
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._metrics = {
+            "checkouts": 0,
+            "exhausted": 0,
+            "connections_opened": 0,
+            "connections_discarded": 0,
+            "health_check_failures": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+
+    def _open(self):
+        conn = mysql.connector.connect(**self.config)
+        with self._lock:
+            self._metrics["connections_opened"] += 1
+        return conn
+
+    def discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._created -= 1
+            self._metrics["connections_discarded"] += 1
+
+    def _health_check(self, conn, idle_since):
+        if time.monotonic() - idle_since < self.health_check_interval:
+            return conn
+        try:
+            conn.ping(reconnect=True, attempts=1, delay=0)
+            return conn
+        except mysql.connector.Error:
+            with self._lock:
+                self._metrics["health_check_failures"] += 1
+            self.discard(conn)
+            return None
+
+    def acquire(self):
+        started = time.monotonic()
+        deadline = started + self.checkout_timeout
+        while True:
+            conn = None
+            try:
+                conn, idle_since = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_open = self._created < self.pool_size
+                    if can_open:
+                        self._created += 1
+                if can_open:
+                    try:
+                        conn = self._open()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                    idle_since = time.monotonic()
+                else:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        if remaining <= 0:
+                            raise queue.Empty
+                        conn, idle_since = self._idle.get(timeout=remaining)
+                    except queue.Empty:
+                        with self._lock:
+                            self._metrics["exhausted"] += 1
+                        raise PoolExhaustedError(
+                            f"No database connection available within {self.checkout_timeout}s "
+                            f"(pool size {self.pool_size})"
+                        )
+
+            conn = self._health_check(conn, idle_since)
+            if conn is None:
+                continue
+
+            waited = time.monotonic() - started
+            with self._lock:
+                self._metrics["checkouts"] += 1
+                self._metrics["total_wait_seconds"] += waited
+                self._metrics["max_wait_seconds"] = max(self._metrics["max_wait_seconds"], waited)
+            return conn
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            self.discard(conn)
+            return
+        self._idle.put((conn, time.monotonic()))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._metrics)
+            created = self._created
+        idle = self._idle.qsize()
+        stats.update({
+            "pool_size": self.pool_size,
+            "open_connections": created,
+            "idle_connections": idle,
+            "in_use_connections": created - idle,
+            "avg_wait_seconds": stats["total_wait_seconds"] / stats["checkouts"] if stats["checkouts"] else 0.0,
+        })
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(db_config, **pool_config)
+    return _pool
+
+
+@contextmanager
+def db_connection():
+    """Borrow a pooled connection; it is always returned to the pool on exit.
+
+    Any transaction left open by the caller is rolled back on release.
+    """
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    except (mysql.connector.errors.InterfaceError, mysql.connector.errors.OperationalError):
+        # The connection itself is suspect; drop it rather than hand it out again.
+        pool.discard(conn)
+        conn = None
+        raise
+    finally:
+        if conn is not None:
+            pool.release(conn)
+
+
+# MySQL error numbers for schema changes that are already in place
+ER_DUP_FIELDNAME = 1060
+ER_DUP_KEYNAME = 1061
+
+
+def add_column_if_missing(cursor, table, column_definition):
+    """ALTER TABLE ... ADD COLUMN, tolerating a column that already exists."""
+    try:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column_definition}")
+    except mysql.connector.Error as e:
+        if e.errno != ER_DUP_FIELDNAME:
+            raise
+
+
+def add_index_if_missing(cursor, table, index_definition):
+    """ALTER TABLE ... ADD <index>, tolerating an index name that already exists.
+
+    Other failures (e.g. duplicate values blocking a UNIQUE index) are logged
+    rather than raised so one legacy table can't stop the app from starting.
+    """
+    try:
+        cursor.execute(f"ALTER TABLE {table} ADD {index_definition}")
+        return True
+    except mysql.connector.Error as e:
+        if e.errno == ER_DUP_KEYNAME:
+            return True
+        logger.warning("Could not add index to %s (%s): %s", table, index_definition, e)
+        return False
 
-def get_db_connection():
-    return mysql.connector.connect(**db_config)
 
 def init_db():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""CREATE TABLE IF NOT EXISTS users (
-    id INT AUTO_INCREMENT PRIMARY KEY,
-    username VARCHAR(50) NOT NULL UNIQUE,
-    password VARCHAR(255) NOT NULL,
-    role VARCHAR(50) NOT NULL DEFAULT 'analyst')""")
-    conn.commit()
-    conn.close()
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""CREATE TABLE IF NOT EXISTS users (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        username VARCHAR(50) NOT NULL UNIQUE,
+        password VARCHAR(255) NOT NULL,
+        role VARCHAR(50) NOT NULL DEFAULT 'analyst')""")
+        # Feed entries stored by the background poller, one row per tech stack they were found for
+        cursor.execute("""CREATE TABLE IF NOT EXISTS feed_items (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        tech_stack_id INT NOT NULL,
+        feed_url VARCHAR(1024) NOT NULL,
+        item_guid VARCHAR(512) NOT NULL,
+        title TEXT,
+        link TEXT,
+        summary MEDIUMTEXT,
+        matched_rules VARCHAR(1024),
+        cve_ids VARCHAR(1024),
+        cvss_score DECIMAL(3,1),
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE KEY uq_feed_items_tech_guid (tech_stack_id, item_guid))""")
+        add_column_if_missing(cursor, "feed_items", "matched_rules VARCHAR(1024)")
+        add_column_if_missing(cursor, "feed_items", "cve_ids VARCHAR(1024)")
+        add_column_if_missing(cursor, "feed_items", "cvss_score DECIMAL(3,1)")
+        # Findings merged across feeds, keyed by CVE ID (or a title hash), with their sources
+        cursor.execute("""CREATE TABLE IF NOT EXISTS findings (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        fingerprint VARCHAR(64) NOT NULL,
+        cve_id VARCHAR(32) NULL,
+        title TEXT,
+        summary MEDIUMTEXT,
+        cvss_score DECIMAL(3,1),
+        first_seen DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        last_seen DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE KEY uq_findings_fingerprint (fingerprint),
+        KEY idx_findings_cve (cve_id))""")
+        cursor.execute("""CREATE TABLE IF NOT EXISTS finding_sources (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        finding_id INT NOT NULL,
+        feed_item_id INT NULL,
+        feed_url VARCHAR(1024) NOT NULL,
+        item_guid VARCHAR(512) NOT NULL,
+        title TEXT,
+        link TEXT,
+        seen_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE KEY uq_finding_sources (finding_id, item_guid),
+        FOREIGN KEY (finding_id) REFERENCES findings (id) ON DELETE CASCADE)""")
+        cursor.execute("""CREATE TABLE IF NOT EXISTS finding_tech_stacks (
+        finding_id INT NOT NULL,
+        tech_stack_id INT NOT NULL,
+        PRIMARY KEY (finding_id, tech_stack_id),
+        KEY idx_finding_tech_stacks_tech (tech_stack_id),
+        FOREIGN KEY (finding_id) REFERENCES findings (id) ON DELETE CASCADE)""")
+        # Which findings each client's open drafts already reference (one draft entry per finding until sent)
+        cursor.execute("""CREATE TABLE IF NOT EXISTS client_findings (
+        client_id INT NOT NULL,
+        finding_id INT NOT NULL,
+        advisory_id INT NULL,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (client_id, finding_id),
+        FOREIGN KEY (finding_id) REFERENCES findings (id) ON DELETE CASCADE)""")
+        # Per-tech-stack relevance rules for feed triage (NULL tech_stack_id = every stack)
+        cursor.execute("""CREATE TABLE IF NOT EXISTS feed_rules (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        tech_stack_id INT NULL,
+        rule_type ENUM('keyword', 'phrase', 'regex') NOT NULL DEFAULT 'keyword',
+        pattern VARCHAR(255) NOT NULL,
+        enabled TINYINT(1) NOT NULL DEFAULT 1,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        KEY idx_feed_rules_tech_stack (tech_stack_id))""")
+        # Fan-out of feed_items to every client mapped to the item's tech stack
+        cursor.execute("""CREATE TABLE IF NOT EXISTS client_feed_items (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        client_id INT NOT NULL,
+        feed_item_id INT NOT NULL,
+        advisory_id INT NULL,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE KEY uq_client_feed_items (client_id, feed_item_id),
+        KEY idx_client_feed_items_client (client_id, id),
+        FOREIGN KEY (feed_item_id) REFERENCES feed_items (id) ON DELETE CASCADE)""")
+        add_index_if_missing(cursor, "client_feed_items", "KEY idx_client_feed_items_advisory (advisory_id, id)")
+        # Draft advisories render from their client_feed_items rows (see app/drafts.py)
+        add_column_if_missing(cursor, "advisories", "draft_base MEDIUMTEXT NULL")
+        add_column_if_missing(cursor, "advisories", "draft_base_finding_id INT NOT NULL DEFAULT 0")
+        add_column_if_missing(cursor, "advisories", "rendered_finding_id INT NOT NULL DEFAULT 0")
+        # Tags the rows of one /api/advisories/bulk fan-out (see app/advisory_fanout.py)
+        add_column_if_missing(cursor, "advisories", "dispatch_batch CHAR(32) NULL")
+        add_index_if_missing(cursor, "advisories", "KEY idx_advisories_dispatch_batch (dispatch_batch)")
+        # Keyset pagination of the advisory listings, unfiltered and per filter (see app/advisory_query.py)
+        add_index_if_missing(cursor, "advisories", "KEY idx_advisories_recent (timestamp, id)")
+        add_index_if_missing(cursor, "advisories", "KEY idx_advisories_client_recent (client_id, timestamp, id)")
+        add_index_if_missing(cursor, "advisories", "KEY idx_advisories_status_recent (status, timestamp, id)")
+        add_index_if_missing(cursor, "advisories", "KEY idx_advisories_service_recent (service_or_os, timestamp, id)")
+        # Full-text search over advisories and shift handover notes (see app/search.py)
+        add_index_if_missing(cursor, "advisories", "FULLTEXT KEY idx_advisories_fulltext (advisory_content, description)")
+        add_index_if_missing(cursor, "handover_notes", "FULLTEXT KEY idx_handover_notes_fulltext (note)")
+        # Advisory mail waiting to be sent (or sent/failed) by the outbox workers (see app/mail_outbox.py)
+        cursor.execute("""CREATE TABLE IF NOT EXISTS mail_outbox (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        advisory_id INT NULL,
+        client_tech_map_id INT NULL,
+        subject VARCHAR(998) NOT NULL,
+        body MEDIUMTEXT NOT NULL,
+        recipients TEXT NOT NULL,
+        status VARCHAR(16) NOT NULL DEFAULT 'pending',
+        attempts INT NOT NULL DEFAULT 0,
+        next_attempt_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        claim_token CHAR(32) NULL,
+        claimed_at DATETIME NULL,
+        last_status_code INT NULL,
+        last_error TEXT,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        sent_at DATETIME NULL,
+        KEY idx_mail_outbox_due (status, next_attempt_at),
+        KEY idx_mail_outbox_claim (claim_token),
+        KEY idx_mail_outbox_advisory (advisory_id))""")
+        # Advisories held per recipient until their digest is queued (see app/mail_digest.py)
+        cursor.execute("""CREATE TABLE IF NOT EXISTS mail_digest_items (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        recipient VARCHAR(320) NOT NULL,
+        advisory_key VARCHAR(64) NOT NULL,
+        advisory_id INT NULL,
+        client_tech_map_id INT NULL,
+        subject VARCHAR(998) NOT NULL,
+        body MEDIUMTEXT NOT NULL,
+        outbox_id INT NULL,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        KEY idx_mail_digest_pending (outbox_id, recipient, created_at),
+        KEY idx_mail_digest_advisory (advisory_id))""")
+        # Seen-GUID log: looked up by batches of GUIDs and expired by age (see app/seen_items.py)
+        cursor.execute("""CREATE TABLE IF NOT EXISTS processed_feed_items (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        item_guid VARCHAR(512) NOT NULL,
+        processed_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP)""")
+        add_column_if_missing(cursor, "processed_feed_items",
+                              "processed_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP")
+        if not add_index_if_missing(cursor, "processed_feed_items",
+                                    "UNIQUE KEY uq_processed_feed_items_guid (item_guid)"):
+            add_index_if_missing(cursor, "processed_feed_items", "KEY idx_processed_feed_items_guid (item_guid)")
+        add_index_if_missing(cursor, "processed_feed_items", "KEY idx_processed_feed_items_processed_at (processed_at)")
+        conn.commit()
+        cursor.close()
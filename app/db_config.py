@@ -1,6 +1,17 @@
+import os
+
 db_config = {
     "host": "localhost",
-    "user": "root", 
-    "passwd": "Ajay@121.", 
+    "user": "root",
+    "passwd": "Ajay@121.",
     "database": "soc"
 }
+
+# Connection pool settings (see app/db.py). Override per deployment via env vars.
+pool_config = {
+    "pool_size": int(os.environ.get("DB_POOL_SIZE", 10)),
+    # Seconds a request waits for a free connection before failing with 503
+    "checkout_timeout": float(os.environ.get("DB_POOL_CHECKOUT_TIMEOUT", 5)),
+    # Ping connections that sat idle longer than this many seconds before handing them out
+    "health_check_interval": float(os.environ.get("DB_POOL_HEALTH_CHECK_INTERVAL", 30)),
+}
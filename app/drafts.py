@@ -0,0 +1,183 @@
+from datetime import datetime
+
+DRAFT_FOOTER = """
+---
+*This is an automated draft. Please review for accuracy.*
+"""
+
+
+def draft_header(tech_stack_name):
+    return f"""**Automated Advisory Draft**
+
+**Topic:** Potential Issues for {tech_stack_name}
+**Date Generated:** {datetime.now().strftime('%d/%m/%Y')}
+
+This is a consolidated summary of new findings related to your technology stack. Please review, edit, and dispatch.
+"""
+
+
+def finding_block(item):
+    block = f"""
+---
+**New Finding:** {item['title']}
+**Source:** {item['link']}
+**Summary:** {item['summary']}
+"""
+    if item.get('cve_ids'):
+        block += f"**CVEs:** {item['cve_ids']}\n"
+    if item.get('cvss_score') is not None:
+        block += f"**CVSS:** {item['cvss_score']}\n"
+    return block
+
+
+def _strip_footer(content):
+    content = content or ''
+    return content[:-len(DRAFT_FOOTER)] if content.endswith(DRAFT_FOOTER) else content
+
+
+def open_draft(cursor, client_id, client_name, tech_stack_name):
+    """Return the id of the client's open draft for the tech stack, starting one if needed.
+
+    Findings aren't appended to the draft's text: they are the
+    ``client_feed_items`` rows carrying its advisory_id, and the body is
+    rendered from them once per poll that adds to it (see ``render_drafts``)
+    rather than rewritten for every finding.
+    """
+    cursor.execute(
+        "SELECT id, draft_base IS NULL AS legacy FROM advisories "
+        "WHERE client_id = %s AND service_or_os = %s AND status = 'Draft'",
+        (client_id, tech_stack_name)
+    )
+    existing_draft = cursor.fetchone()
+
+    if existing_draft:
+        if existing_draft['legacy']:
+            # Draft written as one string before findings were rows: its text becomes the base
+            cursor.execute("SELECT advisory_content FROM advisories WHERE id = %s", (existing_draft['id'],))
+            base = _strip_footer(cursor.fetchone()['advisory_content'])
+            cursor.execute(
+                """
+                UPDATE advisories
+                SET draft_base = %s,
+                    draft_base_finding_id = (SELECT COALESCE(MAX(id), 0) FROM client_feed_items WHERE advisory_id = %s),
+                    rendered_finding_id = draft_base_finding_id
+                WHERE id = %s
+                """,
+                (base, existing_draft['id'], existing_draft['id'])
+            )
+        cursor.execute("UPDATE advisories SET timestamp = NOW() WHERE id = %s", (existing_draft['id'],))
+        return existing_draft['id']
+
+    header = draft_header(tech_stack_name)
+    cursor.execute(
+        """
+        INSERT INTO advisories (client_id, client_name, service_or_os, update_type, description,
+                                advisory_content, draft_base, status, timestamp)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, 'Draft', NOW())
+        """,
+        (
+            client_id, client_name, tech_stack_name,
+            "Automated Consolidated Alert",
+            f"Multiple new findings for {tech_stack_name}",
+            header + DRAFT_FOOTER, header
+        )
+    )
+    return cursor.lastrowid
+
+
+# Select-list fragment (on an unaliased ``advisories``) that render_advisories needs
+RENDER_COLUMNS = (
+    "draft_base IS NOT NULL AS structured, draft_base_finding_id, rendered_finding_id, "
+    "(SELECT MAX(cfi.id) FROM client_feed_items cfi WHERE cfi.advisory_id = advisories.id) AS last_finding_id"
+)
+_RENDER_KEYS = ('structured', 'draft_base_finding_id', 'rendered_finding_id', 'last_finding_id')
+
+
+def render_advisories(conn, advisories):
+    """Bring ``advisory_content`` up to date on rows whose findings changed since they were last rendered.
+
+    Rows must carry ``id``, ``advisory_content`` and the ``RENDER_COLUMNS``.
+    The rendered text is cached in ``advisory_content`` (guarded so a
+    concurrent edit wins), so each draft is re-rendered once per poll that
+    added to it, however often it's viewed. Render-bookkeeping keys are
+    removed from the rows.
+    """
+    stale = [row for row in advisories
+             if row['structured']
+             and (row.get('last_finding_id') or 0) > row['rendered_finding_id']]
+    if stale:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            for row in stale:
+                cursor.execute(
+                    "SELECT draft_base, draft_base_finding_id FROM advisories WHERE id = %s", (row['id'],)
+                )
+                draft = cursor.fetchone()
+                cursor.execute(
+                    """
+                    SELECT cfi.id, fi.title, fi.link, fi.summary, fi.cve_ids, fi.cvss_score
+                    FROM client_feed_items cfi
+                    JOIN feed_items fi ON fi.id = cfi.feed_item_id
+                    WHERE cfi.advisory_id = %s AND cfi.id > %s
+                    ORDER BY cfi.id
+                    """,
+                    (row['id'], draft['draft_base_finding_id'])
+                )
+                findings = cursor.fetchall()
+                rendered_to = max([draft['draft_base_finding_id']] + [finding['id'] for finding in findings])
+                row['advisory_content'] = (
+                    draft['draft_base'] + ''.join(finding_block(finding) for finding in findings) + DRAFT_FOOTER
+                )
+                cursor.execute(
+                    """
+                    UPDATE advisories SET advisory_content = %s, rendered_finding_id = %s
+                    WHERE id = %s AND rendered_finding_id < %s AND draft_base_finding_id = %s
+                    """,
+                    (row['advisory_content'], rendered_to, row['id'], rendered_to, draft['draft_base_finding_id'])
+                )
+            conn.commit()
+        finally:
+            cursor.close()
+
+    for row in advisories:
+        for key in _RENDER_KEYS:
+            row.pop(key, None)
+    return advisories
+
+
+def render_drafts(conn, advisory_ids):
+    """Render the given drafts now, e.g. right after findings were added to them.
+
+    Keeps ``advisory_content``, and with it the FULLTEXT index search uses,
+    current for drafts nobody has opened yet. Commits.
+    """
+    advisory_ids = sorted(set(advisory_ids))
+    if not advisory_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(advisory_ids))
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            f"SELECT id, advisory_content, {RENDER_COLUMNS} FROM advisories WHERE id IN ({placeholders})",
+            tuple(advisory_ids)
+        )
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    render_advisories(conn, rows)
+
+
+def rebase_draft(cursor, advisory_id, content):
+    """Make an edited body the draft's new base.
+
+    The edit covers the findings rendered into the text the user was shown;
+    findings appended since render below it.
+    """
+    cursor.execute(
+        """
+        UPDATE advisories
+        SET draft_base = %s, draft_base_finding_id = rendered_finding_id
+        WHERE id = %s AND draft_base IS NOT NULL
+        """,
+        (_strip_footer(content), advisory_id)
+    )
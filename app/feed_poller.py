@@ -0,0 +1,228 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from app.client_overview import client_overview_cache
+from app.db import db_connection
+from app.drafts import open_draft, render_drafts
+from app.feeds import fetch_feeds
+from app.feed_rules import feed_rules
+from app.findings import record_finding_sources, claim_findings
+from app.seen_items import seen_items
+from app.tech_index import tech_index
+
+logger = logging.getLogger(__name__)
+
+# Seconds between polls of every distinct rss_feeds.url
+FEED_POLL_INTERVAL = float(os.environ.get("FEED_POLL_INTERVAL", 900))
+FEED_POLLER_ENABLED = os.environ.get("FEED_POLLER_ENABLED", "1") == "1"
+# Seconds between retention sweeps of processed_feed_items
+GUID_PURGE_INTERVAL = 24 * 60 * 60
+
+
+class FeedPoller:
+    """Background thread that ingests every RSS feed once per interval for all clients.
+
+    Each distinct ``rss_feeds.url`` is fetched once per poll, however many tech
+    stacks or clients map to it. New relevant entries are stored in
+    ``feed_items`` and fanned out to every client whose ``client_tech_map``
+    references the tech stack: a ``client_feed_items`` row each, plus the
+    consolidated draft advisory per (client, tech stack). Request handlers only
+    read the precomputed rows.
+
+    ``feed_items`` is written with INSERT IGNORE on (tech_stack_id, item_guid)
+    and only rows this poll actually inserted are fanned out, so several worker
+    processes polling at once can't double-append to drafts. Each item is also
+    merged into the CVE-keyed findings store (app/findings.py), and a client's
+    draft only gets items reporting a finding it doesn't reference yet, so the
+    same CVE arriving from NVD, the vendor and a blog is listed once.
+    """
+
+    def __init__(self, interval=FEED_POLL_INTERVAL):
+        self.interval = interval
+        self.feed_stats = {}
+        self.last_run = None
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._poll_lock = threading.Lock()
+        self._last_purge = 0.0
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._loop, name="feed-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+
+    def trigger(self):
+        """Run a poll now instead of waiting for the interval."""
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stopping.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.exception("Error polling RSS feeds: %s", e)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def poll_once(self):
+        """Fetch all feeds and fan out new items; returns the run summary, or None if a poll is already running."""
+        if not self._poll_lock.acquire(blocking=False):
+            return None
+        try:
+            return self._poll()
+        finally:
+            self._poll_lock.release()
+
+    def _poll(self):
+        started = time.time()
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT rf.url, rf.tech_stack_id, ts.name AS tech_stack_name
+                FROM rss_feeds rf
+                JOIN tech_stacks ts ON rf.tech_stack_id = ts.id
+            """)
+            stacks_by_url = {}
+            for row in cursor.fetchall():
+                stacks_by_url.setdefault(row['url'], []).append(row)
+            cursor.close()
+            # Pick up rule edits made through any worker process
+            feed_rules.load(conn)
+
+        # Entries relevant to at least one of their feed's tech stacks, matched as the fetches complete
+        candidates = []
+        for feed, entries, stats in fetch_feeds([{'url': url} for url in stacks_by_url]):
+            self.feed_stats[feed['url']] = dict(stats, checked_at=datetime.now().isoformat(timespec='seconds'))
+            for entry in entries or ():
+                item_guid = entry.get('guid', entry.get('link'))
+                if not item_guid:
+                    continue
+                text = entry.get("title", "") + " " + entry.get("summary", "")
+                for stack in stacks_by_url[feed['url']]:
+                    result = feed_rules.match(stack['tech_stack_id'], text)
+                    if result['relevant']:
+                        candidates.append((feed['url'], item_guid, entry, stack, result))
+
+        # One batched check of just this poll's GUIDs against the seen log
+        with db_connection() as conn:
+            unseen = seen_items.filter_unseen(conn, [candidate[1] for candidate in candidates])
+
+        new_items = []
+        for feed_url, item_guid, entry, stack, result in candidates:
+            if item_guid not in unseen:
+                continue
+            new_items.append({
+                "item_guid": item_guid,
+                "feed_url": feed_url,
+                "title": entry.get("title", "No Title"),
+                "link": entry.get("link", "#"),
+                "summary": entry.get("summary", "No summary available."),
+                "tech_stack_id": stack['tech_stack_id'],
+                "tech_stack_name": stack['tech_stack_name'],
+                "matched_rules": ', '.join(result['matched_rules'])[:1024],
+                "cve_ids": ', '.join(result['cve_ids'])[:1024] or None,
+                "cvss_score": result['cvss_score'],
+            })
+        new_guids_to_log = list(dict.fromkeys(item['item_guid'] for item in new_items))
+
+        fanned_out = 0
+        expired = 0
+        with db_connection() as conn:
+            if new_items:
+                fanned_out = self._store(conn, new_items, new_guids_to_log)
+            if time.time() - self._last_purge >= GUID_PURGE_INTERVAL:
+                expired = seen_items.purge(conn)
+                self._last_purge = time.time()
+
+        self.last_run = {
+            "started_at": datetime.fromtimestamp(started).isoformat(timespec='seconds'),
+            "duration_seconds": round(time.time() - started, 3),
+            "feeds": len(stacks_by_url),
+            "new_items": len(new_items),
+            "client_items": fanned_out,
+            "expired_guids": expired,
+        }
+        return self.last_run
+
+    def _store(self, conn, new_items, new_guids_to_log):
+        cursor = conn.cursor(dictionary=True)
+        try:
+            inserted = []
+            for item in new_items:
+                cursor.execute(
+                    """
+                    INSERT IGNORE INTO feed_items
+                    (tech_stack_id, feed_url, item_guid, title, link, summary, matched_rules, cve_ids, cvss_score)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    """,
+                    (item['tech_stack_id'], item['feed_url'], item['item_guid'],
+                     item['title'], item['link'], item['summary'],
+                     item['matched_rules'], item['cve_ids'], item['cvss_score'])
+                )
+                if cursor.rowcount == 1:
+                    item = dict(item, id=cursor.lastrowid)
+                    item['finding_ids'] = record_finding_sources(cursor, item)
+                    inserted.append(item)
+
+            items_by_tech = {}
+            for item in inserted:
+                items_by_tech.setdefault(item['tech_stack_id'], []).append(item)
+
+            client_rows = []
+            for tech_stack_id, tech_items in items_by_tech.items():
+                for mapping in tech_index.clients_for_tech(tech_stack_id):
+                    # Only items reporting a finding this client's drafts don't reference yet
+                    items_list = []
+                    claimed = []
+                    for item in tech_items:
+                        new_findings = claim_findings(cursor, mapping['client_id'], item['finding_ids'])
+                        if new_findings:
+                            items_list.append(item)
+                            claimed.extend(new_findings)
+                    if not items_list:
+                        continue
+                    advisory_id = open_draft(
+                        cursor, mapping['client_id'], mapping['client_name'], items_list[0]['tech_stack_name']
+                    )
+                    placeholders = ', '.join(['%s'] * len(claimed))
+                    cursor.execute(
+                        f"UPDATE client_findings SET advisory_id = %s WHERE client_id = %s AND finding_id IN ({placeholders})",
+                        (advisory_id, mapping['client_id'], *claimed)
+                    )
+                    client_rows.extend((mapping['client_id'], item['id'], advisory_id) for item in items_list)
+
+            if client_rows:
+                cursor.executemany(
+                    "INSERT IGNORE INTO client_feed_items (client_id, feed_item_id, advisory_id) VALUES (%s, %s, %s)",
+                    client_rows
+                )
+            # Log the new GUIDs so we don't process them again
+            seen_items.mark_seen(cursor, new_guids_to_log)
+            conn.commit()
+            client_overview_cache.invalidate_many(row[0] for row in client_rows)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+        # Render the drafts that gained findings so search sees them before anyone opens them
+        try:
+            render_drafts(conn, (row[2] for row in client_rows))
+        except Exception as e:
+            conn.rollback()
+            logger.exception("Error rendering drafts after a poll: %s", e)
+        return len(client_rows)
+
+
+feed_poller = FeedPoller()
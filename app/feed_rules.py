@@ -0,0 +1,248 @@
+import logging
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Rules every tech stack gets when no global rules are configured (the original hardcoded list)
+DEFAULT_KEYWORDS = [
+    'vulnerability', 'threat', 'security', 'update',
+    'patch', 'advisory', 'cve-', 'malware', 'exploit'
+]
+RULE_TYPES = ('keyword', 'phrase', 'regex')
+
+CVE_PATTERN = re.compile(r'cve-\d{4}-\d{4,7}\b', re.IGNORECASE)
+# "CVSS 9.8", "CVSS: 7.5", "CVSSv3.1 base score of 9.8", "CVSS score: 6.1"
+CVSS_SCORE_PATTERN = re.compile(
+    r'cvss(?:\s*v?\s*[234](?:\.\d)?)?(?:\s+base)?(?:\s+score)?(?:\s+of)?\s*[:=]?\s*'
+    r'(10(?:\.0)?|\d\.\d)\b',
+    re.IGNORECASE
+)
+CVSS_VECTOR_PATTERN = re.compile(r'cvss:[234]\.\d(?:/[a-z]{1,3}:[a-z])+', re.IGNORECASE)
+# Literals that trigger the anchored CVE/CVSS extractors from the same scan as the rules
+_TRIGGERS = ('cve-', 'cvss')
+
+
+class FeedRuleError(ValueError):
+    """A rule pattern is malformed (e.g. a regex that doesn't compile)."""
+
+
+def validate_rule(rule_type, pattern):
+    """Return the normalised pattern for a rule, raising FeedRuleError if it can't be used.
+
+    Keywords match as case-insensitive substrings (the original behaviour);
+    phrases match whole words with any run of whitespace between them.
+    """
+    pattern = (pattern or '').strip()
+    if not pattern:
+        raise FeedRuleError("Rule pattern must not be empty")
+    if rule_type in ('keyword', 'phrase'):
+        return ' '.join(pattern.lower().split())
+    if rule_type == 'regex':
+        try:
+            compiled = re.compile(pattern, re.IGNORECASE)
+        except re.error as e:
+            raise FeedRuleError(f"Invalid regex {pattern!r}: {e}")
+        # Regex rules are combined into one alternation, where numbered backreferences would shift
+        if compiled.groupindex or re.search(r'\\[1-9]', pattern):
+            raise FeedRuleError(f"Regex rules can't use named groups or backreferences: {pattern!r}")
+        try:
+            re.compile(f"(?:{pattern})|x")
+        except re.error as e:
+            raise FeedRuleError(f"Regex {pattern!r} can't be combined with other rules: {e}")
+        return pattern
+    raise FeedRuleError(f"Rule type must be one of: {', '.join(RULE_TYPES)}")
+
+
+def _trie_pattern(literals):
+    """Regex source for a character trie of ``literals`` (a space matches any run of whitespace).
+
+    Python's ``re`` tries a flat alternation branch by branch at every text
+    position; sharing prefixes means each position is rejected after a
+    character or two instead of once per literal.
+    """
+    trie = {}
+    for literal in literals:
+        node = trie
+        for char in literal:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def emit(node):
+        branches = [(r'\s+' if char == ' ' else re.escape(char)) + emit(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if '' in node else body
+
+    return emit(trie)
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+def _raw_length(raw, length):
+    """Characters of ``raw`` spanned by its first ``length`` whitespace-collapsed characters."""
+    position = 0
+    for _ in range(length):
+        if raw[position].isspace():
+            while position < len(raw) and raw[position].isspace():
+                position += 1
+        else:
+            position += 1
+    return position
+
+
+class CompiledRuleSet:
+    """A tech stack's rules compiled for one-pass matching.
+
+    Keyword and phrase rules, plus the "cve-"/"cvss" trigger literals, are
+    folded into a single trie-shaped regex run once over the lower-cased
+    entry inside a lookahead, so it reports the longest literal starting at
+    every position (overlapping hits included). Every literal that is a
+    prefix of that hit also starts there, so each hit is mapped back to the
+    rules of all its prefix literals by dictionary lookup, and a trigger
+    runs the anchored CVE/CVSS extractor at that position. Regex
+    rules, if the set has any, share one more combined alternation. This
+    replaces one substring scan of the text per keyword.
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self._literal_rules = {}
+        self._phrases = set()
+        regex_rules = []
+        for index, rule in enumerate(self.rules):
+            pattern = validate_rule(rule['rule_type'], rule['pattern'])
+            if rule['rule_type'] == 'regex':
+                regex_rules.append((index, re.compile(pattern, re.IGNORECASE)))
+            else:
+                self._literal_rules.setdefault(pattern, []).append(index)
+                if rule['rule_type'] == 'phrase':
+                    self._phrases.add(index)
+
+        literals = set(self._literal_rules) | set(_TRIGGERS)
+        self._literals = re.compile(f"(?=({_trie_pattern(sorted(literals))}))")
+        # Literal -> every literal that is a prefix of it (itself included), shortest first
+        self._prefixes = {
+            literal: sorted((other for other in literals if literal.startswith(other)), key=len)
+            for literal in literals
+        }
+        self._regex_rules = regex_rules
+        self._regexes = (
+            re.compile('|'.join(f"(?:{compiled.pattern})" for _, compiled in regex_rules), re.IGNORECASE)
+            if regex_rules else None
+        )
+
+    def _extract(self, text, position, cves, cvss_scores, cvss_vectors):
+        if text.startswith('cve-', position):
+            match = CVE_PATTERN.match(text, position)
+            if match:
+                cves.append(match.group().upper())
+        elif text.startswith('cvss', position):
+            match = CVSS_VECTOR_PATTERN.match(text, position)
+            if match:
+                cvss_vectors.append(match.group().upper())
+            else:
+                match = CVSS_SCORE_PATTERN.match(text, position)
+                if match:
+                    cvss_scores.append(float(match.group(1)))
+
+    def match(self, text):
+        text = text or ''
+        lowered = text.lower()
+        matched = set()
+        cves = []
+        cvss_scores = []
+        cvss_vectors = []
+
+        for match in self._literals.finditer(lowered):
+            raw = match.group(1)
+            start = match.start()
+            for literal in self._prefixes[' '.join(raw.split())]:
+                for index in self._literal_rules.get(literal, ()):
+                    if index in matched:
+                        continue
+                    if index in self._phrases:
+                        end = start + _raw_length(raw, len(literal))
+                        if (start > 0 and _is_word_char(lowered[start - 1])) \
+                                or (end < len(lowered) and _is_word_char(lowered[end])):
+                            continue
+                    matched.add(index)
+                if literal in _TRIGGERS:
+                    self._extract(lowered, start, cves, cvss_scores, cvss_vectors)
+
+        if self._regexes is not None:
+            for match in self._regexes.finditer(text):
+                for index, compiled in self._regex_rules:
+                    if compiled.match(text, match.start()):
+                        matched.add(index)
+
+        return {
+            "relevant": bool(matched),
+            "matched_rules": [self.rules[index]['pattern'] for index in sorted(matched)],
+            "cve_ids": list(dict.fromkeys(cves)),
+            "cvss_score": max(cvss_scores) if cvss_scores else None,
+            "cvss_vector": cvss_vectors[0] if cvss_vectors else None,
+        }
+
+
+def default_rules():
+    return [{"rule_type": "keyword", "pattern": keyword} for keyword in DEFAULT_KEYWORDS]
+
+
+class FeedRuleEngine:
+    """Per-tech-stack rule sets loaded from ``feed_rules`` and compiled once per load.
+
+    Rules with a NULL tech_stack_id apply to every tech stack (DEFAULT_KEYWORDS
+    when there are none); a tech stack's own rules are added on top. Stacks
+    without their own rules share the compiled global set.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._global = CompiledRuleSet(default_rules())
+        self._by_stack = {}
+
+    def load(self, conn):
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            "SELECT id, tech_stack_id, rule_type, pattern FROM feed_rules WHERE enabled = 1 ORDER BY id"
+        )
+        rows = cursor.fetchall()
+        cursor.close()
+        self.compile(rows)
+
+    def compile(self, rows):
+        valid = []
+        for row in rows:
+            try:
+                validate_rule(row['rule_type'], row['pattern'])
+                valid.append(row)
+            except FeedRuleError as e:
+                logger.warning("Skipping feed rule %s: %s", row.get('id'), e)
+
+        global_rules = [row for row in valid if row['tech_stack_id'] is None] or default_rules()
+        stack_rules = {}
+        for row in valid:
+            if row['tech_stack_id'] is not None:
+                stack_rules.setdefault(row['tech_stack_id'], []).append(row)
+
+        compiled_global = CompiledRuleSet(global_rules)
+        compiled_stacks = {tech_stack_id: CompiledRuleSet(global_rules + rules)
+                           for tech_stack_id, rules in stack_rules.items()}
+        with self._lock:
+            self._global = compiled_global
+            self._by_stack = compiled_stacks
+
+    def ruleset(self, tech_stack_id):
+        with self._lock:
+            return self._by_stack.get(tech_stack_id, self._global)
+
+    def match(self, tech_stack_id, text):
+        return self.ruleset(tech_stack_id).match(text)
+
+
+feed_rules = FeedRuleEngine()
@@ -0,0 +1,201 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+
+import feedparser
+import requests
+
+from app.http_clients import feed_http
+
+logger = logging.getLogger(__name__)
+
+# Feeds fetched at once across all requests
+FEED_FETCH_WORKERS = int(os.environ.get("FEED_FETCH_WORKERS", 16))
+# Seconds allowed for one feed, connect through last byte
+FEED_FETCH_TIMEOUT = float(os.environ.get("FEED_FETCH_TIMEOUT", 10))
+FEED_CONNECT_TIMEOUT = 5
+FEED_READ_SIZE = 64 * 1024
+USER_AGENT = "SOC-Advisory-Feed-Reader/1.0"
+# Seconds a cached feed is served without asking the origin at all
+FEED_CACHE_TTL = float(os.environ.get("FEED_CACHE_TTL", 300))
+FEED_CACHE_MAX_ENTRIES = int(os.environ.get("FEED_CACHE_MAX_ENTRIES", 500))
+
+
+class FeedTimeout(Exception):
+    """A feed took longer than its overall time budget."""
+
+
+class CachedFeed:
+    __slots__ = ("entries", "etag", "last_modified", "checked_at")
+
+    def __init__(self, entries, etag, last_modified, checked_at):
+        self.entries = entries
+        self.etag = etag
+        self.last_modified = last_modified
+        self.checked_at = checked_at
+
+
+class FeedCache:
+    """Parsed feed entries and their HTTP validators, keyed by URL and shared by every client.
+
+    Within ``ttl`` seconds of the last check a feed is served straight from
+    memory. After that it is revalidated with If-None-Match/If-Modified-Since,
+    so an unchanged feed costs a 304 and no parsing. The least recently used
+    feed is evicted once ``max_entries`` is exceeded.
+    """
+
+    def __init__(self, ttl=FEED_CACHE_TTL, max_entries=FEED_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._feeds = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"fresh": 0, "not_modified": 0, "fetched": 0, "evictions": 0}
+
+    def get(self, url):
+        with self._lock:
+            cached = self._feeds.get(url)
+            if cached is not None:
+                self._feeds.move_to_end(url)
+            return cached
+
+    def put(self, url, cached):
+        with self._lock:
+            self._feeds[url] = cached
+            self._feeds.move_to_end(url)
+            while len(self._feeds) > self.max_entries:
+                self._feeds.popitem(last=False)
+                self._counts["evictions"] += 1
+
+    def is_fresh(self, cached):
+        return time.monotonic() - cached.checked_at < self.ttl
+
+    def record(self, outcome):
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def clear(self):
+        with self._lock:
+            self._feeds.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, size=len(self._feeds), max_entries=self.max_entries, ttl=self.ttl)
+
+
+feed_cache = FeedCache()
+
+
+def fetch_feed(url, timeout=FEED_FETCH_TIMEOUT, cache=feed_cache):
+    """Return ``(entries, outcome)`` for one feed, giving up once ``timeout`` seconds have passed.
+
+    ``outcome`` is "fresh" (served from cache within its TTL), "not_modified"
+    (revalidated with a 304) or "fetched". The body is read in blocks against
+    a deadline, so a server trickling bytes can't hold the worker past its
+    budget the way a per-read timeout would.
+    """
+    cached = cache.get(url) if cache is not None else None
+    if cached is not None and cache.is_fresh(cached):
+        cache.record("fresh")
+        return cached.entries, "fresh"
+
+    headers = {"User-Agent": USER_AGENT}
+    if cached is not None:
+        if cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+
+    deadline = time.monotonic() + timeout
+    response = feed_http.get(
+        url, timeout=(min(FEED_CONNECT_TIMEOUT, timeout), timeout),
+        headers=headers, stream=True
+    )
+    try:
+        if response.status_code == 304 and cached is not None:
+            cache.put(url, CachedFeed(cached.entries, response.headers.get("ETag", cached.etag),
+                                      response.headers.get("Last-Modified", cached.last_modified),
+                                      time.monotonic()))
+            cache.record("not_modified")
+            return cached.entries, "not_modified"
+        response.raise_for_status()
+        body = bytearray()
+        for block in response.iter_content(FEED_READ_SIZE):
+            body.extend(block)
+            if time.monotonic() > deadline:
+                raise FeedTimeout(f"Timed out after {timeout}s")
+    finally:
+        response.close()
+
+    parsed = feedparser.parse(bytes(body), response_headers=dict(response.headers))
+    if parsed.bozo and not parsed.entries:
+        raise ValueError(f"Unparseable feed: {parsed.get('bozo_exception')}")
+    if cache is not None:
+        cache.put(url, CachedFeed(parsed.entries, response.headers.get("ETag"),
+                                  response.headers.get("Last-Modified"), time.monotonic()))
+        cache.record("fetched")
+    return parsed.entries, "fetched"
+
+
+def _status(error):
+    """Per-feed status: timeouts (our overall budget or the HTTP connect/read timeouts) are told apart from failures."""
+    if error is None:
+        return "ok"
+    if isinstance(error, (FeedTimeout, requests.Timeout)):
+        return "timeout"
+    return "failed"
+
+
+def _timed_fetch(url, timeout, cache):
+    started = time.monotonic()
+    try:
+        entries, outcome = fetch_feed(url, timeout, cache)
+        return entries, outcome, None, time.monotonic() - started
+    except Exception as e:
+        return None, None, e, time.monotonic() - started
+
+
+_executor = ThreadPoolExecutor(max_workers=FEED_FETCH_WORKERS, thread_name_prefix="feed-fetch")
+
+
+def fetch_feeds(feeds, timeout=FEED_FETCH_TIMEOUT, cache=feed_cache):
+    """Fetch ``feeds`` (dicts with a ``url``) concurrently, yielding ``(feed, entries, stats)`` as each finishes.
+
+    ``entries`` is None when the feed failed; ``stats`` records the url, status,
+    cache outcome, entry count, fetch duration and error for the response.
+    Feeds still running when the overall deadline passes are reported as timed out.
+    """
+    futures = {_executor.submit(_timed_fetch, feed['url'], timeout, cache): feed for feed in feeds}
+    # One budget per wave of workers, plus a small grace for queueing behind other callers' feeds
+    waves = max(1, math.ceil(len(futures) / FEED_FETCH_WORKERS))
+    try:
+        for future in as_completed(futures, timeout=timeout * waves + FEED_CONNECT_TIMEOUT):
+            feed = futures.pop(future)
+            entries, outcome, error, elapsed = future.result()
+            stats = {
+                "url": feed['url'],
+                "status": _status(error),
+                "cache": outcome,
+                "entries": len(entries) if entries is not None else 0,
+                "duration_ms": round(elapsed * 1000, 1),
+                "error": None if error is None else str(error),
+            }
+            if error is not None:
+                logger.warning("Error fetching or parsing feed %s: %s", feed['url'], error)
+            yield feed, entries, stats
+    except FuturesTimeoutError:
+        pass
+
+    for future, feed in futures.items():
+        future.cancel()
+        yield feed, None, {
+            "url": feed['url'],
+            "status": "timeout",
+            "cache": None,
+            "entries": 0,
+            "duration_ms": None,
+            "error": f"No response within {timeout}s",
+        }
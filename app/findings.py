@@ -0,0 +1,113 @@
+import hashlib
+import re
+
+# A bulletin listing dozens of CVEs is linked to at most this many of them
+MAX_CVES_PER_ITEM = 20
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def fingerprints(item):
+    """``(fingerprint, cve_id)`` keys identifying the finding(s) a feed item reports.
+
+    Items naming CVEs map to one finding per CVE ID, so the NVD entry, the
+    vendor bulletin and blog posts about the same CVE all merge. Items without
+    a CVE fall back to a hash of their normalised title.
+    """
+    cve_ids = [cve for cve in (item.get('cve_ids') or '').split(', ') if cve][:MAX_CVES_PER_ITEM]
+    if cve_ids:
+        return [(cve, cve) for cve in cve_ids]
+    title = _NON_WORD.sub(' ', (item.get('title') or '').lower()).strip()
+    return [("sha1:" + hashlib.sha1(title.encode('utf-8')).hexdigest(), None)]
+
+
+def record_finding_sources(cursor, item):
+    """Merge a new feed item into the findings store; returns the ids of the findings it reports.
+
+    Every step is a single statement against a unique key (upsert the
+    finding, then INSERT IGNORE its source and tech stack links), so the cost
+    per item doesn't grow with the size of the history.
+    """
+    finding_ids = []
+    for fingerprint, cve_id in fingerprints(item):
+        cursor.execute(
+            """
+            INSERT INTO findings (fingerprint, cve_id, title, summary, cvss_score, first_seen, last_seen)
+            VALUES (%s, %s, %s, %s, %s, NOW(), NOW())
+            ON DUPLICATE KEY UPDATE
+                id = LAST_INSERT_ID(id),
+                last_seen = NOW(),
+                cvss_score = COALESCE(GREATEST(cvss_score, VALUES(cvss_score)), cvss_score, VALUES(cvss_score))
+            """,
+            (fingerprint, cve_id, item['title'], item['summary'], item.get('cvss_score'))
+        )
+        finding_id = cursor.lastrowid
+        finding_ids.append(finding_id)
+        cursor.execute(
+            """
+            INSERT IGNORE INTO finding_sources (finding_id, feed_item_id, feed_url, item_guid, title, link)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            """,
+            (finding_id, item.get('id'), item['feed_url'], item['item_guid'], item['title'], item['link'])
+        )
+        cursor.execute(
+            "INSERT IGNORE INTO finding_tech_stacks (finding_id, tech_stack_id) VALUES (%s, %s)",
+            (finding_id, item['tech_stack_id'])
+        )
+    return finding_ids
+
+
+def claim_findings(cursor, client_id, finding_ids):
+    """Mark findings as referenced by the client's drafts; returns those that weren't already.
+
+    A claim lasts until its draft is sent (see ``release_findings``), so
+    later reports of the finding go into the client's next draft.
+    """
+    claimed = []
+    for finding_id in finding_ids:
+        cursor.execute(
+            "INSERT IGNORE INTO client_findings (client_id, finding_id) VALUES (%s, %s)",
+            (client_id, finding_id)
+        )
+        if cursor.rowcount == 1:
+            claimed.append(finding_id)
+    return claimed
+
+
+def release_findings(cursor, advisory_id):
+    """Drop the claims held by an advisory that has been sent; returns how many."""
+    cursor.execute("DELETE FROM client_findings WHERE advisory_id = %s", (advisory_id,))
+    return cursor.rowcount
+
+
+def get_finding(cursor, finding_id):
+    """A finding with its merged sources and linked tech stacks, or None."""
+    cursor.execute(
+        """
+        SELECT id, fingerprint, cve_id, title, summary, cvss_score, first_seen, last_seen
+        FROM findings WHERE id = %s
+        """,
+        (finding_id,)
+    )
+    finding = cursor.fetchone()
+    if finding is None:
+        return None
+    cursor.execute(
+        """
+        SELECT feed_url, item_guid, title, link, seen_at
+        FROM finding_sources WHERE finding_id = %s ORDER BY id
+        """,
+        (finding_id,)
+    )
+    finding['sources'] = cursor.fetchall()
+    cursor.execute(
+        """
+        SELECT ts.id, ts.name
+        FROM finding_tech_stacks fts
+        JOIN tech_stacks ts ON ts.id = fts.tech_stack_id
+        WHERE fts.finding_id = %s
+        """,
+        (finding_id,)
+    )
+    finding['tech_stacks'] = cursor.fetchall()
+    return finding
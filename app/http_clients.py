@@ -0,0 +1,235 @@
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Hosts whose pools a session keeps, and keep-alive connections kept per host
+HTTP_POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", 32))
+HTTP_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", 16))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 5))
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", 15))
+# Consecutive failures (network errors, 429, 5xx) that open an upstream's circuit, and seconds it stays open
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", 5))
+CIRCUIT_RESET_TIMEOUT = float(os.environ.get("CIRCUIT_RESET_TIMEOUT", 60))
+# Seconds before expiry at which a Graph token is refreshed in the background
+TOKEN_REFRESH_AHEAD = float(os.environ.get("TOKEN_REFRESH_AHEAD", 300))
+
+
+class CircuitOpenError(RuntimeError):
+    """Calls to an upstream are being short-circuited after repeated failures."""
+
+    def __init__(self, upstream, retry_after):
+        super().__init__(f"Circuit open for {upstream}; retry in {retry_after:.0f}s")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Closed -> open after ``failure_threshold`` consecutive failures -> half-open after ``reset_timeout``.
+
+    While open every call fails fast with CircuitOpenError. Half-open lets a
+    single trial call through: success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(self, name, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            if remaining > 0 or self._trial_in_flight:
+                raise CircuitOpenError(self.name, max(remaining, 1.0))
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def stats(self):
+        state = self.state
+        with self._lock:
+            return {"state": state, "consecutive_failures": self._failures}
+
+
+class HttpClient:
+    """A keep-alive ``requests.Session`` for one upstream, with default timeouts and a circuit breaker.
+
+    ``per_host`` gives every host its own breaker (for feeds, where each
+    publisher is a separate upstream); otherwise the client has one.
+    Retrying is left to callers, which know what is safe to repeat.
+    """
+
+    def __init__(self, name, connect_timeout=HTTP_CONNECT_TIMEOUT, read_timeout=HTTP_READ_TIMEOUT,
+                 pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE, per_host=False):
+        self.name = name
+        self.timeout = (connect_timeout, read_timeout)
+        self.per_host = per_host
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, url):
+        key = urlsplit(url).netloc if self.per_host else self.name
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self._breakers[key] = CircuitBreaker(key)
+            return breaker
+
+    def request(self, method, url, **kwargs):
+        breaker = self.breaker(url)
+        breaker.before_call()
+        kwargs.setdefault("timeout", self.timeout)
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            breaker.record_failure()
+            raise
+        if response.status_code == 429 or response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {key: breaker.stats() for key, breaker in breakers.items()}
+
+
+class BreakerSession(requests.Session):
+    """A ``requests.Session`` whose requests go through an HttpClient, breaker and default timeouts included.
+
+    For libraries such as MSAL that take a session rather than a client.
+    """
+
+    def __init__(self, http_client):
+        super().__init__()
+        self.http_client = http_client
+
+    def request(self, method, url, **kwargs):
+        return self.http_client.request(method, url, **kwargs)
+
+
+class GraphTokenProvider:
+    """App-only Graph token from one process-wide MSAL client, refreshed ahead of expiry.
+
+    Callable: returns a valid token. Within ``refresh_ahead`` seconds of
+    expiry the current token is still returned while a background thread
+    fetches the next one, so dispatches don't wait on the token endpoint.
+    """
+
+    def __init__(self, tenant_id, client_id, client_secret, scopes, refresh_ahead=TOKEN_REFRESH_AHEAD,
+                 http_client=None):
+        self.tenant_id = tenant_id
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.scopes = scopes
+        self.refresh_ahead = refresh_ahead
+        self.http_client = http_client
+        self._app = None
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._acquire_lock = threading.Lock()
+        self._refreshing = False
+
+    def _client(self):
+        if self._app is None:
+            import msal
+            self._app = msal.ConfidentialClientApplication(
+                client_id=self.client_id,
+                client_credential=self.client_secret,
+                authority=f'https://login.microsoftonline.com/{self.tenant_id}',
+                http_client=BreakerSession(self.http_client) if self.http_client is not None else None,
+            )
+        return self._app
+
+    def _acquire(self):
+        result = self._client().acquire_token_for_client(scopes=self.scopes)
+        if 'access_token' not in result:
+            raise Exception(result.get('error_description') or 'Failed to get access token')
+        with self._lock:
+            self._token = result['access_token']
+            self._expires_at = time.monotonic() + float(result.get('expires_in', 3600))
+        return result['access_token']
+
+    def _refresh_in_background(self):
+        try:
+            self._acquire()
+        except Exception as e:
+            logger.warning("Background Graph token refresh failed: %s", e)
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def __call__(self):
+        with self._lock:
+            remaining = self._expires_at - time.monotonic()
+            token = self._token
+            if token is not None and remaining > self.refresh_ahead:
+                return token
+            if token is not None and remaining > 0:
+                if not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(target=self._refresh_in_background, name="graph-token-refresh",
+                                     daemon=True).start()
+                return token
+        # No usable token: one caller fetches it while the rest wait for that result
+        with self._acquire_lock:
+            with self._lock:
+                if self._token is not None and self._expires_at > time.monotonic():
+                    return self._token
+            return self._acquire()
+
+    def invalidate(self):
+        """Drop the cached token (e.g. after Graph rejected it with a 401)."""
+        with self._lock:
+            self._token = None
+            self._expires_at = 0.0
+
+
+graph_http = HttpClient("graph")
+login_http = HttpClient("login")
+feed_http = HttpClient("feeds", per_host=True)
@@ -0,0 +1,151 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from app.db import db_connection
+from app.kb_import import import_knowledge_base, new_report, ImportCancelled, ImportFileError, IMPORT_BATCH_SIZE
+from app.kb_index import kb_index
+from app.ip_index import ip_index
+
+logger = logging.getLogger(__name__)
+
+IMPORT_WORKERS = int(os.environ.get("KB_IMPORT_WORKERS", 4))
+# Finished jobs kept around for status queries
+MAX_FINISHED_JOBS = 200
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATUSES = (COMPLETED, FAILED, CANCELLED)
+
+
+class ImportJob:
+    def __init__(self, filename, path, batch_size, mode, key):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.path = path
+        self.batch_size = batch_size
+        self.mode = mode
+        self.key = key
+        self.status = QUEUED
+        self.error = None
+        self.report = new_report()
+        self.cancel_event = threading.Event()
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        report = dict(self.report, errors=list(self.report["errors"]))
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "mode": self.mode,
+            "key": self.key,
+            "status": self.status,
+            "error": self.error,
+            "rows_parsed": report["rows_parsed"],
+            "rows_inserted": report["inserted"],
+            "rows_updated": report["updated"],
+            "rows_unchanged": report["unchanged"],
+            "rows_rejected": report["rejected"],
+            "rows_per_sec": report["rows_per_sec"],
+            "report": report,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class ImportJobManager:
+    """Runs KB imports on a bounded thread pool so uploads return immediately.
+
+    Threads (rather than processes) keep jobs on the shared connection pool and
+    search index; the heavy lifting is pandas parsing and MySQL I/O, both of
+    which release the GIL for most of their time.
+    """
+
+    def __init__(self, max_workers=IMPORT_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="kb-import")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, file_storage, batch_size=IMPORT_BATCH_SIZE, mode='insert', key=None):
+        """Spool the upload to disk (the request stream dies with the request) and queue it."""
+        suffix = os.path.splitext(file_storage.filename)[1].lower()
+        fd, path = tempfile.mkstemp(prefix="kb-import-", suffix=suffix)
+        with os.fdopen(fd, 'wb') as spooled:
+            file_storage.save(spooled)
+
+        job = ImportJob(file_storage.filename, path, batch_size, mode, key)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job.status not in FINISHED_STATUSES:
+            job.cancel_event.set()
+        return job
+
+    def _prune(self):
+        finished = [job for job in self._jobs.values() if job.status in FINISHED_STATUSES]
+        finished.sort(key=lambda job: job.finished_at or 0)
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job.id]
+
+    def _run(self, job):
+        try:
+            if job.cancel_event.is_set():
+                job.status = CANCELLED
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+            with db_connection() as conn:
+                try:
+                    import_knowledge_base(conn, job.path, job.filename, batch_size=job.batch_size,
+                                          report=job.report, cancel_event=job.cancel_event,
+                                          mode=job.mode, key=job.key)
+                    job.status = COMPLETED
+                finally:
+                    # Index whatever was committed, including the batches before a cancel
+                    kb_index.refresh(conn)
+                    ip_index.refresh(conn, 'knowledge_base')
+        except ImportCancelled as e:
+            job.status = CANCELLED
+            job.error = str(e)
+        except ImportFileError as e:
+            job.status = FAILED
+            job.error = str(e)
+        except Exception as e:
+            logger.exception("Error in import job %s: %s", job.id, e)
+            job.status = FAILED
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            try:
+                os.remove(job.path)
+            except OSError:
+                pass
+
+
+import_jobs = ImportJobManager()
@@ -0,0 +1,262 @@
+import ipaddress
+import re
+import threading
+from bisect import bisect_left
+
+LOAD_BATCH_SIZE = 5000
+# Upper bound on addresses accepted by one bulk lookup request
+MAX_BULK_LOOKUPS = 10000
+
+# Tables carrying an ip_address column, and the columns returned with each match
+SOURCES = {
+    'client_assets': (
+        "SELECT ca.id, ca.ip_address, ca.asset_name, ca.asset_type, ca.location, ca.asset_owner, "
+        "ca.client_id, c.name AS client_name "
+        "FROM client_assets ca LEFT JOIN clients c ON c.id = ca.client_id"
+    ),
+    'knowledge_base': (
+        "SELECT kb.id, kb.ip_address, kb.host_name, kb.serial_number, kb.manufacturer, kb.model, "
+        "kb.location, kb.asset_owner "
+        "FROM knowledge_base kb"
+    ),
+}
+_ALIASES = {'client_assets': 'ca', 'knowledge_base': 'kb'}
+
+
+def parse_ip_field(value):
+    """Networks named by a free-text ip_address value.
+
+    Accepts single addresses, CIDR blocks, ``a-b`` ranges and any list of them
+    separated by commas, semicolons or whitespace; anything else (host names,
+    "NA", typos) is ignored.
+    """
+    networks = []
+    if not value:
+        return networks
+    for token in re.split(r'[\s,;]+', str(value).strip()):
+        if not token:
+            continue
+        try:
+            if '-' in token:
+                start, end = token.split('-', 1)
+                networks.extend(ipaddress.summarize_address_range(
+                    ipaddress.ip_address(start), ipaddress.ip_address(end)
+                ))
+            else:
+                networks.append(ipaddress.ip_network(token, strict=False))
+        except (ValueError, TypeError):
+            continue
+    return networks
+
+
+class IPIndex:
+    """In-process IP/CIDR index over client_assets and knowledge_base.
+
+    Every stored value is reduced to CIDR blocks (a single address is a /32 or
+    /128) and kept in one hash table per (version, prefix length). An address
+    lookup masks the address once per prefix length actually in use and probes
+    each table, so it costs a handful of dict lookups however many rows are
+    indexed. Range queries use a list of (first, last) integer intervals sorted
+    by first address, rebuilt lazily after changes, plus the same hash probe
+    for stored blocks that contain the queried one.
+
+    Like the KB search index it is built lazily and kept current through
+    ``refresh`` (per-table id high-water marks), ``reindex`` and ``remove``.
+    """
+
+    def __init__(self, sources=SOURCES):
+        self.sources = sources
+        self._lock = threading.RLock()
+        self._records = {}
+        self._entries = {}
+        self._networks = {}
+        self._prefixlens = {4: [], 6: []}
+        self._intervals = {4: [], 6: []}
+        self._intervals_dirty = False
+        self._max_ids = dict.fromkeys(sources, 0)
+        self._built = False
+
+    @property
+    def built(self):
+        return self._built
+
+    def __len__(self):
+        return len(self._entries)
+
+    # --- Maintenance ---
+
+    def build(self, conn):
+        with self._lock:
+            self._records = {}
+            self._entries = {}
+            self._networks = {}
+            self._prefixlens = {4: [], 6: []}
+            self._max_ids = dict.fromkeys(self.sources, 0)
+            for source in self.sources:
+                self._load(conn, source, 0)
+            self._intervals_dirty = True
+            self._built = True
+
+    def ensure_current(self, conn):
+        """Build on first use, otherwise pull in rows added since the last load."""
+        with self._lock:
+            if not self._built:
+                self.build(conn)
+            else:
+                self.refresh(conn)
+
+    def refresh(self, conn, source=None):
+        """Index rows above each table's id high-water mark; a no-op until the index is built."""
+        with self._lock:
+            if not self._built:
+                return
+            for name in ([source] if source else self.sources):
+                self._load(conn, name, self._max_ids[name])
+
+    def reindex(self, conn, source, column, values):
+        """Re-read rows of ``source`` whose ``column`` is in ``values`` (e.g. after an upsert)."""
+        with self._lock:
+            if not self._built or not values:
+                return
+            cursor = conn.cursor(dictionary=True)
+            alias = _ALIASES[source]
+            for start in range(0, len(values), LOAD_BATCH_SIZE):
+                batch = values[start:start + LOAD_BATCH_SIZE]
+                placeholders = ', '.join(['%s'] * len(batch))
+                cursor.execute(
+                    f"{self.sources[source]} WHERE {alias}.{column} IN ({placeholders})", tuple(batch)
+                )
+                self.add_rows(source, cursor.fetchall())
+            cursor.close()
+
+    def _load(self, conn, source, after_id):
+        alias = _ALIASES[source]
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            f"{self.sources[source]} WHERE {alias}.id > %s ORDER BY {alias}.id", (after_id,)
+        )
+        while True:
+            rows = cursor.fetchmany(LOAD_BATCH_SIZE)
+            if not rows:
+                break
+            self.add_rows(source, rows)
+        cursor.close()
+
+    def add_rows(self, source, rows):
+        with self._lock:
+            for row in rows:
+                self._add(source, row)
+            self._intervals_dirty = True
+
+    def _add(self, source, row):
+        key = (source, row['id'])
+        self._remove(key)
+        self._max_ids[source] = max(self._max_ids[source], row['id'])
+
+        networks = parse_ip_field(row.get('ip_address'))
+        if not networks:
+            return
+        self._records[key] = dict(row, source=source)
+        entries = []
+        for network in networks:
+            entry = (network.version, network.prefixlen, int(network.network_address))
+            entries.append(entry)
+            table_key = entry[:2]
+            table = self._networks.get(table_key)
+            if table is None:
+                table = self._networks[table_key] = {}
+                self._prefixlens[network.version] = sorted(
+                    self._prefixlens[network.version] + [network.prefixlen], reverse=True
+                )
+            table.setdefault(entry[2], set()).add(key)
+        self._entries[key] = entries
+
+    def remove(self, source, ids):
+        with self._lock:
+            for row_id in ids:
+                self._remove((source, int(row_id)))
+            self._intervals_dirty = True
+
+    def _remove(self, key):
+        self._records.pop(key, None)
+        for version, prefixlen, value in self._entries.pop(key, ()):
+            table = self._networks.get((version, prefixlen))
+            if table is None:
+                continue
+            bucket = table.get(value)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del table[value]
+            if not table:
+                del self._networks[(version, prefixlen)]
+                self._prefixlens[version].remove(prefixlen)
+
+    def _rebuild_intervals(self):
+        intervals = {4: [], 6: []}
+        for key, entries in self._entries.items():
+            for version, prefixlen, value in entries:
+                bits = 32 if version == 4 else 128
+                intervals[version].append((value, value + (1 << (bits - prefixlen)) - 1, key))
+        for version in intervals:
+            intervals[version].sort()
+        self._intervals = intervals
+        self._intervals_dirty = False
+
+    # --- Querying ---
+
+    def _containing(self, version, value, max_prefixlen):
+        """Keys of stored blocks (no longer than ``max_prefixlen``) that contain integer address ``value``."""
+        bits = 32 if version == 4 else 128
+        keys = set()
+        for prefixlen in self._prefixlens[version]:
+            if prefixlen > max_prefixlen:
+                continue
+            shift = bits - prefixlen
+            bucket = self._networks[(version, prefixlen)].get(value >> shift << shift)
+            if bucket:
+                keys |= bucket
+        return keys
+
+    def _matches(self, keys):
+        return [self._records[key] for key in sorted(keys)]
+
+    def lookup(self, ip):
+        """Rows whose ip_address is, contains or covers ``ip``. Raises ValueError for a bad address."""
+        address = ipaddress.ip_address(str(ip).strip())
+        with self._lock:
+            return self._matches(self._containing(address.version, int(address), address.max_prefixlen))
+
+    def lookup_network(self, cidr, limit=None):
+        """Rows whose addresses overlap the ``cidr`` block: inside it, or blocks containing it."""
+        network = ipaddress.ip_network(str(cidr).strip(), strict=False)
+        first = int(network.network_address)
+        last = int(network.broadcast_address)
+        with self._lock:
+            if self._intervals_dirty:
+                self._rebuild_intervals()
+            keys = self._containing(network.version, first, network.prefixlen)
+            intervals = self._intervals[network.version]
+            position = bisect_left(intervals, (first,))
+            while position < len(intervals) and intervals[position][0] <= last:
+                keys.add(intervals[position][2])
+                if limit is not None and len(keys) >= limit:
+                    break
+                position += 1
+            matches = self._matches(keys)
+        return matches[:limit] if limit is not None else matches
+
+    def lookup_many(self, values):
+        """Bulk lookup: ``{value: matches}`` for each address or CIDR, plus the values that didn't parse."""
+        results = {}
+        invalid = []
+        for value in values:
+            value = str(value).strip()
+            try:
+                results[value] = self.lookup_network(value) if '/' in value else self.lookup(value)
+            except ValueError:
+                invalid.append(value)
+        return results, invalid
+
+
+ip_index = IPIndex()
@@ -0,0 +1,113 @@
+import csv
+import io
+import os
+import tempfile
+from datetime import date, datetime
+
+from app.kb_query import iter_kb_rows
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'parquet': 'application/vnd.apache.parquet',
+}
+FILE_READ_SIZE = 64 * 1024
+
+
+class ExportDependencyError(RuntimeError):
+    """The optional library needed for an export format isn't installed."""
+
+
+def _cell(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def iter_csv(conn, fields, query=''):
+    """Yield the CSV export chunk by chunk, straight off the server-side cursor."""
+    columns = ['id'] + fields
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+
+    for rows in iter_kb_rows(conn, fields, query):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_cell(row[column]) for column in columns] for row in rows)
+        yield buffer.getvalue()
+
+
+def write_xlsx(conn, fields, query=''):
+    """Write the export to a temporary .xlsx with openpyxl's write-only (streaming) workbook."""
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ExportDependencyError("XLSX export requires openpyxl")
+
+    columns = ['id'] + fields
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("knowledge_base")
+    sheet.append(columns)
+    for rows in iter_kb_rows(conn, fields, query):
+        for row in rows:
+            sheet.append([_cell(row[column]) for column in columns])
+
+    fd, path = tempfile.mkstemp(prefix="kb-export-", suffix=".xlsx")
+    os.close(fd)
+    try:
+        workbook.save(path)
+    except BaseException:
+        remove_file(path)
+        raise
+    return path
+
+
+def write_parquet(conn, fields, query=''):
+    """Write the export to a temporary Parquet file, one row group per fetched chunk."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportDependencyError("Parquet export requires pyarrow")
+
+    schema = pa.schema([pa.field('id', pa.int64())] + [pa.field(field, pa.string()) for field in fields])
+    fd, path = tempfile.mkstemp(prefix="kb-export-", suffix=".parquet")
+    os.close(fd)
+    try:
+        with pq.ParquetWriter(path, schema) as writer:
+            for rows in iter_kb_rows(conn, fields, query):
+                batch = {'id': [row['id'] for row in rows]}
+                for field in fields:
+                    batch[field] = [None if row[field] is None else str(_cell(row[field])) for row in rows]
+                writer.write_table(pa.Table.from_pydict(batch, schema=schema))
+    except BaseException:
+        remove_file(path)
+        raise
+    return path
+
+
+def remove_file(path):
+    """Delete a temporary export file, ignoring one that is already gone."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def iter_file(path):
+    """Stream a finished export file from disk and delete it afterwards.
+
+    The response should also ``call_on_close(remove_file)``: a client that
+    disconnects before the first block never starts this generator.
+    """
+    try:
+        with open(path, 'rb') as export_file:
+            while True:
+                block = export_file.read(FILE_READ_SIZE)
+                if not block:
+                    break
+                yield block
+    finally:
+        remove_file(path)
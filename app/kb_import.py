@@ -0,0 +1,302 @@
+import difflib
+import logging
+import time
+
+import pandas as pd
+
+from app.kb_index import kb_index, KB_FIELDS
+from app.ip_index import ip_index
+
+logger = logging.getLogger(__name__)
+
+CSV_CHUNK_SIZE = 10000
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+DATE_COLUMNS = ['eos', 'eol', 'latest_firmware_release_date', 'end_of_support']
+NA_VALUES = ['Not yet declared', 'NA', 'na', 'N/A', '']
+
+# Natural keys an upsert import may match existing rows on
+UPSERT_KEYS = ['serial_number', 'host_name', 'ip_address']
+
+# Manual corrections for known header mismatches
+HEADER_CORRECTIONS = {'rack_no': 'rac_no', 'rack_qr_code': 'rac_qr_code'}
+
+
+class ImportFileError(ValueError):
+    """The uploaded file can't be imported at all (bad type or unmatched columns)."""
+
+
+class ImportCancelled(Exception):
+    """Raised between batches once an import's cancel event is set."""
+
+
+def normalize_header(columns):
+    columns = (
+        pd.Index(columns).astype(str)
+        .str.strip()
+        .str.lower()
+        .str.replace(' ', '_')
+        .str.replace('/', '_')
+    )
+    return [HEADER_CORRECTIONS.get(column, column) for column in columns]
+
+
+def match_columns(uploaded_columns, required_columns=KB_FIELDS):
+    """Fuzzy-match uploaded headers to KB columns; returns {uploaded: required}."""
+    column_mapping = {}
+    for required in required_columns:
+        match = difflib.get_close_matches(required, uploaded_columns, n=1, cutoff=0.6)
+        column_mapping[required] = match[0] if match else None
+
+    missing_mappings = [col for col, mapped in column_mapping.items() if mapped is None]
+    if missing_mappings:
+        raise ImportFileError(f"Missing required columns or unable to match: {', '.join(missing_mappings)}")
+    return {uploaded: required for required, uploaded in column_mapping.items()}
+
+
+def read_chunks(file, filename, chunksize=CSV_CHUNK_SIZE):
+    """Yield DataFrames of at most ``chunksize`` rows, all values as strings.
+
+    CSV is streamed with pandas' chunked reader; Excel workbooks have to be
+    parsed whole by pandas and are then sliced into chunks.
+    """
+    filename = filename.lower()
+    if filename.endswith('.csv'):
+        yield from pd.read_csv(file, dtype=str, keep_default_na=False, chunksize=chunksize)
+        return
+
+    if filename.endswith('.xlsx'):
+        df = pd.read_excel(file, engine='openpyxl', dtype=str, keep_default_na=False)
+    elif filename.endswith('.xls'):
+        df = pd.read_excel(file, engine='xlrd', dtype=str, keep_default_na=False)
+    else:
+        raise ImportFileError("Unsupported file type")
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+
+def normalize_chunk(df, column_mapping, required_columns=KB_FIELDS):
+    """Map, clean and type-coerce one chunk with vectorised pandas operations."""
+    df = df.rename(columns=column_mapping)
+    df = df.loc[:, ~df.columns.duplicated()].reindex(columns=required_columns)
+
+    df = df.astype(object).apply(lambda column: column.str.strip())
+    df = df.mask(df.isin(NA_VALUES))
+
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce').dt.strftime('%Y-%m-%d')
+
+    return df.astype(object).where(df.notna(), None)
+
+
+def new_report():
+    return {
+        "rows_parsed": 0,
+        "inserted": 0,
+        "updated": 0,
+        "unchanged": 0,
+        "duplicates_in_file": 0,
+        "rejected": 0,
+        "batches": 0,
+        "failed_batches": 0,
+        "errors": [],
+        "elapsed_seconds": 0.0,
+        "rows_per_sec": 0.0,
+    }
+
+
+def _record_error(report, error):
+    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+        report["errors"].append(error)
+
+
+def ensure_unique_key(conn, key):
+    """Make sure ``key`` carries a unique index so ON DUPLICATE KEY UPDATE can match on it."""
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("SHOW INDEX FROM knowledge_base WHERE Column_name = %s AND Non_unique = 0", (key,))
+        if any(row['Seq_in_index'] == 1 for row in cursor.fetchall()):
+            return
+        try:
+            cursor.execute(f"ALTER TABLE knowledge_base ADD UNIQUE INDEX uq_knowledge_base_{key} ({key})")
+        except Exception as e:
+            raise ImportFileError(
+                f"Cannot upsert on {key}: unable to add a unique index ({e}). "
+                f"Remove existing duplicate {key} values first."
+            )
+    finally:
+        cursor.close()
+
+
+class _BatchWriter:
+    """Writes batches of normalised rows with one multi-row statement each."""
+
+    def __init__(self, columns=KB_FIELDS):
+        self.columns = columns
+        self.row_placeholder = f"({', '.join(['%s'] * len(columns))})"
+        self.prefix = f"INSERT INTO knowledge_base ({', '.join(columns)}) VALUES "
+        self.suffix = ""
+
+    def _statement(self, row_count):
+        return self.prefix + ', '.join([self.row_placeholder] * row_count) + self.suffix
+
+    def write(self, conn, cursor, rows, report):
+        cursor.execute(self._statement(len(rows)), [value for row in rows for value in row])
+        report["inserted"] += len(rows)
+
+
+class _UpsertWriter(_BatchWriter):
+    """Multi-row INSERT ... ON DUPLICATE KEY UPDATE keyed on a natural key.
+
+    Per-row outcomes come from MySQL's affected-row convention (1 = inserted,
+    2 = updated, 0 = unchanged) combined with a count of keys that already
+    existed, so one extra indexed lookup per batch splits the three apart.
+    """
+
+    def __init__(self, key, columns=KB_FIELDS):
+        super().__init__(columns)
+        self.key = key
+        self.key_position = columns.index(key)
+        updates = ', '.join(f"{column} = VALUES({column})" for column in columns if column != key)
+        self.suffix = f" ON DUPLICATE KEY UPDATE {updates}"
+
+    def write(self, conn, cursor, rows, report):
+        keys = list({row[self.key_position] for row in rows if row[self.key_position] is not None})
+        existing = 0
+        if keys:
+            placeholders = ', '.join(['%s'] * len(keys))
+            cursor.execute(
+                f"SELECT COUNT(*) FROM knowledge_base WHERE {self.key} IN ({placeholders})", tuple(keys)
+            )
+            existing = cursor.fetchone()[0]
+
+        cursor.execute(self._statement(len(rows)), [value for row in rows for value in row])
+        inserted = len(rows) - existing
+        updated = (cursor.rowcount - inserted) // 2
+        report["inserted"] += inserted
+        report["updated"] += updated
+        report["unchanged"] += existing - updated
+
+        if updated:
+            # Updated rows keep their ids, so the id high-water mark won't pick them up
+            kb_index.reindex(conn, self.key, keys)
+            ip_index.reindex(conn, 'knowledge_base', self.key, keys)
+
+
+def _write_batch(conn, writer, rows, row_numbers, batch_number, report):
+    """Write one batch in a single statement; on failure, isolate the bad rows one by one."""
+    cursor = conn.cursor()
+    try:
+        writer.write(conn, cursor, rows, report)
+        conn.commit()
+        return
+    except Exception as batch_error:
+        conn.rollback()
+        report["failed_batches"] += 1
+        _record_error(report, {
+            "batch": batch_number,
+            "rows": f"{row_numbers[0]}-{row_numbers[-1]}",
+            "error": str(batch_error),
+        })
+    finally:
+        cursor.close()
+
+    cursor = conn.cursor()
+    try:
+        for row_number, values in zip(row_numbers, rows):
+            try:
+                writer.write(conn, cursor, [values], report)
+            except Exception as row_error:
+                report["rejected"] += 1
+                _record_error(report, {
+                    "batch": batch_number,
+                    "row": row_number,
+                    "error": str(row_error),
+                })
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+def _update_throughput(report, started):
+    elapsed = time.monotonic() - started
+    report["elapsed_seconds"] = round(elapsed, 3)
+    report["rows_per_sec"] = round(report["rows_parsed"] / elapsed, 1) if elapsed else 0.0
+
+
+def import_knowledge_base(conn, file, filename, batch_size=IMPORT_BATCH_SIZE, chunksize=CSV_CHUNK_SIZE,
+                          report=None, cancel_event=None, mode='insert', key=None):
+    """Bulk-load an uploaded CSV/XLSX into knowledge_base and return an import report.
+
+    Rows are written in batches of ``batch_size`` with one multi-row INSERT
+    each, committed on its own. A failing batch is retried row by row so that
+    only the offending rows are rejected; their file row numbers and errors
+    end up in the report instead of aborting the whole import.
+
+    With ``mode='upsert'`` rows are matched on the natural ``key`` (one of
+    UPSERT_KEYS): duplicates within the file are skipped (the first one wins,
+    across chunks too) and existing rows are updated in place via
+    INSERT ... ON DUPLICATE KEY UPDATE.
+    The report then splits rows into inserted, updated and unchanged.
+
+    ``report`` may be passed in to watch progress while the import runs; it is
+    updated after every batch. Setting ``cancel_event`` stops the import with
+    ImportCancelled before the next batch (already committed batches stay).
+    """
+    started = time.monotonic()
+    if report is None:
+        report = new_report()
+
+    if mode == 'upsert':
+        if key not in UPSERT_KEYS:
+            raise ImportFileError(f"Upsert key must be one of: {', '.join(UPSERT_KEYS)}")
+        ensure_unique_key(conn, key)
+        writer = _UpsertWriter(key)
+    elif mode == 'insert':
+        writer = _BatchWriter()
+    else:
+        raise ImportFileError("Import mode must be 'insert' or 'upsert'")
+
+    column_mapping = None
+    batch_number = 0
+    seen_keys = set()
+    for chunk in read_chunks(file, filename, chunksize):
+        chunk.columns = normalize_header(chunk.columns)
+        if column_mapping is None:
+            column_mapping = match_columns(chunk.columns.tolist())
+
+        df = normalize_chunk(chunk, column_mapping)
+        report["rows_parsed"] += len(df)
+        if mode == 'upsert':
+            # Earlier rows, in this chunk or a previous one, win; rows without a key can't collide and are kept as-is
+            keys = df[key]
+            duplicated = keys.notna() & (df.duplicated(subset=[key], keep='first') | keys.isin(seen_keys))
+            report["duplicates_in_file"] += int(duplicated.sum())
+            df = df[~duplicated]
+            seen_keys.update(df[key].dropna())
+
+        rows = list(df.itertuples(index=False, name=None))
+        row_numbers = (df.index + 1).tolist()
+
+        for start in range(0, len(rows), batch_size):
+            if cancel_event is not None and cancel_event.is_set():
+                _update_throughput(report, started)
+                raise ImportCancelled(f"Import cancelled after {report['rows_parsed']} rows")
+            batch_number += 1
+            _write_batch(conn, writer, rows[start:start + batch_size],
+                         row_numbers[start:start + batch_size], batch_number, report)
+            report["batches"] = batch_number
+            _update_throughput(report, started)
+
+    if column_mapping is None:
+        raise ImportFileError("The uploaded file contains no rows")
+
+    _update_throughput(report, started)
+    logger.info(
+        "KB import of %s: %s inserted, %s updated, %s unchanged, %s rejected in %ss (%s rows/sec)",
+        filename, report['inserted'], report['updated'], report['unchanged'], report['rejected'],
+        report['elapsed_seconds'], report['rows_per_sec']
+    )
+    return report
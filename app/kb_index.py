@@ -0,0 +1,228 @@
+import math
+import threading
+
+# Columns of knowledge_base that are searchable (and returned) by /api/kb-search
+KB_FIELDS = [
+    'location', 'family', 'class', 'manufacturer', 'model',
+    'serial_number', 'host_name', 'ip_address', 'criticality',
+    'eos', 'eol', 'latest_firmware_release_date', 'asset_owner',
+    'current_firmware_version', 'latest_firmware_version',
+    'end_of_support', 'integration_with_pim_tacacs', 'rac_no',
+    'rac_qr_code', 'device_position', 'device_qr', 'status'
+]
+
+GRAM_SIZE = 3
+LOAD_BATCH_SIZE = 5000
+
+
+def tokenize(value):
+    """Lower-cased whitespace tokens, so any space-free substring of a field lies inside one token."""
+    if value is None:
+        return []
+    return str(value).lower().split()
+
+
+def _grams(token):
+    """Distinct GRAM_SIZE-character substrings of ``token`` (the token itself if shorter)."""
+    if len(token) <= GRAM_SIZE:
+        return {token}
+    return {token[i:i + GRAM_SIZE] for i in range(len(token) - GRAM_SIZE + 1)}
+
+
+class KnowledgeBaseIndex:
+    """In-process inverted index over the knowledge_base search columns.
+
+    Documents are indexed by whitespace token (``token -> {id: term count}``)
+    and the token vocabulary is itself indexed by character n-grams, so a query
+    word is resolved to every token containing it (the same semantics as the
+    old ``field LIKE '%word%'``) without scanning rows. Multi-word queries AND
+    the per-word id sets together, smallest first, and results are ranked by
+    idf-weighted term counts with exact token matches scoring highest.
+
+    The index is built lazily from the table on first use and then kept current
+    through ``add_rows`` / ``remove`` / ``refresh``. Rows inserted by other
+    worker processes are picked up by ``refresh`` (id high-water mark); rows
+    they delete simply drop out when the matching ids are fetched.
+    """
+
+    def __init__(self, fields=KB_FIELDS):
+        self.fields = fields
+        self._lock = threading.RLock()
+        self._postings = {}
+        self._doc_tokens = {}
+        self._gram_index = {}
+        self._max_id = 0
+        self._built = False
+
+    @property
+    def built(self):
+        return self._built
+
+    def __len__(self):
+        return len(self._doc_tokens)
+
+    # --- Maintenance ---
+
+    def build(self, conn):
+        with self._lock:
+            self._postings = {}
+            self._doc_tokens = {}
+            self._gram_index = {}
+            self._max_id = 0
+            self._load(conn, 0)
+            self._built = True
+
+    def ensure_current(self, conn):
+        """Build on first use, otherwise pull in rows added since the last load."""
+        with self._lock:
+            if not self._built:
+                self.build(conn)
+            else:
+                self._load(conn, self._max_id)
+
+    def refresh(self, conn):
+        """Index rows with an id above the high-water mark; a no-op until the index is built."""
+        with self._lock:
+            if self._built:
+                self._load(conn, self._max_id)
+
+    def reindex(self, conn, column, values):
+        """Re-read rows whose ``column`` is in ``values`` (e.g. after an upsert changed them in place)."""
+        with self._lock:
+            if not self._built or not values:
+                return
+            cursor = conn.cursor(dictionary=True)
+            for start in range(0, len(values), LOAD_BATCH_SIZE):
+                batch = values[start:start + LOAD_BATCH_SIZE]
+                placeholders = ', '.join(['%s'] * len(batch))
+                cursor.execute(
+                    f"SELECT id, {', '.join(self.fields)} FROM knowledge_base WHERE {column} IN ({placeholders})",
+                    tuple(batch)
+                )
+                self.add_rows(cursor.fetchall())
+            cursor.close()
+
+    def _load(self, conn, after_id):
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            f"SELECT id, {', '.join(self.fields)} FROM knowledge_base WHERE id > %s ORDER BY id",
+            (after_id,)
+        )
+        while True:
+            rows = cursor.fetchmany(LOAD_BATCH_SIZE)
+            if not rows:
+                break
+            self.add_rows(rows)
+        cursor.close()
+
+    def add_rows(self, rows):
+        with self._lock:
+            for row in rows:
+                self._add(row['id'], row)
+
+    def _add(self, doc_id, row):
+        if doc_id in self._doc_tokens:
+            self._remove(doc_id)
+        tokens = []
+        for field in self.fields:
+            tokens.extend(tokenize(row.get(field)))
+        self._doc_tokens[doc_id] = tuple(tokens)
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                for gram in _grams(token):
+                    self._gram_index.setdefault(gram, set()).add(token)
+            postings[doc_id] = postings.get(doc_id, 0) + 1
+        self._max_id = max(self._max_id, doc_id)
+
+    def remove(self, ids):
+        with self._lock:
+            for doc_id in ids:
+                self._remove(int(doc_id))
+
+    def _remove(self, doc_id):
+        tokens = self._doc_tokens.pop(doc_id, None)
+        if not tokens:
+            return
+        for token in set(tokens):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[token]
+                for gram in _grams(token):
+                    bucket = self._gram_index.get(gram)
+                    if bucket is not None:
+                        bucket.discard(token)
+                        if not bucket:
+                            del self._gram_index[gram]
+
+    # --- Querying ---
+
+    def _matching_tokens(self, word):
+        if len(word) < GRAM_SIZE:
+            # Too short to narrow through the n-gram index; these match a large share of rows anyway
+            return [token for token in self._postings if word in token]
+        buckets = [self._gram_index.get(gram) for gram in _grams(word)]
+        if not all(buckets):
+            return []
+        buckets.sort(key=len)
+        candidates = buckets[0]
+        for bucket in buckets[1:]:
+            candidates = candidates & bucket
+            if not candidates:
+                return []
+        return [token for token in candidates if word in token]
+
+    def search(self, query):
+        """Return ids of rows matching every word of ``query``, best match first."""
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            return []
+
+        with self._lock:
+            per_word = []
+            for word in words:
+                tokens = self._matching_tokens(word)
+                if not tokens:
+                    return []
+                ids = set()
+                for token in tokens:
+                    ids.update(self._postings[token])
+                per_word.append((ids, word, tokens))
+
+            per_word.sort(key=lambda item: len(item[0]))
+            matched = per_word[0][0]
+            for ids, _, _ in per_word[1:]:
+                matched = matched & ids
+                if not matched:
+                    return []
+
+            total_docs = len(self._doc_tokens) or 1
+            scores = dict.fromkeys(matched, 0.0)
+            for _, word, tokens in per_word:
+                for token in tokens:
+                    postings = self._postings[token]
+                    idf = math.log(1 + total_docs / len(postings))
+                    if token == word:
+                        weight = 3.0
+                    elif token.startswith(word):
+                        weight = 2.0
+                    else:
+                        weight = 1.0
+                    if len(postings) < len(scores):
+                        for doc_id, count in postings.items():
+                            if doc_id in scores:
+                                scores[doc_id] += weight * idf * count
+                    else:
+                        for doc_id in scores:
+                            count = postings.get(doc_id)
+                            if count:
+                                scores[doc_id] += weight * idf * count
+
+        return sorted(scores, key=lambda doc_id: (-scores[doc_id], doc_id))
+
+
+kb_index = KnowledgeBaseIndex()
@@ -0,0 +1,67 @@
+from app.kb_index import kb_index, KB_FIELDS
+
+# Rows pulled from the server-side cursor (or fetched by id) per chunk
+STREAM_CHUNK_SIZE = 1000
+MAX_PAGE_SIZE = 5000
+
+
+def parse_fields(raw_fields):
+    """Turn a ``fields=a,b,c`` projection into a validated column list (``id`` is always returned)."""
+    if not raw_fields:
+        return list(KB_FIELDS)
+    requested = [field.strip() for field in raw_fields.split(',') if field.strip()]
+    unknown = [field for field in requested if field != 'id' and field not in KB_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return [field for field in dict.fromkeys(requested) if field != 'id']
+
+
+def iter_kb_rows(conn, fields, query='', after_id=None, limit=None, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield lists of knowledge_base rows (``id`` plus ``fields``) matching ``query``.
+
+    Without a query the table is read through an unbuffered cursor in id order,
+    so memory stays bounded by ``chunk_size``. With a query, matching ids come
+    from the inverted index and are fetched in id batches: in rank order, or in
+    id order when paginating with ``after_id``/``limit`` (keyset on ``id``).
+    """
+    columns = ', '.join(['id'] + fields)
+    cursor = conn.cursor(dictionary=True)
+    try:
+        if not query:
+            sql = f"SELECT {columns} FROM knowledge_base"
+            params = []
+            if after_id is not None:
+                sql += " WHERE id > %s"
+                params.append(after_id)
+            sql += " ORDER BY id"
+            if limit is not None:
+                sql += " LIMIT %s"
+                params.append(limit)
+            cursor.execute(sql, tuple(params))
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+            return
+
+        kb_index.ensure_current(conn)
+        ids = kb_index.search(query)
+        if after_id is not None or limit is not None:
+            ids = sorted(row_id for row_id in ids if after_id is None or row_id > after_id)
+
+        # Ids of rows deleted since the index was built come back empty; keep drawing until ``limit`` rows are found
+        position = 0
+        while position < len(ids) and (limit is None or limit > 0):
+            batch = ids[position:position + (chunk_size if limit is None else min(chunk_size, limit))]
+            position += len(batch)
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(f"SELECT {columns} FROM knowledge_base WHERE id IN ({placeholders})", tuple(batch))
+            rows_by_id = {row['id']: row for row in cursor.fetchall()}
+            rows = [rows_by_id[row_id] for row_id in batch if row_id in rows_by_id]
+            if limit is not None:
+                limit -= len(rows)
+            if rows:
+                yield rows
+    finally:
+        cursor.close()
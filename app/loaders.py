@@ -0,0 +1,39 @@
+# Parent keys per IN (...) query
+LOAD_BATCH_SIZE = 1000
+
+
+def load_related(cursor, query, key_column, keys, batch_size=LOAD_BATCH_SIZE):
+    """Fetch child rows for a whole set of parents, grouped by parent key.
+
+    ``query`` selects from the child table and contains one ``{keys}``
+    placeholder for the IN list, e.g.
+    ``"SELECT id, client_tech_map_id, email FROM client_tech_contacts
+    WHERE client_tech_map_id IN ({keys}) ORDER BY id"``. It costs one query
+    per ``batch_size`` parents instead of one per parent. ``cursor`` must be a
+    dictionary cursor; returns ``{key: [rows]}`` with rows in query order.
+    """
+    keys = list(dict.fromkeys(key for key in keys if key is not None))
+    grouped = {}
+    for start in range(0, len(keys), batch_size):
+        batch = keys[start:start + batch_size]
+        cursor.execute(query.format(keys=', '.join(['%s'] * len(batch))), tuple(batch))
+        for row in cursor.fetchall():
+            grouped.setdefault(row[key_column], []).append(row)
+    return grouped
+
+
+def attach_related(cursor, parents, attr, query, key_column, parent_key='id', keep_key=False):
+    """Set ``parent[attr]`` to the list of its child rows (``[]`` if none) for every parent.
+
+    Children come from one batched ``load_related`` call. Unless
+    ``keep_key`` is set, the foreign key column is dropped from the child
+    rows, since it repeats the parent's key.
+    """
+    grouped = load_related(cursor, query, key_column, (parent[parent_key] for parent in parents))
+    for parent in parents:
+        children = grouped.get(parent[parent_key], [])
+        if not keep_key:
+            for child in children:
+                child.pop(key_column, None)
+        parent[attr] = children
+    return parents
@@ -0,0 +1,163 @@
+import hashlib
+import logging
+import os
+import threading
+
+from app.db import db_connection
+from app.mail_outbox import enqueue, mail_outbox
+
+logger = logging.getLogger(__name__)
+
+MAIL_DIGEST_ENABLED = os.environ.get("MAIL_DIGEST_ENABLED", "1") == "1"
+# Seconds a recipient's first pending advisory waits before their digest is sent
+MAIL_DIGEST_WINDOW = int(os.environ.get("MAIL_DIGEST_WINDOW", 3600))
+# Dispatches without an explicit mode use this: "immediate" or "digest"
+MAIL_DIGEST_DEFAULT_MODE = os.environ.get("MAIL_DIGEST_DEFAULT_MODE", "immediate")
+# Seconds between checks for digests that are due
+MAIL_DIGEST_CHECK_INTERVAL = float(os.environ.get("MAIL_DIGEST_CHECK_INTERVAL", 60))
+
+
+def advisory_key(subject, body, advisory_id=None):
+    """What makes two dispatches the same advisory for deduplication."""
+    if advisory_id is not None:
+        return f"advisory:{advisory_id}"
+    return "sha1:" + hashlib.sha1(f"{subject}\0{body}".encode('utf-8')).hexdigest()
+
+
+def collect(cursor, subject, body, recipients, advisory_id=None, client_tech_map_id=None):
+    """Hold an advisory for each recipient's next digest; returns the number of recipients.
+
+    Runs in the caller's transaction.
+    """
+    key = advisory_key(subject, body, advisory_id)
+    recipients = {email.strip().lower() for email in recipients if email and email.strip()}
+    cursor.executemany(
+        """
+        INSERT INTO mail_digest_items (recipient, advisory_key, advisory_id, client_tech_map_id, subject, body)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        """,
+        [(email, key, advisory_id, client_tech_map_id, subject, body) for email in sorted(recipients)]
+    )
+    return len(recipients)
+
+
+def render_digest(items):
+    """Subject and body of one recipient's digest; ``items`` are already deduplicated."""
+    if len(items) == 1:
+        return items[0]['subject'], items[0]['body']
+    subject = f"Security advisory digest: {len(items)} advisories"
+    body = f"This digest consolidates {len(items)} advisories sent to you since the last one.\n"
+    for index, item in enumerate(items, 1):
+        body += f"\n---\n**{index}. {item['subject']}**\n\n{item['body']}\n"
+    return subject, body
+
+
+class DigestBuilder:
+    """Background thread turning due ``mail_digest_items`` into one outbox message per recipient.
+
+    A recipient is due once their oldest pending item is MAIL_DIGEST_WINDOW
+    seconds old. Their items are locked (SELECT ... FOR UPDATE), collapsed
+    to one entry per advisory however many ``client_tech_contacts`` rows
+    reached them, queued as a single message and stamped with its outbox id,
+    all in one transaction, so concurrent builders can't send a digest twice.
+    """
+
+    def __init__(self, window=MAIL_DIGEST_WINDOW, interval=MAIL_DIGEST_CHECK_INTERVAL):
+        self.window = window
+        self.interval = interval
+        self.last_run = None
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._loop, name="mail-digest", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stopping.is_set():
+            try:
+                self.flush_due()
+            except Exception as e:
+                logger.exception("Error building mail digests: %s", e)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def flush_due(self, window=None):
+        """Queue the digest of every due recipient (``window=0`` flushes everyone); returns how many."""
+        window = self.window if window is None else window
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(
+                """
+                SELECT recipient FROM mail_digest_items
+                WHERE outbox_id IS NULL
+                GROUP BY recipient
+                HAVING MIN(created_at) <= NOW() - INTERVAL %s SECOND
+                """,
+                (window,)
+            )
+            recipients = [row['recipient'] for row in cursor.fetchall()]
+            sent = 0
+            for recipient in recipients:
+                try:
+                    sent += self._flush_recipient(cursor, recipient)
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    logger.exception("Error building digest for %s: %s", recipient, e)
+            cursor.close()
+        if sent:
+            mail_outbox.wake()
+        self.last_run = {"recipients": sent}
+        return sent
+
+    def _flush_recipient(self, cursor, recipient):
+        cursor.execute(
+            """
+            SELECT id, advisory_key, advisory_id, subject, body FROM mail_digest_items
+            WHERE recipient = %s AND outbox_id IS NULL
+            ORDER BY id
+            FOR UPDATE
+            """,
+            (recipient,)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            return 0
+        items = list({row['advisory_key']: row for row in rows}.values())
+        subject, body = render_digest(items)
+        outbox_id = enqueue(cursor, subject, body, [recipient])[0]
+        ids = [row['id'] for row in rows]
+        placeholders = ', '.join(['%s'] * len(ids))
+        cursor.execute(
+            f"UPDATE mail_digest_items SET outbox_id = %s WHERE id IN ({placeholders})",
+            (outbox_id, *ids)
+        )
+        return 1
+
+
+def digest_status(cursor, advisory_id):
+    """Per-recipient digest state of an advisory: pending, or the outbox message it went out in."""
+    cursor.execute(
+        """
+        SELECT di.recipient, di.created_at, di.outbox_id,
+               COALESCE(mo.status, 'digest_pending') AS status, mo.sent_at, mo.last_error
+        FROM mail_digest_items di
+        LEFT JOIN mail_outbox mo ON mo.id = di.outbox_id
+        WHERE di.advisory_id = %s
+        ORDER BY di.id
+        """,
+        (advisory_id,)
+    )
+    return cursor.fetchall()
+
+
+digest_builder = DigestBuilder()
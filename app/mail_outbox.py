@@ -0,0 +1,293 @@
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from app.db import db_connection
+from app.http_clients import graph_http, CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+GRAPH_ENDPOINT = os.environ.get("GRAPH_ENDPOINT", "https://graph.microsoft.com/v1.0")
+# Mailbox the advisories are sent from (needs Mail.Send application permission)
+GRAPH_SENDER = os.environ.get("GRAPH_SENDER", "YOUR_SENDER_EMAIL")
+
+MAIL_OUTBOX_ENABLED = os.environ.get("MAIL_OUTBOX_ENABLED", "1") == "1"
+MAIL_WORKERS = int(os.environ.get("MAIL_WORKERS", 4))
+# Recipients per sendMail call; larger contact lists are split into several outbox messages
+MAIL_MAX_RECIPIENTS = int(os.environ.get("MAIL_MAX_RECIPIENTS", 100))
+MAIL_MAX_ATTEMPTS = int(os.environ.get("MAIL_MAX_ATTEMPTS", 8))
+MAIL_RETRY_BASE = float(os.environ.get("MAIL_RETRY_BASE", 30))
+MAIL_RETRY_MAX = float(os.environ.get("MAIL_RETRY_MAX", 3600))
+MAIL_SEND_TIMEOUT = float(os.environ.get("MAIL_SEND_TIMEOUT", 15))
+# Seconds idle workers wait before checking for due messages written by other processes
+MAIL_POLL_INTERVAL = float(os.environ.get("MAIL_POLL_INTERVAL", 5))
+# A message claimed longer ago than this (its worker died mid-send) goes back to pending
+MAIL_CLAIM_TIMEOUT = int(os.environ.get("MAIL_CLAIM_TIMEOUT", 300))
+
+# Responses worth retrying: throttling, upstream failures, and an expired/rejected token
+RETRYABLE_STATUS = {401, 408, 429, 500, 502, 503, 504}
+
+# ``deferred``: nothing was sent (the upstream's circuit is open), so the try doesn't count as an attempt
+DeliveryResult = namedtuple("DeliveryResult", "status_code retry_after error deferred", defaults=(False,))
+
+
+def parse_retry_after(value, now=None):
+    """Seconds to wait from a Retry-After header (delta-seconds or an HTTP date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - (now or datetime.now(timezone.utc))).total_seconds())
+
+
+def retry_delay(attempts, retry_after=None):
+    """Exponential backoff with jitter for the given attempt count, never shorter than Retry-After."""
+    delay = min(MAIL_RETRY_MAX, MAIL_RETRY_BASE * 2 ** max(0, attempts - 1)) * random.uniform(0.8, 1.2)
+    return max(delay, retry_after or 0)
+
+
+class GraphMailSender:
+    """Sends one message through Microsoft Graph ``sendMail``.
+
+    ``token_provider`` returns a bearer token (and is told to ``invalidate``
+    it after a 401, if it can); ``endpoint`` and ``sender`` default to
+    GRAPH_ENDPOINT / GRAPH_SENDER, so the outbox can be pointed at a local
+    fake Graph server. Requests go through the pooled, circuit-broken
+    ``graph_http`` client.
+    """
+
+    def __init__(self, token_provider, endpoint=None, sender=None, timeout=MAIL_SEND_TIMEOUT, http_client=graph_http):
+        self.token_provider = token_provider
+        self.endpoint = endpoint or GRAPH_ENDPOINT
+        self.sender = sender or GRAPH_SENDER
+        self.timeout = timeout
+        self.http_client = http_client
+
+    def send(self, subject, body, recipients):
+        try:
+            access_token = self.token_provider()
+            response = self.http_client.post(
+                f"{self.endpoint}/users/{self.sender}/sendMail",
+                headers={'Authorization': f'Bearer {access_token}', 'Content-Type': 'application/json'},
+                json={
+                    "message": {
+                        "subject": subject,
+                        "body": {"contentType": "Text", "content": body},
+                        "toRecipients": [{"emailAddress": {"address": email}} for email in recipients],
+                    },
+                    "saveToSentItems": "true",
+                },
+                timeout=(self.http_client.timeout[0], self.timeout),
+            )
+        except CircuitOpenError as e:
+            return DeliveryResult(None, e.retry_after, str(e), deferred=True)
+        except Exception as e:
+            return DeliveryResult(None, None, str(e))
+        if response.status_code in (200, 202):
+            return DeliveryResult(response.status_code, None, None)
+        if response.status_code == 401 and hasattr(self.token_provider, 'invalidate'):
+            self.token_provider.invalidate()
+        return DeliveryResult(
+            response.status_code,
+            parse_retry_after(response.headers.get('Retry-After')),
+            response.text[:2000] or f"HTTP {response.status_code}",
+        )
+
+
+def enqueue(cursor, subject, body, recipients, advisory_id=None, client_tech_map_id=None):
+    """Add a message to the outbox (one row per MAIL_MAX_RECIPIENTS recipients); returns the row ids.
+
+    Runs in the caller's transaction, so the message is queued only if the
+    caller commits. Call ``mail_outbox.wake()`` after committing.
+    """
+    recipients = list({email.strip().lower(): email.strip() for email in recipients if email and email.strip()}.values())
+    ids = []
+    for start in range(0, len(recipients), MAIL_MAX_RECIPIENTS):
+        cursor.execute(
+            """
+            INSERT INTO mail_outbox (advisory_id, client_tech_map_id, subject, body, recipients, status, next_attempt_at)
+            VALUES (%s, %s, %s, %s, %s, 'pending', NOW())
+            """,
+            (advisory_id, client_tech_map_id, subject, body,
+             json.dumps(recipients[start:start + MAIL_MAX_RECIPIENTS]))
+        )
+        ids.append(cursor.lastrowid)
+    return ids
+
+
+def delivery_status(cursor, advisory_id):
+    """Outbox messages recorded for an advisory, oldest first."""
+    cursor.execute(
+        """
+        SELECT id, status, attempts, recipients, last_status_code, last_error,
+               created_at, next_attempt_at, sent_at
+        FROM mail_outbox WHERE advisory_id = %s ORDER BY id
+        """,
+        (advisory_id,)
+    )
+    messages = cursor.fetchall()
+    for message in messages:
+        message['recipients'] = json.loads(message['recipients'])
+    return messages
+
+
+class MailOutbox:
+    """Pool of dispatcher threads draining the persistent ``mail_outbox`` table.
+
+    A worker claims one due message with a single UPDATE ... LIMIT 1 stamped
+    with a fresh claim token, so workers in any number of processes never
+    send the same row twice. A send answered with 429, 5xx or a network error
+    is rescheduled with exponential backoff (at least the Retry-After the
+    server asked for) until MAIL_MAX_ATTEMPTS; other errors fail the message
+    at once. A send skipped because Graph's circuit is open is put back for
+    when the breaker resets without using up an attempt. Results are only
+    written while the worker still holds its claim token.
+    """
+
+    def __init__(self, workers=MAIL_WORKERS, poll_interval=MAIL_POLL_INTERVAL):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.sender = None
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._last_requeue = 0.0
+
+    def start(self, sender):
+        self.sender = sender
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        if self._threads:
+            return
+        self._stopping.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"mail-outbox-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+
+    def wake(self):
+        """Have idle workers look for due messages now."""
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stopping.is_set():
+            try:
+                self._requeue_stale()
+                job = self._claim()
+            except Exception as e:
+                logger.exception("Error claiming outbox message: %s", e)
+                job = None
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            try:
+                self._deliver(job)
+            except Exception as e:
+                logger.exception("Error delivering outbox message %s: %s", job['id'], e)
+
+    def _requeue_stale(self):
+        if time.time() - self._last_requeue < 60:
+            return
+        self._last_requeue = time.time()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE mail_outbox SET status = 'pending', next_attempt_at = NOW() "
+                "WHERE status = 'sending' AND claimed_at < NOW() - INTERVAL %s SECOND",
+                (MAIL_CLAIM_TIMEOUT,)
+            )
+            conn.commit()
+            cursor.close()
+
+    def _claim(self):
+        token = uuid.uuid4().hex
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(
+                """
+                UPDATE mail_outbox
+                SET status = 'sending', claim_token = %s, claimed_at = NOW(), attempts = attempts + 1
+                WHERE status = 'pending' AND next_attempt_at <= NOW()
+                ORDER BY next_attempt_at, id
+                LIMIT 1
+                """,
+                (token,)
+            )
+            conn.commit()
+            if cursor.rowcount != 1:
+                cursor.close()
+                return None
+            cursor.execute(
+                "SELECT id, claim_token, subject, body, recipients, attempts FROM mail_outbox WHERE claim_token = %s",
+                (token,)
+            )
+            job = cursor.fetchone()
+            cursor.close()
+        job['recipients'] = json.loads(job['recipients'])
+        return job
+
+    def _deliver(self, job):
+        result = self.sender.send(job['subject'], job['body'], job['recipients'])
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            if result.error is None:
+                cursor.execute(
+                    "UPDATE mail_outbox SET status = 'sent', sent_at = NOW(), last_status_code = %s, "
+                    "last_error = NULL WHERE id = %s AND claim_token = %s",
+                    (result.status_code, job['id'], job['claim_token'])
+                )
+            elif result.deferred:
+                cursor.execute(
+                    "UPDATE mail_outbox SET status = 'pending', attempts = attempts - 1, last_error = %s, "
+                    "next_attempt_at = NOW() + INTERVAL %s SECOND WHERE id = %s AND claim_token = %s",
+                    (result.error, max(1, int(math.ceil(result.retry_after or 1))), job['id'], job['claim_token'])
+                )
+            elif (result.status_code is None or result.status_code in RETRYABLE_STATUS) \
+                    and job['attempts'] < MAIL_MAX_ATTEMPTS:
+                cursor.execute(
+                    "UPDATE mail_outbox SET status = 'pending', last_status_code = %s, last_error = %s, "
+                    "next_attempt_at = NOW() + INTERVAL %s SECOND WHERE id = %s AND claim_token = %s",
+                    (result.status_code, result.error, int(retry_delay(job['attempts'], result.retry_after)),
+                     job['id'], job['claim_token'])
+                )
+            else:
+                cursor.execute(
+                    "UPDATE mail_outbox SET status = 'failed', last_status_code = %s, last_error = %s "
+                    "WHERE id = %s AND claim_token = %s",
+                    (result.status_code, result.error, job['id'], job['claim_token'])
+                )
+            conn.commit()
+            cursor.close()
+
+    def stats(self):
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT status, COUNT(*) FROM mail_outbox GROUP BY status")
+            counts = dict(cursor.fetchall())
+            cursor.close()
+        return {
+            "workers": sum(thread.is_alive() for thread in self._threads),
+            "messages": counts,
+        }
+
+
+mail_outbox = MailOutbox()
@@ -1,25 +1,52 @@
-from flask import request, Flask, jsonify
+from flask import request, Flask, jsonify, Response, stream_with_context
 from flask_cors import CORS
 from app.auth import authenticate_user
-from app.db import get_db_connection
+from app.db import db_connection, get_pool, PoolExhaustedError
+from app.kb_index import kb_index
+from app.ip_index import ip_index, MAX_BULK_LOOKUPS
+from app.kb_query import iter_kb_rows, parse_fields, MAX_PAGE_SIZE
+from app.kb_import import IMPORT_BATCH_SIZE, UPSERT_KEYS
+from app.import_jobs import import_jobs
+from app.feeds import feed_cache
+from app.feed_poller import feed_poller, FEED_POLLER_ENABLED
+from app.feed_rules import feed_rules, validate_rule, FeedRuleError
+from app.findings import get_finding, release_findings
+from app.drafts import rebase_draft
+from app.advisory_query import (
+    list_advisories, get_advisory, AdvisoryCursorError, ADVISORY_PAGE_SIZE, ADVISORY_MAX_PAGE_SIZE
+)
+from app.search import search as full_text_search, SOURCES as SEARCH_SOURCES, SEARCH_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE
+from app.advisory_fanout import AdvisoryTemplate, BULK_ADVISORY_TEMPLATE, fan_out_advisories
+from app.versions import is_range_expression, parse_range, VersionRangeError
+from app.tech_index import tech_index
+from app.loaders import attach_related
+from app.client_overview import client_overview_cache, load_client_overview
+from app import mail_outbox as outbox
+from app.mail_outbox import mail_outbox, GraphMailSender, MAIL_OUTBOX_ENABLED
+from app import mail_digest as digest
+from app.mail_digest import digest_builder, MAIL_DIGEST_ENABLED, MAIL_DIGEST_DEFAULT_MODE
+from app.http_clients import GraphTokenProvider, graph_http, login_http, feed_http
+from app.kb_export import EXPORT_FORMATS, ExportDependencyError, iter_csv, write_xlsx, write_parquet, iter_file, remove_file
 from datetime import datetime, timedelta
 import bcrypt
+import logging
 import os
 from flask import send_from_directory
 import mysql.connector
-import pandas as pd
 from app.token_utils import generate_token
 from app.token_utils import validate_token as verify_token
 from datetime import datetime
 from itertools import groupby
 from operator import itemgetter
-import msal
-import requests
 import certifi
-import feedparser
 from flask_mail import Mail, Message
 from io import BytesIO
 import zipfile
+import hashlib
+import threading
+from contextlib import ExitStack
+
+logger = logging.getLogger(__name__)
 
 
 
@@ -31,22 +58,17 @@ AZURE_TENANT_ID = 'YOUR_TENANT_ID'
 AZURE_CLIENT_ID = 'YOUR_CLIENT_ID'
 AZURE_CLIENT_SECRET = 'YOUR_CLIENT_SECRET'
 GRAPH_SCOPE = ['https://graph.microsoft.com/.default']
-GRAPH_ENDPOINT = 'https://graph.microsoft.com/v1.0'
 
 
 
+# One MSAL client and token for the process, refreshed ahead of expiry
+graph_tokens = GraphTokenProvider(
+    AZURE_TENANT_ID, AZURE_CLIENT_ID, AZURE_CLIENT_SECRET, GRAPH_SCOPE, http_client=login_http
+)
+
+
 def get_graph_access_token():
-    authority = f'https://login.microsoftonline.com/{AZURE_TENANT_ID}'
-    app = msal.ConfidentialClientApplication(
-        client_id=AZURE_CLIENT_ID,
-        client_credential=AZURE_CLIENT_SECRET,
-        authority=authority
-    )
-    result = app.acquire_token_for_client(scopes=GRAPH_SCOPE)
-    if 'access_token' in result:
-        return result['access_token']
-    else:
-        raise Exception(result.get('error_description') or 'Failed to get access token')
+    return graph_tokens()
 
 
 
@@ -55,33 +77,117 @@ PDF_DIR = os.path.join(os.getcwd(), "pdfs")
 os.makedirs(PDF_DIR, exist_ok=True)
 
 
+def reraise_pool_exhausted(e):
+    """Let PoolExhaustedError out of a handler's catch-all so handle_pool_exhausted answers it with a 503."""
+    if isinstance(e, PoolExhaustedError):
+        raise e
+
+
+def warm_indexes():
+    """Build the in-process indexes in the background so the first request doesn't pay for them."""
+    def build():
+        for name, index in (("knowledge base", kb_index), ("IP lookup", ip_index), ("tech stack", tech_index)):
+            try:
+                with db_connection() as conn:
+                    index.ensure_current(conn)
+            except Exception as e:
+                logger.exception("Error building %s index: %s", name, e)
+
+    threading.Thread(target=build, name="index-warmup", daemon=True).start()
+
+
 def setup_routes(app):
+    warm_indexes()
+    if FEED_POLLER_ENABLED:
+        feed_poller.start()
+    if MAIL_OUTBOX_ENABLED:
+        mail_outbox.start(GraphMailSender(graph_tokens))
+    if MAIL_DIGEST_ENABLED:
+        digest_builder.start()
+
     @app.route("/")
     def home():
         return jsonify({"message": "API is running!"})
+
+    @app.errorhandler(PoolExhaustedError)
+    def handle_pool_exhausted(e):
+        # Handlers that catch Exception pass it through reraise_pool_exhausted so it always ends up here
+        response = jsonify({"error": str(e)})
+        response.headers['Retry-After'] = str(max(1, int(get_pool().checkout_timeout)))
+        return response, 503
+
+    @app.route('/api/metrics/db-pool', methods=['GET'])
+    def db_pool_metrics():
+        return jsonify(get_pool().stats())
+
+    @app.route('/api/metrics/feed-cache', methods=['GET'])
+    def feed_cache_metrics():
+        return jsonify(feed_cache.stats())
     
     
     @app.route('/api/shifts/<int:shift_id>/notes', methods=['GET'])
     def get_shift_notes(shift_id):
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            
-            # Simplified query - just get notes with employee_id
-            query = """
-                SELECT employee_id, note, created_at
-                FROM handover_notes
-                WHERE shift_id = %s
-            """
-            cursor.execute(query, (shift_id,))
-            notes = cursor.fetchall()
-            
-            cursor.close()
-            conn.close()
-            
+            with db_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+
+                # Simplified query - just get notes with employee_id
+                query = """
+                    SELECT employee_id, note, created_at
+                    FROM handover_notes
+                    WHERE shift_id = %s
+                """
+                cursor.execute(query, (shift_id,))
+                notes = cursor.fetchall()
+
+                cursor.close()
+
             return jsonify(notes)
         except Exception as e:
+            reraise_pool_exhausted(e)
+            return jsonify({"error": str(e)}), 500
+
+    @app.route('/api/search', methods=['GET'])
+    def search_history():
+        """Full-text search over advisories and shift handover notes, best match first.
+
+        Query parameters:
+            q        -- words that must all appear; terms like CVE-2025-1234 match as phrases
+            type     -- comma-separated sources: "advisories", "notes" (default both)
+            client_id, status, service_or_os -- advisory filters
+            shift_id, employee_id            -- note filters
+            since, until -- ISO dates bounding the advisory timestamp / note date
+            limit    -- results per source (default 20)
+        """
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({"error": "q is required"}), 400
+        sources = [name.strip() for name in request.args.get('type', ','.join(SEARCH_SOURCES)).split(',') if name.strip()]
+        unknown = [name for name in sources if name not in SEARCH_SOURCES]
+        if unknown or not sources:
+            return jsonify({"error": f"type must be any of: {', '.join(SEARCH_SOURCES)}"}), 400
+        limit = request.args.get('limit', SEARCH_PAGE_SIZE, type=int)
+        if not 1 <= limit <= SEARCH_MAX_PAGE_SIZE:
+            return jsonify({"error": f"limit must be between 1 and {SEARCH_MAX_PAGE_SIZE}"}), 400
+        try:
+            since = datetime.fromisoformat(request.args['since']) if request.args.get('since') else None
+            until = datetime.fromisoformat(request.args['until']) if request.args.get('until') else None
+        except ValueError:
+            return jsonify({"error": "since and until must be ISO dates"}), 400
+
+        results = {"query": query}
+        try:
+            with db_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                for source in sources:
+                    filters = {name: request.args[name] for name in SEARCH_SOURCES[source][1] if request.args.get(name)}
+                    results[source] = full_text_search(cursor, source, query, filters, since, until, limit)
+                cursor.close()
+        except Exception as e:
+            reraise_pool_exhausted(e)
+            logger.exception("Error searching %s for %r: %s", sources, query, e)
             return jsonify({"error": str(e)}), 500
+        return jsonify(results)
 
     @app.route('/api/save_notes', methods=['POST'])
     def save_notes():
@@ -94,43 +200,43 @@ def setup_routes(app):
             return jsonify({"error": "Missing required fields"}), 400
 
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute(
-                "SELECT id FROM shift_employee_map WHERE shift_id = %s AND employee_id = %s",
-                (shift_id, employee_id)
-            )
-            if not cursor.fetchone():
-                return jsonify({"error": "Employee not in this shift"}), 403
-            
-            cursor.execute(
-                "SELECT id FROM handover_notes WHERE shift_id = %s AND employee_id = %s",
-                (shift_id, employee_id)
-            )
-            existing_note = cursor.fetchone()
-            
-            if existing_note:
-                query = """
-                    UPDATE handover_notes
-                    SET note = %s, created_at = NOW()
-                    WHERE shift_id = %s AND employee_id = %s
-                """
-                cursor.execute(query, (note, shift_id, employee_id))
-            else:
-                query = """
-                    INSERT INTO handover_notes (shift_id, employee_id, note, created_at)
-                    VALUES (%s, %s, %s, NOW())
-                """
-                cursor.execute(query, (shift_id, employee_id, note))
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            
+            with db_connection() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute(
+                    "SELECT id FROM shift_employee_map WHERE shift_id = %s AND employee_id = %s",
+                    (shift_id, employee_id)
+                )
+                if not cursor.fetchone():
+                    return jsonify({"error": "Employee not in this shift"}), 403
+
+                cursor.execute(
+                    "SELECT id FROM handover_notes WHERE shift_id = %s AND employee_id = %s",
+                    (shift_id, employee_id)
+                )
+                existing_note = cursor.fetchone()
+
+                if existing_note:
+                    query = """
+                        UPDATE handover_notes
+                        SET note = %s, created_at = NOW()
+                        WHERE shift_id = %s AND employee_id = %s
+                    """
+                    cursor.execute(query, (note, shift_id, employee_id))
+                else:
+                    query = """
+                        INSERT INTO handover_notes (shift_id, employee_id, note, created_at)
+                        VALUES (%s, %s, %s, NOW())
+                    """
+                    cursor.execute(query, (shift_id, employee_id, note))
+
+                conn.commit()
+                cursor.close()
+
             return jsonify({"message": "Notes saved successfully"}), 200
             
         except Exception as e:
+            reraise_pool_exhausted(e)
             return jsonify({"error": str(e)}), 500
     
 
@@ -146,40 +252,40 @@ def setup_routes(app):
             return jsonify({"error": "Missing required fields"}), 400
 
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
+            with db_connection() as conn:
+                cursor = conn.cursor()
 
-            query = """
-                UPDATE shift_employee_map
-                SET cab_facility = %s
-                WHERE shift_id = %s AND employee_id = %s
-            """
-            cursor.execute(query, (cab_facility, shift_id, employee_id))
-            conn.commit()
-            cursor.close()
-            conn.close()
+                query = """
+                    UPDATE shift_employee_map
+                    SET cab_facility = %s
+                    WHERE shift_id = %s AND employee_id = %s
+                """
+                cursor.execute(query, (cab_facility, shift_id, employee_id))
+                conn.commit()
+                cursor.close()
 
             return jsonify({"message": "Cab status updated successfully"}), 200
         except Exception as e:
+            reraise_pool_exhausted(e)
             return jsonify({"error": str(e)}), 500
 
     
     @app.route('/api/shifts/<int:shift_id>/cab-status', methods=['GET'])
     def get_cab_status(shift_id):
         try:
-            conn=get_db_connection()
-            cursor=conn.cursor(dictionary=True)
-            query = """
-                SELECT u.id, u.username, sem.cab_facility
-                FROM shift_employee_map sem
-                JOIN users u ON sem.employee_id = u.id
-                WHERE sem.shift_id = %s
-            """
-            cursor.execute(query, (shift_id,))
-            employees = cursor.fetchall()
-            conn.close()
+            with db_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                query = """
+                    SELECT u.id, u.username, sem.cab_facility
+                    FROM shift_employee_map sem
+                    JOIN users u ON sem.employee_id = u.id
+                    WHERE sem.shift_id = %s
+                """
+                cursor.execute(query, (shift_id,))
+                employees = cursor.fetchall()
             return jsonify(employees), 200
         except Exception as e:
+            reraise_pool_exhausted(e)
             print("Error fetching employees for shift:", e)
             return jsonify({'error': 'Internal Server Error'}), 500
     
@@ -215,28 +321,25 @@ def setup_routes(app):
         password = data.get("password")
         if not username or not password:
             return jsonify({"error": "Username and password are required"}), 400
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
-        existing_user = cursor.fetchone()
-
-        if existing_user:
-            conn.close()
-            return jsonify({"error": "Username already taken"}), 409
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8') 
-        cursor.execute("INSERT INTO users (username, password) VALUES (%s, %s)", (username, hashed_password))
-        conn.commit()
-        conn.close()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
+            existing_user = cursor.fetchone()
+
+            if existing_user:
+                return jsonify({"error": "Username already taken"}), 409
+            hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+            cursor.execute("INSERT INTO users (username, password) VALUES (%s, %s)", (username, hashed_password))
+            conn.commit()
 
         return jsonify({"message": "Registration successful!"}), 201
 
     @app.route("/api/users", methods=["GET"])
     def get_users():
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT id, username FROM users")
-        users = cursor.fetchall()
-        conn.close()
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT id, username FROM users")
+            users = cursor.fetchall()
         return jsonify(users)
     
     @app.route("/api/validate", methods=["GET"])
@@ -257,23 +360,23 @@ def setup_routes(app):
     @app.route('/api/shifts', methods=['GET'])
     def get_shifts():
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
+            with db_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
 
-            query = """
-                SELECT sa.id AS shift_id,
-                    sa.shift_type,
-                    sa.start_datetime,
-                    sa.end_datetime,
-                    GROUP_CONCAT(u.username ORDER BY u.username SEPARATOR ', ') AS employees
-                FROM shift_assignments sa
-                LEFT JOIN shift_employee_map sem ON sa.id = sem.shift_id
-                LEFT JOIN users u ON sem.employee_id = u.id
-                GROUP BY sa.id
-                ORDER BY sa.start_datetime;
-            """
-            cursor.execute(query)
-            results = cursor.fetchall()
+                query = """
+                    SELECT sa.id AS shift_id,
+                        sa.shift_type,
+                        sa.start_datetime,
+                        sa.end_datetime,
+                        GROUP_CONCAT(u.username ORDER BY u.username SEPARATOR ', ') AS employees
+                    FROM shift_assignments sa
+                    LEFT JOIN shift_employee_map sem ON sa.id = sem.shift_id
+                    LEFT JOIN users u ON sem.employee_id = u.id
+                    GROUP BY sa.id
+                    ORDER BY sa.start_datetime;
+                """
+                cursor.execute(query)
+                results = cursor.fetchall()
 
             shifts = []
             for row in results:
@@ -295,18 +398,18 @@ def setup_routes(app):
     @app.route('/api/user_shifts/<int:user_id>', methods=['GET'])
     def get_user_shifts(user_id):
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
+            with db_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
 
-            query = """
-                SELECT sa.id, sa.shift_type, sa.start_datetime, sa.end_datetime
-                FROM shift_assignments sa
-                JOIN shift_employee_map sem ON sa.id = sem.shift_id
-                WHERE sem.employee_id = %s AND sa.start_datetime >= CURDATE()
-                ORDER BY sa.start_datetime
-            """
-            cursor.execute(query, (user_id,))
-            raw_shifts = cursor.fetchall()
+                query = """
+                    SELECT sa.id, sa.shift_type, sa.start_datetime, sa.end_datetime
+                    FROM shift_assignments sa
+                    JOIN shift_employee_map sem ON sa.id = sem.shift_id
+                    WHERE sem.employee_id = %s AND sa.start_datetime >= CURDATE()
+                    ORDER BY sa.start_datetime
+                """
+                cursor.execute(query, (user_id,))
+                raw_shifts = cursor.fetchall()
 
             shifts = []
             for shift in raw_shifts:
@@ -327,10 +430,10 @@ def setup_routes(app):
     @app.route("/api/analysts")
     def get_analysts():
         try:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            cur.execute("SELECT id, username FROM users WHERE role = 'analyst'")
-            analysts = cur.fetchall()
+            with db_connection() as conn:
+                cur = conn.cursor()
+                cur.execute("SELECT id, username FROM users WHERE role = 'analyst'")
+                analysts = cur.fetchall()
             result = []
 
             if analysts:
@@ -339,13 +442,10 @@ def setup_routes(app):
             return jsonify(result)
 
         except Exception as e:
+            reraise_pool_exhausted(e)
             print("Error fetching analysts:", e)
             return jsonify({"error": "Failed to fetch analysts"}), 500
 
-        finally:
-            if conn:
-                conn.close()
-
 
     @app.route('/api/create_shift', methods=['POST'])
     def create_shift():
@@ -359,43 +459,42 @@ def setup_routes(app):
             return jsonify({"error": "Missing required fields"}), 400
 
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                SELECT id FROM shift_assignments
-                WHERE start_datetime = %s AND end_datetime = %s AND shift_type = %s
-            """, (start_datetime, end_datetime, shift_type))
-            existing_shift = cursor.fetchone()
+            with db_connection() as conn:
+                cursor = conn.cursor()
 
-            if existing_shift:
-                shift_id = existing_shift[0]
-            else:
                 cursor.execute("""
-                    INSERT INTO shift_assignments (shift_type, start_datetime, end_datetime)
-                    VALUES (%s, %s, %s)
-                """, (shift_type, start_datetime, end_datetime))
-                conn.commit()
-                shift_id = cursor.lastrowid
+                    SELECT id FROM shift_assignments
+                    WHERE start_datetime = %s AND end_datetime = %s AND shift_type = %s
+                """, (start_datetime, end_datetime, shift_type))
+                existing_shift = cursor.fetchone()
 
-            for emp_id in employee_ids:
-                cursor.execute("""
-                    SELECT 1 FROM shift_employee_map
-                    WHERE shift_id = %s AND employee_id = %s
-                """, (shift_id, emp_id))
-                already_assigned = cursor.fetchone()
+                if existing_shift:
+                    shift_id = existing_shift[0]
+                else:
+                    cursor.execute("""
+                        INSERT INTO shift_assignments (shift_type, start_datetime, end_datetime)
+                        VALUES (%s, %s, %s)
+                    """, (shift_type, start_datetime, end_datetime))
+                    conn.commit()
+                    shift_id = cursor.lastrowid
 
-                if not already_assigned:
+                for emp_id in employee_ids:
                     cursor.execute("""
-                        INSERT INTO shift_employee_map (shift_id, employee_id, cab_facility)
-                        VALUES (%s, %s, 'No')
+                        SELECT 1 FROM shift_employee_map
+                        WHERE shift_id = %s AND employee_id = %s
                     """, (shift_id, emp_id))
+                    already_assigned = cursor.fetchone()
 
-            conn.commit()
+                    if not already_assigned:
+                        cursor.execute("""
+                            INSERT INTO shift_employee_map (shift_id, employee_id, cab_facility)
+                            VALUES (%s, %s, 'No')
+                        """, (shift_id, emp_id))
+
+                conn.commit()
             return jsonify({"message": "Shift created successfully", "shift_id": shift_id}), 200
 
         except mysql.connector.Error as err:
-            conn.rollback()
             return jsonify({"error": str(err)}), 500
 
 
@@ -423,30 +522,30 @@ def setup_routes(app):
         start_time, end_time = shift_times[shift_type]
 
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
+            with db_connection() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute("""
-                UPDATE shift_assignments
-                SET date = %s,
-                    shift_type = %s,
-                    start_time = %s,
-                    end_time = %s
-                WHERE id = %s
-            """, (date, shift_type, start_time, end_time, shift_id))
-
-            cursor.execute("""
-                UPDATE shift_employee_map
-                SET employee_id = %s
-                WHERE shift_id = %s
-            """, (new_employee_id, shift_id))
+                cursor.execute("""
+                    UPDATE shift_assignments
+                    SET date = %s,
+                        shift_type = %s,
+                        start_time = %s,
+                        end_time = %s
+                    WHERE id = %s
+                """, (date, shift_type, start_time, end_time, shift_id))
 
-            conn.commit()
-            conn.close()
+                cursor.execute("""
+                    UPDATE shift_employee_map
+                    SET employee_id = %s
+                    WHERE shift_id = %s
+                """, (new_employee_id, shift_id))
+
+                conn.commit()
 
             return jsonify({'message': 'Shift updated and reassigned successfully'}), 200
 
         except Exception as e:
+            reraise_pool_exhausted(e)
             return jsonify({'error': str(e)}), 500
 
     
@@ -460,17 +559,17 @@ def setup_routes(app):
             return jsonify({'error': 'Missing shift_id'}), 400
 
         try:
-            conn=get_db_connection()
-            cursor=conn.cursor()
+            with db_connection() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute("DELETE FROM shift_employee_map WHERE shift_id = %s", (shift_id,))
-            cursor.execute("DELETE FROM handover_notes WHERE shift_id = %s", (shift_id,))
-            cursor.execute("DELETE FROM shift_assignments WHERE id = %s", (shift_id,))
-            conn.commit()
-            conn.close()
+                cursor.execute("DELETE FROM shift_employee_map WHERE shift_id = %s", (shift_id,))
+                cursor.execute("DELETE FROM handover_notes WHERE shift_id = %s", (shift_id,))
+                cursor.execute("DELETE FROM shift_assignments WHERE id = %s", (shift_id,))
+                conn.commit()
             return jsonify({'message': 'Shift deleted successfully'}), 200
 
         except Exception as e:
+            reraise_pool_exhausted(e)
             return jsonify({'error': str(e)}), 500
         
 
@@ -498,56 +597,80 @@ def setup_routes(app):
     
     @app.route('/api/kb-search', methods=['GET'])
     def search():
-        query = request.args.get('query', '').strip()
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        """Searches the knowledge base.
 
-        try:
-            
-            fields = [
-                'location', 'family', 'class', 'manufacturer', 'model',
-                'serial_number', 'host_name', 'ip_address', 'criticality',
-                'eos', 'eol', 'latest_firmware_release_date', 'asset_owner',
-                'current_firmware_version', 'latest_firmware_version',
-                'end_of_support', 'integration_with_pim_tacacs', 'rac_no',
-                'rac_qr_code', 'device_position', 'device_qr', 'status'
-            ]
-
-
-            if not query:
-                cursor.execute(f"SELECT id, {', '.join(fields)} FROM knowledge_base")
-                results = cursor.fetchall()
-                return jsonify(results)
+        Query parameters:
+            query   -- words that must all appear (ranked by the inverted index)
+            fields  -- comma-separated projection; defaults to every KB column
+            limit   -- page size; enables keyset pagination on id, with the next
+                       page's cursor returned in the X-Next-Cursor header
+            cursor  -- id to continue after (from X-Next-Cursor)
+            format  -- "json" (default) or "ndjson"
 
-            words = query.split()
-            conditions = []
-            params = []
+        Unpaginated requests are streamed straight from a server-side cursor.
+        """
+        query = request.args.get('query', '').strip()
+        output_format = request.args.get('format', 'json').lower()
+        if output_format not in ('json', 'ndjson'):
+            return jsonify({"error": "format must be 'json' or 'ndjson'"}), 400
 
-            for word in words:
-                condition = "(" + " OR ".join([f"{field} LIKE %s" for field in fields]) + ")"
-                conditions.append(condition)
-                params.extend([f"%{word}%"] * len(fields))
+        try:
+            fields = parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        limit = request.args.get('limit', type=int)
+        after_id = request.args.get('cursor', type=int)
+        if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+            return jsonify({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+
+        if limit is not None or after_id is not None:
+            page_size = limit or MAX_PAGE_SIZE
+            with db_connection() as conn:
+                rows = [
+                    row
+                    for chunk in iter_kb_rows(conn, fields, query, after_id=after_id, limit=page_size + 1)
+                    for row in chunk
+                ]
+            has_more = len(rows) > page_size
+            rows = rows[:page_size]
+
+            if output_format == 'ndjson':
+                response = Response(''.join(app.json.dumps(row) + '\n' for row in rows), mimetype='application/x-ndjson')
+            else:
+                response = jsonify(rows)
+            if has_more:
+                response.headers['X-Next-Cursor'] = str(rows[-1]['id'])
+            return response
+
+        # Borrow the connection up front so pool exhaustion is still a clean 503;
+        # it goes back to the pool when the server closes the streamed response.
+        resources = ExitStack()
+        conn = resources.enter_context(db_connection())
+
+        def generate():
+            if output_format == 'json':
+                yield '['
+            first = True
+            for chunk in iter_kb_rows(conn, fields, query):
+                if output_format == 'ndjson':
+                    yield ''.join(app.json.dumps(row) + '\n' for row in chunk)
+                else:
+                    body = ','.join(app.json.dumps(row) for row in chunk)
+                    yield body if first else ',' + body
+                    first = False
+            if output_format == 'json':
+                yield ']'
 
-            where_clause = " AND ".join(conditions)
-            sql = f"""
-                SELECT id, {', '.join(fields)}
-                FROM knowledge_base
-                WHERE {where_clause}
-            """
-            cursor.execute(sql, params)
-            results = cursor.fetchall()
-            return jsonify(results)
+        mimetype = 'application/x-ndjson' if output_format == 'ndjson' else 'application/json'
+        response = Response(stream_with_context(generate()), mimetype=mimetype)
+        response.call_on_close(resources.close)
+        return response
 
-        finally:
-            cursor.close()
-            conn.close()
 
 
     
     @app.route('/api/kb_table-add', methods=['POST'])
     def add_kb_entry():
-        conn = None
-        cursor = None
         try:
             data = request.get_json()
 
@@ -563,9 +686,6 @@ def setup_routes(app):
             if not all(field in data and data[field] for field in required_fields):
                 return jsonify({"message": "All fields are required."}), 400
 
-            conn = get_db_connection()
-            cursor = conn.cursor()
-
             insert_query = f"""
                 INSERT INTO knowledge_base (
                     {', '.join(required_fields)}
@@ -573,52 +693,48 @@ def setup_routes(app):
             """
 
             values = tuple(data[field] for field in required_fields)
-            cursor.execute(insert_query, values)
-            conn.commit()
+            with db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(insert_query, values)
+                conn.commit()
+                cursor.close()
+                kb_index.refresh(conn)
+                ip_index.refresh(conn, 'knowledge_base')
 
             return jsonify({"message": "Entry added successfully!"}), 201
 
         except Exception as e:
+            reraise_pool_exhausted(e)
             print("Error adding entry:", str(e))
             return jsonify({"message": str(e)}), 500
 
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
-
 
 
     @app.route('/api/kb_table-delete', methods=['POST'])
     def delete_entries():
-        conn = None
-        cursor = None
         try:
             data = request.get_json()
             ids = data.get('ids', [])
             if not ids:
                 return jsonify({"message": "No IDs provided"}), 400
 
-            conn = get_db_connection()
-            cursor = conn.cursor()
             format_strings = ','.join(['%s'] * len(ids))
             query = f"DELETE FROM knowledge_base WHERE id IN ({format_strings})"
-            cursor.execute(query, tuple(ids))
-            conn.commit()
+            with db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query, tuple(ids))
+                conn.commit()
+                cursor.close()
+            kb_index.remove(ids)
+            ip_index.remove('knowledge_base', ids)
 
             return jsonify({"message": "Entries deleted successfully!"}), 200
 
         except Exception as e:
+            reraise_pool_exhausted(e)
             print("Error deleting entries:", str(e))
             return jsonify({"message": str(e)}), 500
 
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
-
 
         
     
@@ -632,103 +748,87 @@ def setup_routes(app):
         if file.filename == "":
             return jsonify({"message": "No file selected"}), 400
 
-        conn = None
-        cursor = None
-
+        if not file.filename.lower().endswith(('.csv', '.xlsx', '.xls')):
+            return jsonify({"message": "Unsupported file type"}), 400
+
+        batch_size = request.form.get('batch_size', IMPORT_BATCH_SIZE, type=int)
+        if batch_size < 1:
+            return jsonify({"message": "batch_size must be a positive integer"}), 400
+
+        # mode=upsert deduplicates the file and updates existing rows matched on key
+        mode = request.form.get('mode', 'insert')
+        key = request.form.get('key', 'serial_number') if mode == 'upsert' else None
+        if mode not in ('insert', 'upsert'):
+            return jsonify({"message": "mode must be 'insert' or 'upsert'"}), 400
+        if mode == 'upsert' and key not in UPSERT_KEYS:
+            return jsonify({"message": f"key must be one of: {', '.join(UPSERT_KEYS)}"}), 400
+
+        job = import_jobs.submit(file, batch_size=batch_size, mode=mode, key=key)
+        return jsonify({
+            "message": "Import started.",
+            "job_id": job.id,
+            "status_url": f"/api/kb_table-import/jobs/{job.id}"
+        }), 202
+
+    @app.route('/api/kb_table-import/jobs', methods=['GET'])
+    def list_import_jobs():
+        return jsonify([job.to_dict() for job in import_jobs.list()])
+
+    @app.route('/api/kb_table-import/jobs/<job_id>', methods=['GET'])
+    def get_import_job(job_id):
+        job = import_jobs.get(job_id)
+        if job is None:
+            return jsonify({"error": "Import job not found"}), 404
+        return jsonify(job.to_dict())
+
+    @app.route('/api/kb_table-import/jobs/<job_id>/cancel', methods=['POST'])
+    def cancel_import_job(job_id):
+        job = import_jobs.cancel(job_id)
+        if job is None:
+            return jsonify({"error": "Import job not found"}), 404
+        return jsonify(job.to_dict()), 202
+
+    @app.route('/api/kb_table-export', methods=['GET'])
+    def export_data():
+        """Exports the knowledge base as a CSV, XLSX or Parquet download.
+
+        Takes the same ``query`` and ``fields`` parameters as /api/kb-search,
+        plus ``format`` (csv, xlsx or parquet). CSV is streamed chunk by chunk
+        from a server-side cursor; XLSX and Parquet are written chunk by chunk
+        to a temporary file (their containers need finalising) and streamed
+        from disk, so memory stays bounded either way.
+        """
+        query = request.args.get('query', '').strip()
+        export_format = request.args.get('format', 'csv').lower()
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
         try:
-            filename = file.filename.lower()
-            if filename.endswith('.csv'):
-                df = pd.read_csv(file)
-            elif filename.endswith('.xlsx'):
-                df = pd.read_excel(file, engine='openpyxl')
-            elif filename.endswith('.xls'):
-                df = pd.read_excel(file, engine='xlrd')
-            else:
-                return jsonify({"message": "Unsupported file type"}), 400
-
-            # Normalize column headers
-            df.columns = (
-                df.columns.str.strip()
-                .str.lower()
-                .str.replace(' ', '_')
-                .str.replace('/', '_')
-            )
-
-            # Manual corrections for known mismatches
-            df.columns = df.columns.str.replace('rack_no', 'rac_no')
-            df.columns = df.columns.str.replace('rack_qr_code', 'rac_qr_code')
-
-            # Replace invalid values with None
-            df.replace(['Not yet declared', 'NA', 'na', 'N/A', '', ' '], None, inplace=True)
-
-            required_columns = [
-                'location', 'family', 'class', 'manufacturer', 'model',
-                'serial_number', 'host_name', 'ip_address', 'criticality',
-                'eos', 'eol', 'latest_firmware_release_date', 'asset_owner',
-                'current_firmware_version', 'latest_firmware_version',
-                'end_of_support', 'integration_with_pim_tacacs', 'rac_no',
-                'rac_qr_code', 'device_position', 'device_qr', 'status'
-            ]
-
-            # Fuzzy match uploaded columns to required columns
-            import difflib
-            uploaded_columns = df.columns.tolist()
-            column_mapping = {}
-            for required in required_columns:
-                match = difflib.get_close_matches(required, uploaded_columns, n=1, cutoff=0.6)
-                column_mapping[required] = match[0] if match else None
-
-            missing_mappings = [col for col, mapped in column_mapping.items() if mapped is None]
-            if missing_mappings:
-                return jsonify({
-                    "message": f"Missing required columns or unable to match: {', '.join(missing_mappings)}"
-                }), 400
-
-            df = df.rename(columns={v: k for k, v in column_mapping.items() if v})
-
-            # Convert datetime columns to MySQL-compatible date format
-            date_columns = ['eos', 'eol', 'latest_firmware_release_date', 'end_of_support']
-            for col in date_columns:
-                if col in df.columns:
-                    df[col] = pd.to_datetime(df[col], errors='coerce').dt.strftime('%Y-%m-%d')
-                    df[col] = df[col].where(pd.notnull(df[col]), None)
-
-            # Drop extra columns not in required_columns
-            df = df[[col for col in required_columns if col in df.columns]]
-
-            conn = get_db_connection()
-            cursor = conn.cursor()
-
-            insert_query = f"""
-                INSERT INTO knowledge_base (
-                    {', '.join(required_columns)}
-                ) VALUES ({', '.join(['%s'] * len(required_columns))})
-            """
-
-            for index, row in df.iterrows():
-                try:
-                    values = tuple(row.get(col, None) for col in required_columns)
-                    cursor.execute(insert_query, values)
-                    print(f"Inserted row {index}: {values}")
-                except Exception as insert_error:
-                    print(f"Error inserting row {index}: {insert_error}")
-                    conn.rollback()
-                    return jsonify({"message": f"Error inserting row {index}: {str(insert_error)}"}), 500
-
-            conn.commit()
-            return jsonify({"message": "Import successful!"}), 200
-
-        except Exception as e:
-            if conn:
-                conn.rollback()
-            print(f"Error: {str(e)}")
-            return jsonify({"message": str(e)}), 500
+            fields = parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        filename = f"knowledge_base_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+        headers = {"Content-Disposition": f"attachment; filename={filename}"}
+
+        if export_format == 'csv':
+            resources = ExitStack()
+            conn = resources.enter_context(db_connection())
+            response = Response(stream_with_context(iter_csv(conn, fields, query)),
+                                mimetype=EXPORT_FORMATS['csv'], headers=headers)
+            response.call_on_close(resources.close)
+            return response
+
+        writer = write_xlsx if export_format == 'xlsx' else write_parquet
+        try:
+            with db_connection() as conn:
+                path = writer(conn, fields, query)
+        except ExportDependencyError as e:
+            return jsonify({"error": str(e)}), 501
 
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
+        headers["Content-Length"] = str(os.path.getsize(path))
+        response = Response(iter_file(path), mimetype=EXPORT_FORMATS[export_format], headers=headers)
+        response.call_on_close(lambda: remove_file(path))
+        return response
 
 
 
@@ -769,134 +869,162 @@ def setup_routes(app):
     
     @app.route("/api/assets", methods=["GET", "POST"])
     def assets():
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)  
-
-        try:
-            if request.method == "GET":
-                client_id = request.args.get("client")
-                if not client_id:
-                    return jsonify({"error": "client_id is required in query parameters"}), 400
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
 
-                cursor.execute("SELECT * FROM client_assets WHERE client_id = %s", (client_id,))
-                assets = cursor.fetchall()
-                conn.close()
-                if not assets:
-                    return jsonify({"message": "No assets found for this client"}), 404
-                return jsonify(assets), 200
+            try:
+                if request.method == "GET":
+                    client_id = request.args.get("client")
+                    if not client_id:
+                        return jsonify({"error": "client_id is required in query parameters"}), 400
+
+                    cursor.execute("SELECT * FROM client_assets WHERE client_id = %s", (client_id,))
+                    assets = cursor.fetchall()
+                    if not assets:
+                        return jsonify({"message": "No assets found for this client"}), 404
+                    return jsonify(assets), 200
+
+                elif request.method == "POST":
+                    data = request.get_json()
+
+                    required_fields = ["asset_name", "location", "ip_address", "mode", "asset_type", "asset_owner", "client_id"]
+                    missing_fields = [field for field in required_fields if not data.get(field)]
+                    if missing_fields:
+                        return jsonify({"error": f"Missing fields: {', '.join(missing_fields)}"}), 400
+
+                    asset_name = data.get("asset_name")
+                    location = data.get("location")
+                    ip_address = data.get("ip_address")
+                    mode = data.get("mode")
+                    asset_type = data.get("asset_type")
+                    asset_owner = data.get("asset_owner")
+                    remarks = data.get("remarks", "")
+                    client_id = data.get("client_id")
 
-            elif request.method == "POST":
-                data = request.get_json()
+                    cursor.execute(
+                        """
+                        INSERT INTO client_assets
+                        (asset_name, location, ip_address, mode, asset_type, asset_owner, remarks, client_id)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                        """,
+                        (asset_name, location, ip_address, mode, asset_type, asset_owner, remarks, client_id)
+                    )
 
-                required_fields = ["asset_name", "location", "ip_address", "mode", "asset_type", "asset_owner", "client_id"]
-                missing_fields = [field for field in required_fields if not data.get(field)]
-                if missing_fields:
-                    return jsonify({"error": f"Missing fields: {', '.join(missing_fields)}"}), 400
+                    conn.commit()
+                    ip_index.refresh(conn, 'client_assets')
+                    client_overview_cache.invalidate(client_id)
+                    return jsonify({"message": "Asset added successfully"}), 201
 
-                asset_name = data.get("asset_name")
-                location = data.get("location")
-                ip_address = data.get("ip_address")
-                mode = data.get("mode")
-                asset_type = data.get("asset_type")
-                asset_owner = data.get("asset_owner")
-                remarks = data.get("remarks", "")
-                client_id = data.get("client_id")
+            except mysql.connector.Error as err:
+                conn.rollback()
+                return jsonify({"error": f"MySQL Error: {str(err)}"}), 500
 
-                cursor.execute(
-                    """
-                    INSERT INTO client_assets 
-                    (asset_name, location, ip_address, mode, asset_type, asset_owner, remarks, client_id)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    """,
-                    (asset_name, location, ip_address, mode, asset_type, asset_owner, remarks, client_id)
-                )
+            except Exception as e:
+                conn.rollback()
+                return jsonify({"error": f"Unexpected Error: {str(e)}"}), 500
 
-                conn.commit()
-                return jsonify({"message": "Asset added successfully"}), 201
+            finally:
+                cursor.close()
 
-        except mysql.connector.Error as err:
-            conn.rollback()
-            return jsonify({"error": f"MySQL Error: {str(err)}"}), 500
+    @app.route("/api/ip-lookup", methods=["GET", "POST"])
+    def ip_lookup():
+        """Finds which client assets and KB entries own an address, across all clients.
 
-        except Exception as e:
-            conn.rollback()
-            return jsonify({"error": f"Unexpected Error: {str(e)}"}), 500
+        GET  ?ip=10.20.3.44 or ?cidr=10.20.0.0/16 (optional &limit=)
+        POST {"ips": ["10.20.3.44", "10.1.0.0/24", ...]} for bulk lookups
+        """
+        with db_connection() as conn:
+            ip_index.ensure_current(conn)
 
-        finally:
-            cursor.close()
-            conn.close()
+        if request.method == "POST":
+            data = request.get_json(silent=True) or {}
+            values = data.get("ips")
+            if not isinstance(values, list) or not values:
+                return jsonify({"error": "ips must be a non-empty list"}), 400
+            if len(values) > MAX_BULK_LOOKUPS:
+                return jsonify({"error": f"At most {MAX_BULK_LOOKUPS} addresses per request"}), 400
+            results, invalid = ip_index.lookup_many(values)
+            return jsonify({"results": results, "invalid": invalid}), 200
+
+        ip = request.args.get("ip")
+        cidr = request.args.get("cidr")
+        limit = request.args.get("limit", type=int)
+        try:
+            if ip:
+                return jsonify({"ip": ip, "matches": ip_index.lookup(ip)}), 200
+            if cidr:
+                return jsonify({"cidr": cidr, "matches": ip_index.lookup_network(cidr, limit=limit)}), 200
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({"error": "ip or cidr is required in query parameters"}), 400
 
 
 
     @app.route("/api/escalation-matrix", methods=["GET", "POST"])
     def escalation_matrix():
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
 
-        if request.method == "GET":
-            client_id = request.args.get("client")
-            if not client_id:
-                return jsonify({"error": "Missing client ID"}), 400
+            if request.method == "GET":
+                client_id = request.args.get("client")
+                if not client_id:
+                    return jsonify({"error": "Missing client ID"}), 400
 
-            cursor.execute("SELECT * FROM escalation_matrix WHERE client_id = %s", (client_id,))
-            data = cursor.fetchall()
-            conn.close()
-            return jsonify(data), 200
+                cursor.execute("SELECT * FROM escalation_matrix WHERE client_id = %s", (client_id,))
+                data = cursor.fetchall()
+                return jsonify(data), 200
 
-        if request.method == "POST":
-            data = request.get_json()
-            try:
-                cursor.execute(
-                    """
-                    INSERT INTO escalation_matrix (
-                        client_id, level,
-                        client_name, client_email, client_contact, client_designation,
-                        gtb_name, gtb_email, gtb_contact, gtb_designation
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """,
-                    (
-                        data["client_id"], data["level"],
-                        data["client_name"], data["client_email"], data["client_contact"], data["client_designation"],
-                        data["gtb_name"], data["gtb_email"], data["gtb_contact"], data["gtb_designation"]
+            if request.method == "POST":
+                data = request.get_json()
+                try:
+                    cursor.execute(
+                        """
+                        INSERT INTO escalation_matrix (
+                            client_id, level,
+                            client_name, client_email, client_contact, client_designation,
+                            gtb_name, gtb_email, gtb_contact, gtb_designation
+                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                        """,
+                        (
+                            data["client_id"], data["level"],
+                            data["client_name"], data["client_email"], data["client_contact"], data["client_designation"],
+                            data["gtb_name"], data["gtb_email"], data["gtb_contact"], data["gtb_designation"]
+                        )
                     )
-                )
-                conn.commit()
-                return jsonify({"message": "Escalation entry added successfully"}), 201
-            except Exception as e:
-                conn.rollback()
-                return jsonify({"error": str(e)}), 500
-            finally:
-                conn.close()
+                    conn.commit()
+                    client_overview_cache.invalidate(data["client_id"])
+                    return jsonify({"message": "Escalation entry added successfully"}), 201
+                except Exception as e:
+                    conn.rollback()
+                    return jsonify({"error": str(e)}), 500
 
 
 
 
     @app.route("/api/sla", methods=["GET", "POST"])
     def sla_policies():
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
 
-        if request.method == "GET":
-            client_id = request.args.get("client")
-            cursor.execute("SELECT * FROM sla_policies WHERE client_id = %s", (client_id,))
-            policies = cursor.fetchall()
-            conn.close()
-            return jsonify(policies), 200
+            if request.method == "GET":
+                client_id = request.args.get("client")
+                cursor.execute("SELECT * FROM sla_policies WHERE client_id = %s", (client_id,))
+                policies = cursor.fetchall()
+                return jsonify(policies), 200
 
-        if request.method == "POST":
-            data = request.get_json()
-            try:
-                cursor.execute(
-                    "INSERT INTO sla_policies (client_id, priority, response_time, resolution_time) VALUES (%s, %s, %s, %s)",
-                    (data["client_id"], data["priority"], data["response_time"], data["resolution_time"])
-                )
-                conn.commit()
-                return jsonify({"message": "SLA policy added successfully"}), 201
-            except Exception as e:
-                conn.rollback()
-                return jsonify({"error": str(e)}), 500
-            finally:
-                conn.close()
+            if request.method == "POST":
+                data = request.get_json()
+                try:
+                    cursor.execute(
+                        "INSERT INTO sla_policies (client_id, priority, response_time, resolution_time) VALUES (%s, %s, %s, %s)",
+                        (data["client_id"], data["priority"], data["response_time"], data["resolution_time"])
+                    )
+                    conn.commit()
+                    client_overview_cache.invalidate(data["client_id"])
+                    return jsonify({"message": "SLA policy added successfully"}), 201
+                except Exception as e:
+                    conn.rollback()
+                    return jsonify({"error": str(e)}), 500
 
 
 
@@ -904,38 +1032,39 @@ def setup_routes(app):
 
     @app.route("/api/passwords", methods=["GET", "POST"])
     def passwords():
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-
-        if request.method == "GET":
-            client_id = request.args.get("client")
-            if not client_id:
-                return jsonify({"error": "Missing client ID"}), 400
-
-            cursor.execute("""
-                SELECT ap.id, ca.asset_name, ca.mode, ap.username, ap.password
-                FROM asset_passwords ap
-                JOIN client_assets ca ON ap.asset_id = ca.id
-                WHERE ca.client_id = %s
-            """, (client_id,))
-            passwords = cursor.fetchall()
-            conn.close()
-            return jsonify(passwords), 200
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
 
-        if request.method == "POST":
-            data = request.get_json()
-            try:
-                cursor.execute(
-                    "INSERT INTO asset_passwords (asset_id, username, password) VALUES (%s, %s, %s)",
-                    (data["asset_id"], data["username"], data["password"])
-                )
-                conn.commit()
-                return jsonify({"message": "Password entry added successfully"}), 201
-            except Exception as e:
-                conn.rollback()
-                return jsonify({"error": str(e)}), 500
-            finally:
-                conn.close()
+            if request.method == "GET":
+                client_id = request.args.get("client")
+                if not client_id:
+                    return jsonify({"error": "Missing client ID"}), 400
+
+                cursor.execute("""
+                    SELECT ap.id, ca.asset_name, ca.mode, ap.username, ap.password
+                    FROM asset_passwords ap
+                    JOIN client_assets ca ON ap.asset_id = ca.id
+                    WHERE ca.client_id = %s
+                """, (client_id,))
+                passwords = cursor.fetchall()
+                return jsonify(passwords), 200
+
+            if request.method == "POST":
+                data = request.get_json()
+                try:
+                    cursor.execute(
+                        "INSERT INTO asset_passwords (asset_id, username, password) VALUES (%s, %s, %s)",
+                        (data["asset_id"], data["username"], data["password"])
+                    )
+                    conn.commit()
+                    cursor.execute("SELECT client_id FROM client_assets WHERE id = %s", (data["asset_id"],))
+                    asset = cursor.fetchone()
+                    if asset:
+                        client_overview_cache.invalidate(asset['client_id'])
+                    return jsonify({"message": "Password entry added successfully"}), 201
+                except Exception as e:
+                    conn.rollback()
+                    return jsonify({"error": str(e)}), 500
 
 
 
@@ -955,26 +1084,26 @@ def setup_routes(app):
     @app.route('/api/clusters', methods=['GET'])
     def get_clusters():
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT DISTINCT cluster FROM clusters ORDER BY cluster")
-            clusters = [row[0] for row in cursor.fetchall()]
-            conn.close()
-            return jsonify(clusters), 200
+            with db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT DISTINCT cluster FROM clusters ORDER BY cluster")
+                clusters = [row[0] for row in cursor.fetchall()]
+                return jsonify(clusters), 200
         except Exception as e:
+            reraise_pool_exhausted(e)
             return jsonify({'error': str(e)}), 500
         
 
     @app.route('/api/clusters/<int:cluster_id>', methods=['GET'])
     def get_users_by_cluster(cluster_id):
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT id, username FROM clusters WHERE cluster = %s", (cluster_id,))
-            users = cursor.fetchall()
-            conn.close()
-            return jsonify(users), 200
+            with db_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute("SELECT id, username FROM clusters WHERE cluster = %s", (cluster_id,))
+                users = cursor.fetchall()
+                return jsonify(users), 200
         except Exception as e:
+            reraise_pool_exhausted(e)
             return jsonify({'error': str(e)}), 500
 
         
@@ -989,26 +1118,26 @@ def setup_routes(app):
             return jsonify({'error': 'Username and cluster are required'}), 400
 
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO clusters (username, cluster) VALUES (%s, %s)", (username, cluster))
-            conn.commit()
-            conn.close()
-            return jsonify({'message': 'User added to cluster successfully'}), 201
+            with db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("INSERT INTO clusters (username, cluster) VALUES (%s, %s)", (username, cluster))
+                conn.commit()
+                return jsonify({'message': 'User added to cluster successfully'}), 201
         except Exception as e:
+            reraise_pool_exhausted(e)
             return jsonify({'error': str(e)}), 500
 
 
     @app.route('/api/clusters/<int:user_id>', methods=['DELETE'])
     def delete_user_from_cluster(user_id):
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM clusters WHERE id = %s", (user_id,))
-            conn.commit()
-            conn.close()
-            return jsonify({'message': 'User deleted from cluster successfully'}), 200
+            with db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM clusters WHERE id = %s", (user_id,))
+                conn.commit()
+                return jsonify({'message': 'User deleted from cluster successfully'}), 200
         except Exception as e:
+            reraise_pool_exhausted(e)
             return jsonify({'error': str(e)}), 500
 
 
@@ -1040,6 +1169,7 @@ def setup_routes(app):
         filename = f"client_{client_id}.pdf"
         filepath = os.path.join(PDF_DIR, filename)
         file.save(filepath)
+        client_overview_cache.invalidate(client_id)
 
         return jsonify({"fileName": filename}), 200
 
@@ -1071,6 +1201,7 @@ def setup_routes(app):
 
         if os.path.exists(filepath):
             os.remove(filepath)
+            client_overview_cache.invalidate(client_id)
             return jsonify({"message": "PDF deleted successfully"}), 200
         else:
             return jsonify({"error": "PDF not found"}), 404
@@ -1102,10 +1233,14 @@ def setup_routes(app):
 
     
 
-    def get_contacts_for_tech_map(cursor, client_tech_map_id):
-        """Fetches all contacts for a given client_tech_map entry."""
-        cursor.execute("SELECT id, email FROM client_tech_contacts WHERE client_tech_map_id = %s", (client_tech_map_id,))
-        return cursor.fetchall()
+    def attach_tech_map_contacts(cursor, tech_details):
+        """Adds each client_tech_map entry's contacts, loaded for all entries in one query."""
+        return attach_related(
+            cursor, tech_details, 'contacts',
+            "SELECT id, client_tech_map_id, email FROM client_tech_contacts "
+            "WHERE client_tech_map_id IN ({keys}) ORDER BY id",
+            'client_tech_map_id'
+        )
 
     # --- API Endpoints ---
 
@@ -1113,281 +1248,236 @@ def setup_routes(app):
 
     @app.route("/api/clients", methods=["GET", "POST"])
     def clients():
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
 
-        if request.method == "GET":
-            cursor.execute("SELECT * FROM clients")
-            return jsonify(cursor.fetchall())
+            if request.method == "GET":
+                cursor.execute("SELECT * FROM clients")
+                return jsonify(cursor.fetchall())
 
-        if request.method == "POST":
-            data = request.get_json()
-            name = data.get("name")
+            if request.method == "POST":
+                data = request.get_json()
+                name = data.get("name")
 
-            if not name:
-                return jsonify({"error": "Client name is required"}), 400
+                if not name:
+                    return jsonify({"error": "Client name is required"}), 400
 
-            cursor.execute("INSERT INTO clients (name) VALUES (%s)", (name,))
-            conn.commit()
+                cursor.execute("INSERT INTO clients (name) VALUES (%s)", (name,))
+                conn.commit()
 
-            client_id = cursor.lastrowid
-            return jsonify({"id": client_id, "name": name}), 201
+                client_id = cursor.lastrowid
+                return jsonify({"id": client_id, "name": name}), 201
 
 
     @app.route("/api/tech-stacks", methods=["GET", "POST"])
     def tech_stacks():
         """Fetches all available technology stacks or adds a new one."""
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
 
-        if request.method == "GET":
-            cursor.execute("SELECT id, name FROM tech_stacks ORDER BY name")
-            stacks = cursor.fetchall()
-            conn.close()
-            return jsonify(stacks)
+            if request.method == "GET":
+                cursor.execute("SELECT id, name FROM tech_stacks ORDER BY name")
+                stacks = cursor.fetchall()
+                return jsonify(stacks)
 
-        if request.method == "POST":
-            data = request.get_json()
-            name = data.get("name")
-            description = data.get("description", "") # Optional description
-            if not name:
-                conn.close()
-                return jsonify({"error": "Tech stack name is required"}), 400
-            
-            try:
-                cursor.execute("INSERT INTO tech_stacks (name, description) VALUES (%s, %s)", (name, description))
-                conn.commit()
-                new_stack_id = cursor.lastrowid
-                conn.close()
-                return jsonify({"id": new_stack_id, "name": name, "description": description}), 201
-            except mysql.connector.Error as err:
-                conn.close()
-                if err.errno == 1062:
-                    return jsonify({"error": f"Tech stack '{name}' already exists."}), 409
-                return jsonify({"error": str(err)}), 500
+            if request.method == "POST":
+                data = request.get_json()
+                name = data.get("name")
+                description = data.get("description", "") # Optional description
+                if not name:
+                    return jsonify({"error": "Tech stack name is required"}), 400
+
+                try:
+                    cursor.execute("INSERT INTO tech_stacks (name, description) VALUES (%s, %s)", (name, description))
+                    conn.commit()
+                    new_stack_id = cursor.lastrowid
+                    return jsonify({"id": new_stack_id, "name": name, "description": description}), 201
+                except mysql.connector.Error as err:
+                    if err.errno == 1062:
+                        return jsonify({"error": f"Tech stack '{name}' already exists."}), 409
+                    return jsonify({"error": str(err)}), 500
+
+    @app.route("/api/clients/<int:client_id>/overview", methods=["GET"])
+    def get_client_overview(client_id):
+        """Client, assets, escalation matrix, SLA, passwords, tech, advisories and runbook PDF in one response.
+
+        Cached per client until a write to any of those touches the client;
+        honours If-None-Match with a 304.
+        """
+        cached = client_overview_cache.get(client_id)
+        if cached is None:
+            generation = client_overview_cache.generation(client_id)
+            with db_connection() as conn:
+                overview = load_client_overview(conn, client_id, PDF_DIR)
+            if overview is None:
+                return jsonify({"error": "Client not found"}), 404
+            body = jsonify(overview).get_data()
+            etag = hashlib.sha1(body).hexdigest()
+            client_overview_cache.put(client_id, generation, etag, body)
+        else:
+            etag, body = cached
+
+        response = Response(body, mimetype="application/json")
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
 
     @app.route("/api/clients/<int:client_id>/tech", methods=["GET", "POST"])
     def manage_client_tech(client_id):
         """Manages the technologies assigned to a specific client."""
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        if request.method == "GET":
-            query = """
-                SELECT ctm.id, ts.name as tech_stack_name, ctm.version
-                FROM client_tech_map ctm
-                JOIN tech_stacks ts ON ctm.tech_stack_id = ts.id
-                WHERE ctm.client_id = %s
-            """
-            cursor.execute(query, (client_id,))
-            tech_details = cursor.fetchall()
-            for detail in tech_details:
-                detail['contacts'] = get_contacts_for_tech_map(cursor, detail['id'])
-            conn.close()
-            return jsonify(tech_details)
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
 
-        if request.method == "POST":
+            if request.method == "GET":
+                query = """
+                    SELECT ctm.id, ts.name as tech_stack_name, ctm.version
+                    FROM client_tech_map ctm
+                    JOIN tech_stacks ts ON ctm.tech_stack_id = ts.id
+                    WHERE ctm.client_id = %s
+                """
+                cursor.execute(query, (client_id,))
+                tech_details = attach_tech_map_contacts(cursor, cursor.fetchall())
+                return jsonify(tech_details)
+
+            if request.method == "POST":
+                data = request.get_json()
+                tech_stack_id = data.get("tech_stack_id")
+                version = data.get("version")
+                if not tech_stack_id or not version:
+                    return jsonify({"error": "tech_stack_id and version are required"}), 400
+
+                try:
+                    cursor.execute(
+                        "INSERT INTO client_tech_map (client_id, tech_stack_id, version) VALUES (%s, %s, %s)",
+                        (client_id, tech_stack_id, version)
+                    )
+                    conn.commit()
+                    tech_index.reload_maps(conn, [cursor.lastrowid])
+                    client_overview_cache.invalidate(client_id)
+                    return jsonify({"message": "Tech stack assigned to client successfully"}), 201
+                except Exception as e:
+                    conn.rollback()
+                    return jsonify({"error": f"Failed to assign tech stack: {e}"}), 500
+
+    @app.route("/api/client-tech/<int:client_tech_map_id>/contacts", methods=["POST"])
+    def add_client_tech_contact(client_tech_map_id):
+        """Adds a new notification email contact for a client's technology."""
+        with db_connection() as conn:
+            cursor = conn.cursor()
             data = request.get_json()
-            tech_stack_id = data.get("tech_stack_id")
-            version = data.get("version")
-            if not tech_stack_id or not version:
-                return jsonify({"error": "tech_stack_id and version are required"}), 400
-            
+            email = data.get("email")
+            if not email:
+                return jsonify({"error": "Email is required"}), 400
+
             try:
                 cursor.execute(
-                    "INSERT INTO client_tech_map (client_id, tech_stack_id, version) VALUES (%s, %s, %s)",
-                    (client_id, tech_stack_id, version)
+                    "INSERT INTO client_tech_contacts (client_tech_map_id, email) VALUES (%s, %s)",
+                    (client_tech_map_id, email)
                 )
                 conn.commit()
-                return jsonify({"message": "Tech stack assigned to client successfully"}), 201
+                tech_index.add_contact(client_tech_map_id, cursor.lastrowid, email)
+                client_overview_cache.invalidate(tech_index.client_for_map(client_tech_map_id))
+                return jsonify({"message": "Contact added successfully"}), 201
             except Exception as e:
                 conn.rollback()
-                return jsonify({"error": f"Failed to assign tech stack: {e}"}), 500
-            finally:
-                conn.close()
-
-    @app.route("/api/client-tech/<int:client_tech_map_id>/contacts", methods=["POST"])
-    def add_client_tech_contact(client_tech_map_id):
-        """Adds a new notification email contact for a client's technology."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        data = request.get_json()
-        email = data.get("email")
-        if not email:
-            return jsonify({"error": "Email is required"}), 400
-        
-        try:
-            cursor.execute(
-                "INSERT INTO client_tech_contacts (client_tech_map_id, email) VALUES (%s, %s)",
-                (client_tech_map_id, email)
-            )
-            conn.commit()
-            return jsonify({"message": "Contact added successfully"}), 201
-        except Exception as e:
-            conn.rollback()
-            return jsonify({"error": f"Failed to add contact: {e}"}), 500
-        finally:
-            conn.close()
+                return jsonify({"error": f"Failed to add contact: {e}"}), 500
     
-   # <<< FIXED & REFACTORED FUNCTION TO CREATE AND UPDATE A SINGLE CONSOLIDATED DRAFT >>>
     @app.route("/api/clients/<int:client_id>/feed-items", methods=["GET"])
     def get_client_feed_items(client_id):
-        conn = None
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            
-            # 1. Find all RSS feed URLs and their associated tech_stack_id for the client
-            query = """
-                SELECT DISTINCT rf.url, rf.tech_stack_id, ts.name as tech_stack_name
-                FROM rss_feeds rf
-                JOIN client_tech_map ctm ON rf.tech_stack_id = ctm.tech_stack_id
-                JOIN tech_stacks ts ON rf.tech_stack_id = ts.id
-                WHERE ctm.client_id = %s
-            """
-            cursor.execute(query, (client_id,))
-            feeds = cursor.fetchall()
-            cursor.close()
-
-            # 2. Get all item GUIDs that have already been processed
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT item_guid FROM processed_feed_items")
-            seen_items_results = cursor.fetchall()
-            seen_items_set = {item['item_guid'] for item in seen_items_results}
-            cursor.close()
-            
-            # 3. Process feeds, filter for keywords, and check for newness
-            RELEVANT_KEYWORDS = [
-                'vulnerability', 'threat', 'security', 'update', 
-                'patch', 'advisory', 'cve-', 'malware', 'exploit'
-            ]
-            
-            new_items_found = []
-            new_guids_to_log = []
-
-            for feed in feeds:
-                try:
-                    tech_stack_id_for_feed = feed['tech_stack_id']
-                    tech_stack_name_for_feed = feed['tech_stack_name']
-                    parsed_feed = feedparser.parse(feed['url'])
-
-                    for entry in parsed_feed.entries:
-                        item_guid = entry.get('guid', entry.get('link'))
-                        if not item_guid or item_guid in seen_items_set:
-                            continue
-
-                        content_to_check = (entry.get("title", "") + entry.get("summary", "")).lower()
-                        if any(keyword in content_to_check for keyword in RELEVANT_KEYWORDS):
-                            feed_item_data = {
-                                "title": entry.get("title", "No Title"),
-                                "link": entry.get("link", "#"),
-                                "summary": entry.get("summary", "No summary available."),
-                                "tech_stack_id": tech_stack_id_for_feed,
-                                "tech_stack_name": tech_stack_name_for_feed
-                            }
-                            new_items_found.append(feed_item_data)
-                            new_guids_to_log.append(item_guid)
-                            seen_items_set.add(item_guid)
-
-                except Exception as e:
-                    print(f"Error fetching or parsing feed {feed['url']}: {e}")
+        """Returns the feed items the background poller has fanned out to this client, newest first.
 
-            if not new_items_found:
-                return jsonify([])
-
-            # 4. Log the new GUIDs so we don't process them again
-            if new_guids_to_log:
-                cursor = conn.cursor()
-                insert_guid_query = "INSERT INTO processed_feed_items (item_guid) VALUES (%s)"
-                guid_values_to_insert = [(guid,) for guid in new_guids_to_log]
-                cursor.executemany(insert_guid_query, guid_values_to_insert)
-                cursor.close()
-                conn.commit()
+        Query parameters:
+            limit     -- maximum items to return (default 100)
+            since_id  -- only items after this id (the highest id already seen)
+        """
+        limit = request.args.get('limit', 100, type=int)
+        since_id = request.args.get('since_id', type=int)
+        if not 1 <= limit <= 1000:
+            return jsonify({"error": "limit must be between 1 and 1000"}), 400
 
-            # 5. Group new items by tech_stack_id to create consolidated drafts
-            items_by_tech = {}
-            for item in new_items_found:
-                tech_id = item['tech_stack_id']
-                if tech_id not in items_by_tech:
-                    items_by_tech[tech_id] = []
-                items_by_tech[tech_id].append(item)
-
-            for tech_id, items_list in items_by_tech.items():
-                # For each tech group, find the one client we're operating on
-                tech_stack_name = items_list[0]['tech_stack_name']
-
-                # Format the new information block from all new feed items in this group
-                new_findings_block = ""
-                for item in items_list:
-                    new_findings_block += f"""
----
-**New Finding:** {item['title']}
-**Source:** {item['link']}
-**Summary:** {item['summary']}
-"""
-                
+        try:
+            with db_connection() as conn:
                 cursor = conn.cursor(dictionary=True)
-                # Check for an existing draft for THIS client and THIS tech stack
-                cursor.execute(
-                    "SELECT id, advisory_content FROM advisories WHERE client_id = %s AND service_or_os = %s AND status = 'Draft'",
-                    (client_id, tech_stack_name)
-                )
-                existing_draft = cursor.fetchone()
-
-                if existing_draft:
-                    # Append new findings to the existing draft
-                    updated_content = existing_draft['advisory_content'] + new_findings_block
-                    cursor.execute(
-                        "UPDATE advisories SET advisory_content = %s, timestamp = NOW() WHERE id = %s",
-                        (updated_content, existing_draft['id'])
-                    )
-                else:
-                    # Create a new consolidated draft
-                    cursor.execute("SELECT name FROM clients WHERE id = %s", (client_id,))
-                    client_name = cursor.fetchone()['name']
-                    initial_content = f"""**Automated Advisory Draft**
-
-**Topic:** Potential Issues for {tech_stack_name}
-**Date Generated:** {datetime.now().strftime('%d/%m/%Y')}
-
-This is a consolidated summary of new findings related to your technology stack. Please review, edit, and dispatch.
-{new_findings_block}
----
-*This is an automated draft. Please review for accuracy.*
-"""
-                    cursor.execute(
-                        """
-                        INSERT INTO advisories (client_id, client_name, service_or_os, update_type, description, advisory_content, status, timestamp)
-                        VALUES (%s, %s, %s, %s, %s, %s, 'Draft', NOW())
-                        """,
-                        (
-                            client_id, client_name, tech_stack_name,
-                            "Automated Consolidated Alert",
-                            f"Multiple new findings for {tech_stack_name}",
-                            initial_content
-                        )
-                    )
-                conn.commit()
+                query = """
+                    SELECT cfi.id, fi.title, fi.link, fi.summary, fi.tech_stack_id,
+                           ts.name AS tech_stack_name, fi.matched_rules, fi.cve_ids, fi.cvss_score,
+                           cfi.advisory_id, cfi.created_at
+                    FROM client_feed_items cfi
+                    JOIN feed_items fi ON fi.id = cfi.feed_item_id
+                    JOIN tech_stacks ts ON ts.id = fi.tech_stack_id
+                    WHERE cfi.client_id = %s
+                """
+                params = [client_id]
+                if since_id is not None:
+                    query += " AND cfi.id > %s"
+                    params.append(since_id)
+                query += " ORDER BY cfi.id DESC LIMIT %s"
+                params.append(limit)
+                cursor.execute(query, tuple(params))
+                items = cursor.fetchall()
                 cursor.close()
 
-            return jsonify(new_items_found)
+            urls = tech_index.feed_urls_for_client(client_id)
+            feeds = [feed_poller.feed_stats.get(url, {"url": url, "status": "pending"}) for url in urls]
+            return jsonify({"items": items, "feeds": feeds, "last_poll": feed_poller.last_run})
 
         except Exception as e:
-            # Print the full traceback to the console for detailed debugging
-            import traceback
-            traceback.print_exc()
+            reraise_pool_exhausted(e)
+            logger.exception("Error fetching feed items for client %s: %s", client_id, e)
             return jsonify({"error": str(e)}), 500
-        finally:
-            if conn and conn.is_connected():
-                conn.close()
+
+    @app.route("/api/findings", methods=["GET"])
+    def list_findings():
+        """Findings merged across feeds, most recently seen first; filter with ?cve_id= or ?tech_stack_id=."""
+        cve_id = request.args.get('cve_id')
+        tech_stack_id = request.args.get('tech_stack_id', type=int)
+        limit = min(request.args.get('limit', 100, type=int), 1000)
+        query = """
+            SELECT f.id, f.cve_id, f.title, f.cvss_score, f.first_seen, f.last_seen,
+                   (SELECT COUNT(*) FROM finding_sources fs WHERE fs.finding_id = f.id) AS source_count
+            FROM findings f
+        """
+        params = []
+        if tech_stack_id is not None:
+            query += " JOIN finding_tech_stacks fts ON fts.finding_id = f.id AND fts.tech_stack_id = %s"
+            params.append(tech_stack_id)
+        if cve_id:
+            query += " WHERE f.cve_id = %s"
+            params.append(cve_id.upper())
+        query += " ORDER BY f.last_seen DESC, f.id DESC LIMIT %s"
+        params.append(limit)
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(query, tuple(params))
+            findings = cursor.fetchall()
+            cursor.close()
+        return jsonify(findings)
+
+    @app.route("/api/findings/<int:finding_id>", methods=["GET"])
+    def get_finding_detail(finding_id):
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            finding = get_finding(cursor, finding_id)
+            cursor.close()
+        if finding is None:
+            return jsonify({"error": "Finding not found"}), 404
+        return jsonify(finding)
+
+    @app.route("/api/feeds/poll", methods=["POST"])
+    def trigger_feed_poll():
+        """Wakes the background poller for an immediate run."""
+        feed_poller.start()
+        feed_poller.trigger()
+        return jsonify({"message": "Feed poll triggered.", "last_poll": feed_poller.last_run}), 202
         
     @app.route("/api/advisories/bulk", methods=['POST'])
     def create_bulk_advisory():
-        """
-        INSERT INTO advisories (
-            client_id, client_name, service_or_os, update_type,
-            description, impact, recommended_actions, advisory_content, status, timestamp
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 'Draft', NOW())
+        """Records the advisory for every client running the tech stack/version, in one transaction.
+
+        ``version`` is either a LIKE-style pattern (``*`` wildcards, matched
+        against the raw version text) or a range expression such as
+        ``< 2.4.58`` or ``>= 7.0, < 7.2.3`` (see app/versions.py). Responds
+        with the advisory id created for each client.
         """
         data = request.get_json()
         tech_stack_id = data.get("techStackId")
@@ -1400,77 +1490,102 @@ This is a consolidated summary of new findings related to your technology stack.
         if not all([tech_stack_id, version_pattern, update_type, description]):
             return jsonify({"error": "Missing required advisory fields"}), 400
 
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        find_clients_query = """
-            SELECT c.id as client_id, c.name as client_name, ts.name as tech_stack_name
-            FROM clients c
-            JOIN client_tech_map ctm ON c.id = ctm.client_id
-            JOIN tech_stacks ts ON ctm.tech_stack_id = ts.id
-            WHERE ctm.tech_stack_id = %s AND ctm.version LIKE %s
-        """
-        cursor.execute(find_clients_query, (tech_stack_id, version_pattern))
-        affected_clients = cursor.fetchall()
-        
+        # One entry per client, even if several of its mapped versions match
+        if is_range_expression(data.get("version")):
+            try:
+                affected_clients = tech_index.clients_for_tech(
+                    int(tech_stack_id), version_intervals=parse_range(data.get("version"))
+                )
+            except VersionRangeError as e:
+                return jsonify({"error": str(e)}), 400
+        else:
+            affected_clients = tech_index.clients_for_tech(int(tech_stack_id), version_like=version_pattern)
+
         if not affected_clients:
-            conn.close()
             return jsonify({"message": "No clients found matching the specified technology and version."}), 200
 
-        for client in affected_clients:
-            advisory_content = f"""**Cybersecurity Advisory: {update_type} for {client['tech_stack_name']}**
-
-**Client:** {client['client_name']}
-**Date:** {datetime.now().strftime('%d/%m/%Y')}
-
-**1. Overview**
-This advisory provides critical information regarding a recent {update_type} for your {client['tech_stack_name']} environment (Version Pattern: {data.get("version")}).
-
-**2. Description**
-{description}
-
-**3. Potential Impact**
-{impact}
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
 
-**4. Recommended Actions**
-{recommended_actions}
+            fields = {
+                "update_type": update_type,
+                "description": description,
+                "impact": impact,
+                "recommended_actions": recommended_actions,
+            }
+            template = AdvisoryTemplate(
+                BULK_ADVISORY_TEMPLATE, date=datetime.now().strftime('%d/%m/%Y'),
+                version=data.get("version"), **fields
+            )
+            try:
+                advisory_ids = fan_out_advisories(cursor, affected_clients, template, fields)
+                conn.commit()
+                client_overview_cache.invalidate_many(advisory_ids)
+            except Exception as e:
+                conn.rollback()
+                logger.exception("Bulk advisory failed: %s", e)
+                return jsonify({"error": "Failed to record the advisory; no clients were updated."}), 500
+            finally:
+                cursor.close()
 
----
-*This is a manually dispatched advisory from the SOC Advisory System.*
-"""
-            
-        
-        insert_query = """
-            INSERT INTO advisories (
-                client_id, client_name, service_or_os, update_type,
-                description, impact, recommended_actions, advisory_content, status, timestamp
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
-        """
-        cursor.execute(insert_query, (
-            client['client_id'], client['client_name'], client['tech_stack_name'],
-            update_type, description, impact, recommended_actions, advisory_content, 'Sent'
-        ))
+            return jsonify({
+                "message": f"Advisory has been dispatched and recorded for {len(affected_clients)} clients.",
+                "advisories": [
+                    {"client_id": client['client_id'], "client_name": client['client_name'],
+                     "advisory_id": advisory_ids.get(client['client_id'])}
+                    for client in affected_clients
+                ],
+            }), 201
 
+    
+    def advisory_page(filters):
+        """Shared body of the advisory listings; see app/advisory_query.py for the paging."""
+        limit = request.args.get('limit', ADVISORY_PAGE_SIZE, type=int)
+        if not 1 <= limit <= ADVISORY_MAX_PAGE_SIZE:
+            return jsonify({"error": f"limit must be between 1 and {ADVISORY_MAX_PAGE_SIZE}"}), 400
+        for name in ('status', 'service_or_os'):
+            if request.args.get(name):
+                filters[name] = request.args[name]
+        include_content = request.args.get('include') == 'content'
 
+        try:
+            with db_connection() as conn:
+                rows, next_cursor = list_advisories(
+                    conn, filters, after=request.args.get('cursor') or None, limit=limit,
+                    include_content=include_content
+                )
+        except AdvisoryCursorError as e:
+            return jsonify({"error": str(e)}), 400
 
-        conn.commit()
-        conn.close()
-        
-        return jsonify({"message": f"Advisory has been dispatched and recorded for {len(affected_clients)} clients."}), 201
+        response = jsonify(rows)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
 
-    
     @app.route('/api/advisories', methods=['GET'])
     def get_advisories():
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT id, client_id, client_name, advisory_content, status, timestamp
-            FROM advisories
-            ORDER BY timestamp DESC
-        """)
-        data = cursor.fetchall()
-        conn.close()
-        return jsonify(data)
+        """Advisories newest first, one page at a time.
+
+        Query parameters:
+            client_id, status, service_or_os -- exact-match filters
+            limit    -- page size (default 50)
+            cursor   -- continue after a previous page (from X-Next-Cursor)
+            include  -- "content" to add the text columns; otherwise summaries
+                        only, with content from GET /api/advisories/<id>
+        """
+        filters = {}
+        client_id = request.args.get('client_id', type=int)
+        if client_id is not None:
+            filters['client_id'] = client_id
+        return advisory_page(filters)
+
+    @app.route('/api/advisories/<int:advisory_id>', methods=['GET'])
+    def get_advisory_detail(advisory_id):
+        with db_connection() as conn:
+            advisory = get_advisory(conn, advisory_id)
+        if advisory is None:
+            return jsonify({"error": "Advisory not found"}), 404
+        return jsonify(advisory)
 
 
     @app.route('/api/advisories/<int:advisory_id>', methods=['PUT'])
@@ -1483,94 +1598,149 @@ This advisory provides critical information regarding a recent {update_type} for
         if not new_content and not new_status:
             return jsonify({'error': 'No content or status provided for update'}), 400
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        fields_to_update = []
-        params = []
-        if new_content:
-            fields_to_update.append("advisory_content = %s")
-            params.append(new_content)
-        if new_status in ['Draft', 'Sent']:
-            fields_to_update.append("status = %s")
-            params.append(new_status)
-        
-        if not fields_to_update:
-            return jsonify({'error': 'Invalid fields for update'}), 400
+        with db_connection() as conn:
+            cursor = conn.cursor()
 
-        params.append(advisory_id)
-        query = f"UPDATE advisories SET {', '.join(fields_to_update)}, timestamp = NOW() WHERE id = %s"
-        
-        cursor.execute(query, tuple(params))
-        conn.commit()
-        conn.close()
+            fields_to_update = []
+            params = []
+            if new_content:
+                fields_to_update.append("advisory_content = %s")
+                params.append(new_content)
+            if new_status in ['Draft', 'Sent']:
+                fields_to_update.append("status = %s")
+                params.append(new_status)
+
+            if not fields_to_update:
+                return jsonify({'error': 'Invalid fields for update'}), 400
+
+            params.append(advisory_id)
+            query = f"UPDATE advisories SET {', '.join(fields_to_update)}, timestamp = NOW() WHERE id = %s"
+
+            cursor.execute(query, tuple(params))
+            if new_content:
+                # Findings polled after this edit render below the edited text
+                rebase_draft(cursor, advisory_id, new_content)
+            if new_status == 'Sent':
+                # Later reports of its findings belong in the client's next draft
+                release_findings(cursor, advisory_id)
+            conn.commit()
+            client_overview_cache.invalidate()
 
-        return jsonify({'message': 'Advisory updated successfully'}), 200
+            return jsonify({'message': 'Advisory updated successfully'}), 200
 
     @app.route('/api/rss-feeds', methods=['GET', 'POST', 'DELETE'])
     def manage_rss_feeds():
-        conn = get_db_connection()
-        # Use dictionary=True for GET, but not for others to avoid issues
-        cursor = conn.cursor(dictionary=True if request.method == 'GET' else False)
-
-        if request.method == 'GET':
-            tech_stack_id = request.args.get('techStackId')
-            if not tech_stack_id:
-                conn.close()
-                return jsonify({'error': 'Missing techStackId'}), 400
-            cursor.execute("SELECT url FROM rss_feeds WHERE tech_stack_id = %s", (tech_stack_id,))
-            feeds = cursor.fetchall()
-            conn.close()
-            return jsonify(feeds)
-
-        elif request.method == 'POST':
-            data = request.get_json()
-            tech_stack_id = data.get('tech_stack_id')
-            url = data.get('url')
-            if not tech_stack_id or not url:
-                conn.close()
-                return jsonify({'error': 'Missing tech_stack_id or url'}), 400
-            try:
-                cursor.execute("INSERT INTO rss_feeds (tech_stack_id, url) VALUES (%s, %s)", (tech_stack_id, url))
-                conn.commit()
-                return jsonify({'message': 'RSS feed added successfully'})
-            except mysql.connector.Error as err:
-                 # Check for duplicate entry error
-                if err.errno == 1062:
-                    return jsonify({"error": "This RSS feed URL already exists for this tech stack."}), 409
-                return jsonify({"error": str(err)}), 500
-            finally:
-                conn.close()
+        with db_connection() as conn:
+            # Use dictionary=True for GET, but not for others to avoid issues
+            cursor = conn.cursor(dictionary=True if request.method == 'GET' else False)
+
+            if request.method == 'GET':
+                tech_stack_id = request.args.get('techStackId')
+                if not tech_stack_id:
+                    return jsonify({'error': 'Missing techStackId'}), 400
+                cursor.execute("SELECT url FROM rss_feeds WHERE tech_stack_id = %s", (tech_stack_id,))
+                feeds = cursor.fetchall()
+                return jsonify(feeds)
+
+            elif request.method == 'POST':
+                data = request.get_json()
+                tech_stack_id = data.get('tech_stack_id')
+                url = data.get('url')
+                if not tech_stack_id or not url:
+                    return jsonify({'error': 'Missing tech_stack_id or url'}), 400
+                try:
+                    cursor.execute("INSERT INTO rss_feeds (tech_stack_id, url) VALUES (%s, %s)", (tech_stack_id, url))
+                    conn.commit()
+                    tech_index.reload_feeds(conn, int(tech_stack_id))
+                    return jsonify({'message': 'RSS feed added successfully'})
+                except mysql.connector.Error as err:
+                     # Check for duplicate entry error
+                    if err.errno == 1062:
+                        return jsonify({"error": "This RSS feed URL already exists for this tech stack."}), 409
+                    return jsonify({"error": str(err)}), 500
+
+            # <<< NEW: Handle DELETE requests >>>
+            elif request.method == 'DELETE':
+                data = request.get_json()
+                tech_stack_id = data.get('tech_stack_id')
+                urls_to_delete = data.get('urls')
 
-        # <<< NEW: Handle DELETE requests >>>
-        elif request.method == 'DELETE':
-            data = request.get_json()
-            tech_stack_id = data.get('tech_stack_id')
-            urls_to_delete = data.get('urls')
+                if not tech_stack_id or not urls_to_delete or not isinstance(urls_to_delete, list):
+                    return jsonify({'error': 'A tech_stack_id and a list of urls are required.'}), 400
 
-            if not tech_stack_id or not urls_to_delete or not isinstance(urls_to_delete, list):
-                conn.close()
-                return jsonify({'error': 'A tech_stack_id and a list of urls are required.'}), 400
-            
+                try:
+                    # Prepare query with placeholders for the IN clause
+                    placeholders = ', '.join(['%s'] * len(urls_to_delete))
+                    query = f"DELETE FROM rss_feeds WHERE tech_stack_id = %s AND url IN ({placeholders})"
+
+                    # Combine parameters into a single tuple
+                    params = (tech_stack_id,) + tuple(urls_to_delete)
+
+                    cursor.execute(query, params)
+                    conn.commit()
+                    tech_index.reload_feeds(conn, int(tech_stack_id))
+
+                    # Check how many rows were deleted
+                    deleted_count = cursor.rowcount
+                    return jsonify({'message': f'{deleted_count} RSS feed(s) deleted successfully.'}), 200
+                except Exception as e:
+                    conn.rollback()
+                    return jsonify({'error': f"Failed to delete feeds: {e}"}), 500
+
+    @app.route('/api/feed-rules', methods=['GET', 'POST', 'DELETE'])
+    def manage_feed_rules():
+        """Relevance rules for feed triage: keyword, phrase or regex, global or per tech stack.
+
+        Rules without a tech_stack_id apply to every tech stack. Changes are
+        compiled immediately here and picked up by the poller on its next run.
+        """
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
             try:
-                # Prepare query with placeholders for the IN clause
-                placeholders = ', '.join(['%s'] * len(urls_to_delete))
-                query = f"DELETE FROM rss_feeds WHERE tech_stack_id = %s AND url IN ({placeholders})"
-                
-                # Combine parameters into a single tuple
-                params = (tech_stack_id,) + tuple(urls_to_delete)
-                
-                cursor.execute(query, params)
-                conn.commit()
-                
-                # Check how many rows were deleted
-                deleted_count = cursor.rowcount
-                return jsonify({'message': f'{deleted_count} RSS feed(s) deleted successfully.'}), 200
-            except Exception as e:
+                if request.method == 'GET':
+                    tech_stack_id = request.args.get('techStackId')
+                    query = "SELECT id, tech_stack_id, rule_type, pattern, enabled, created_at FROM feed_rules"
+                    if tech_stack_id:
+                        cursor.execute(query + " WHERE tech_stack_id = %s OR tech_stack_id IS NULL ORDER BY id",
+                                       (tech_stack_id,))
+                    else:
+                        cursor.execute(query + " ORDER BY id")
+                    return jsonify(cursor.fetchall())
+
+                elif request.method == 'POST':
+                    data = request.get_json()
+                    tech_stack_id = data.get('tech_stack_id')
+                    rule_type = data.get('rule_type', 'keyword')
+                    try:
+                        pattern = validate_rule(rule_type, data.get('pattern'))
+                    except FeedRuleError as e:
+                        return jsonify({'error': str(e)}), 400
+                    cursor.execute(
+                        "INSERT INTO feed_rules (tech_stack_id, rule_type, pattern) VALUES (%s, %s, %s)",
+                        (tech_stack_id, rule_type, pattern)
+                    )
+                    conn.commit()
+                    rule_id = cursor.lastrowid
+                    feed_rules.load(conn)
+                    return jsonify({'message': 'Feed rule added successfully', 'id': rule_id}), 201
+
+                elif request.method == 'DELETE':
+                    data = request.get_json()
+                    ids = data.get('ids')
+                    if not ids or not isinstance(ids, list):
+                        return jsonify({'error': 'A list of rule ids is required.'}), 400
+                    placeholders = ', '.join(['%s'] * len(ids))
+                    cursor.execute(f"DELETE FROM feed_rules WHERE id IN ({placeholders})", tuple(ids))
+                    conn.commit()
+                    deleted_count = cursor.rowcount
+                    feed_rules.load(conn)
+                    return jsonify({'message': f'{deleted_count} feed rule(s) deleted successfully.'}), 200
+
+            except mysql.connector.Error as err:
                 conn.rollback()
-                return jsonify({'error': f"Failed to delete feeds: {e}"}), 500
+                return jsonify({'error': str(err)}), 500
             finally:
-                conn.close()
+                cursor.close()
 
 
 
@@ -1578,25 +1748,25 @@ This advisory provides critical information regarding a recent {update_type} for
     @app.route('/api/client-tech/<int:client_tech_map_id>', methods=['DELETE'])
     def delete_client_tech(client_tech_map_id):
         """Deletes a specific tech stack assigned to a client."""
-        try:
-            conn = get_db_connection()
+        with db_connection() as conn:
             cursor = conn.cursor()
+            try:
+                query = "DELETE FROM client_tech_map WHERE id = %s"
+                cursor.execute(query, (client_tech_map_id,))
+                conn.commit()
+                client_overview_cache.invalidate(tech_index.client_for_map(client_tech_map_id))
+                tech_index.remove_map(client_tech_map_id)
 
-            query = "DELETE FROM client_tech_map WHERE id = %s"
-            cursor.execute(query, (client_tech_map_id,))
-            conn.commit()
-
-            if cursor.rowcount == 0:
-                return jsonify({"error": "No tech stack assignment found with that ID."}), 404
+                if cursor.rowcount == 0:
+                    return jsonify({"error": "No tech stack assignment found with that ID."}), 404
 
-            return jsonify({"message": "Tech stack assignment deleted successfully"}), 200
+                return jsonify({"message": "Tech stack assignment deleted successfully"}), 200
 
-        except Exception as e:
-            conn.rollback()
-            return jsonify({"error": str(e)}), 500
-        finally:
-            cursor.close()
-            conn.close()
+            except Exception as e:
+                conn.rollback()
+                return jsonify({"error": str(e)}), 500
+            finally:
+                cursor.close()
 
 
 
@@ -1605,33 +1775,46 @@ This advisory provides critical information regarding a recent {update_type} for
 
     @app.route('/api/clients/<int:client_id>/advisories', methods=['GET'])
     def get_client_advisories(client_id):
+        """The client's advisories, paged and filtered like GET /api/advisories."""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
+            return advisory_page({'client_id': client_id})
+        except Exception as e:
+            reraise_pool_exhausted(e)
+            return jsonify({"error": str(e)}), 500
 
-            query = """
-                SELECT id, client_id, client_name, service_or_os, update_type,
-                    description, impact, recommended_actions, advisory_content,
-                    status, timestamp
-                FROM advisories
-                WHERE client_id = %s
-                ORDER BY timestamp DESC
-            """
-            cursor.execute(query, (client_id,))
-            advisories = cursor.fetchall()
 
-            cursor.close()
-            conn.close()
 
-            return jsonify(advisories), 200
-        except Exception as e:
-            return jsonify({"error": str(e)}), 500
 
 
 
 
+    @app.route('/api/advisories/<int:advisory_id>/delivery', methods=['GET'])
+    def get_advisory_delivery(advisory_id):
+        """Delivery status of every outbox message queued for the advisory, and of its digest entries."""
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            messages = outbox.delivery_status(cursor, advisory_id)
+            digests = digest.digest_status(cursor, advisory_id)
+            cursor.close()
+        return jsonify({"messages": messages, "digests": digests})
+
+    @app.route('/api/metrics/http', methods=['GET'])
+    def http_metrics():
+        """Circuit breaker state per upstream for the shared outbound HTTP clients."""
+        return jsonify({client.name: client.stats() for client in (graph_http, login_http, feed_http)})
 
+    @app.route('/api/metrics/mail-outbox', methods=['GET'])
+    def mail_outbox_metrics():
+        return jsonify(mail_outbox.stats())
 
+    @app.route('/api/mail-digests/flush', methods=['POST'])
+    def flush_mail_digests():
+        """Queue every pending digest now instead of waiting out the window."""
+        try:
+            return jsonify({"digests_queued": digest_builder.flush_due(window=0)})
+        except Exception as e:
+            reraise_pool_exhausted(e)
+            return jsonify({"error": str(e)}), 500
 
     @app.route('/api/dispatch-advisory', methods=['POST'])
     def dispatch_advisory():
@@ -1644,53 +1827,48 @@ This advisory provides critical information regarding a recent {update_type} for
             if not all([advisory_title, advisory_content, client_tech_map_id]):
                 return jsonify({"error": "Missing advisory details"}), 400
 
-            # Fetch contacts for the specific client-tech assignment
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            query = """
-                SELECT c.email 
-                FROM contacts c
-                WHERE c.client_tech_map_id = %s
-            """
-            cursor.execute(query, (client_tech_map_id,))
-            recipients = [row['email'] for row in cursor.fetchall()]
-            
+            # "digest" holds the advisory for each contact's next consolidated mail; "immediate" queues it now
+            mode = data.get('mode') or MAIL_DIGEST_DEFAULT_MODE
+            if mode not in ('immediate', 'digest'):
+                return jsonify({"error": "mode must be 'immediate' or 'digest'"}), 400
+
+            # Contacts for the specific client-tech assignment
+            recipients = tech_index.contacts_for_map(int(client_tech_map_id))
+
             if not recipients:
                 return jsonify({"message": "Advisory not sent. No contacts found for this tech stack."}), 200
 
-            access_token = get_graph_access_token()
-            headers = {
-                'Authorization': f'Bearer {access_token}',
-                'Content-Type': 'application/json'
-            }
+            if mode == 'digest':
+                with db_connection() as conn:
+                    cursor = conn.cursor()
+                    held = digest.collect(
+                        cursor, advisory_title, advisory_content, recipients,
+                        advisory_id=data.get('advisoryId'), client_tech_map_id=client_tech_map_id
+                    )
+                    conn.commit()
+                    cursor.close()
+                return jsonify({
+                    "message": f"Advisory held for the next digest of {held} contacts.",
+                    "mode": mode,
+                }), 202
 
-            # Construct the email payload
-            email_payload = {
-                "message": {
-                    "subject": advisory_title,
-                    "body": {
-                        "contentType": "Text",
-                        "content": advisory_content
-                    },
-                    "toRecipients": [{"emailAddress": {"address": email}} for email in recipients]
-                },
-                "saveToSentItems": "true"
-            }
+            # Queued rather than sent here: the outbox workers deliver it and retry throttled/failed sends
+            with db_connection() as conn:
+                cursor = conn.cursor()
+                outbox_ids = outbox.enqueue(
+                    cursor, advisory_title, advisory_content, recipients,
+                    advisory_id=data.get('advisoryId'), client_tech_map_id=client_tech_map_id
+                )
+                conn.commit()
+                cursor.close()
+            mail_outbox.wake()
 
-            # Send the email via Graph API
-            # NOTE: You'll need to use a mailbox that has permissions to send on behalf of others.
-            # This is a common point of configuration. The "me" here usually requires a signed-in user or an admin-configured mailbox.
-            send_mail_endpoint = f'{GRAPH_ENDPOINT}/users/YOUR_SENDER_EMAIL/sendMail' 
-            
-            response = requests.post(send_mail_endpoint, headers=headers, json=email_payload)
-            
-            if response.status_code == 202:
-                return jsonify({"message": f"Advisory dispatched to {len(recipients)} contacts."}), 200
-            else:
-                return jsonify({"error": f"Failed to send email. Status code: {response.status_code}, Response: {response.text}"}), 500
+            return jsonify({
+                "message": f"Advisory queued for delivery to {len(recipients)} contacts.",
+                "mode": mode,
+                "outbox_ids": outbox_ids,
+            }), 202
 
         except Exception as e:
-            return jsonify({"error": str(e)}), 500
-        finally:
-            cursor.close()
-            conn.close()
\ No newline at end of file
+            reraise_pool_exhausted(e)
+            return jsonify({"error": str(e)}), 500
\ No newline at end of file
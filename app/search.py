@@ -0,0 +1,136 @@
+import html
+import re
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+# Characters of context kept around the first match in a snippet
+SNIPPET_WIDTH = 200
+
+# Operators of MySQL's boolean full-text syntax, stripped from user input
+BOOLEAN_OPERATORS = re.compile(r'[+\-<>()~*"@]')
+WORD = re.compile(r'\w+')
+# innodb_ft_min_token_size and InnoDB's default stopword list; such words aren't in the index
+MIN_TOKEN_SIZE = 3
+STOPWORDS = frozenset("""
+    a about an are as at be by com de en for from how i in is it la of on or that the this to
+    was what when where who will with und www
+""".split())
+
+# Source -> (FULLTEXT column list, filter parameter -> column); filters are exact matches
+SOURCES = {
+    "advisories": (
+        "a.advisory_content, a.description",
+        {"client_id": "a.client_id", "status": "a.status", "service_or_os": "a.service_or_os"},
+    ),
+    "notes": (
+        "hn.note",
+        {"shift_id": "hn.shift_id", "employee_id": "hn.employee_id"},
+    ),
+}
+
+# Column each source's since/until date range applies to
+DATE_COLUMNS = {"advisories": "a.timestamp", "notes": "hn.created_at"}
+
+QUERIES = {
+    "advisories": (
+        "SELECT a.id, a.client_id, a.client_name, a.service_or_os, a.update_type, a.status, a.timestamp, "
+        "a.description, a.advisory_content, {match} AS score "
+        "FROM advisories a"
+    ),
+    "notes": (
+        "SELECT hn.id, hn.shift_id, hn.employee_id, u.username, sa.shift_type, hn.created_at, "
+        "hn.note, {match} AS score "
+        "FROM handover_notes hn "
+        "LEFT JOIN users u ON u.id = hn.employee_id "
+        "LEFT JOIN shift_assignments sa ON sa.id = hn.shift_id"
+    ),
+}
+
+# Columns a hit's snippet is cut from, in order of preference
+SNIPPET_COLUMNS = {"advisories": ("advisory_content", "description"), "notes": ("note",)}
+
+
+def parse_query(text):
+    """Turn free text into ``(boolean_query, terms)`` for MATCH ... AGAINST (... IN BOOLEAN MODE).
+
+    Every term is required, except stopwords and words too short to be
+    indexed. Plain words also match as prefixes (``patch`` finds
+    "patched"); terms with punctuation such as ``CVE-2025-1234`` or
+    ``10.0.0.1`` are matched as phrases of their parts. ``terms`` are the
+    words to highlight.
+    """
+    clauses = []
+    terms = []
+    for raw in (text or '').split():
+        parts = WORD.findall(BOOLEAN_OPERATORS.sub(' ', raw))
+        if not parts:
+            continue
+        cleaned = BOOLEAN_OPERATORS.sub('', raw)
+        if len(parts) == 1 and parts[0] == cleaned:
+            if len(parts[0]) < MIN_TOKEN_SIZE or parts[0].lower() in STOPWORDS:
+                continue
+            clauses.append(f"+{parts[0]}*")
+        else:
+            clauses.append(f'+"{" ".join(parts)}"')
+        terms.extend(parts)
+    return ' '.join(clauses), list(dict.fromkeys(term.lower() for term in terms))
+
+
+def snippet(text, terms, width=SNIPPET_WIDTH):
+    """HTML-escaped excerpt of ``text`` around the first matched term, with matches wrapped in ``<mark>``."""
+    if not text:
+        return ''
+    pattern = re.compile('|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE) \
+        if terms else None
+    first = pattern.search(text) if pattern else None
+    start = max(0, first.start() - width // 3) if first else 0
+    end = min(len(text), start + width)
+    excerpt = text[start:end]
+    parts = []
+    position = 0
+    if pattern:
+        for match in pattern.finditer(excerpt):
+            parts.append(html.escape(excerpt[position:match.start()]))
+            parts.append(f"<mark>{html.escape(match.group())}</mark>")
+            position = match.end()
+    parts.append(html.escape(excerpt[position:]))
+    return ('…' if start > 0 else '') + ''.join(parts) + ('…' if end < len(text) else '')
+
+
+def search(cursor, source, text, filters=None, since=None, until=None, limit=SEARCH_PAGE_SIZE):
+    """Best-matching rows of one source, each with its relevance ``score`` and a highlighted ``snippet``.
+
+    Ranked by InnoDB's full-text relevance (newest first among equals)
+    through the FULLTEXT indexes created in init_db. ``filters`` maps the
+    source's filter parameters to values; ``since``/``until`` bound its date.
+    Full advisory and note text is dropped from the hits.
+    """
+    columns, filter_columns = SOURCES[source]
+    boolean_query, terms = parse_query(text)
+    if not boolean_query:
+        return []
+    match = f"MATCH({columns}) AGAINST (%s IN BOOLEAN MODE)"
+    conditions = [match]
+    params = [boolean_query, boolean_query]
+    for name, value in (filters or {}).items():
+        conditions.append(f"{filter_columns[name]} = %s")
+        params.append(value)
+    if since is not None:
+        conditions.append(f"{DATE_COLUMNS[source]} >= %s")
+        params.append(since)
+    if until is not None:
+        conditions.append(f"{DATE_COLUMNS[source]} < %s")
+        params.append(until)
+    cursor.execute(
+        f"{QUERIES[source].format(match=match)} WHERE {' AND '.join(conditions)} "
+        f"ORDER BY score DESC, {DATE_COLUMNS[source]} DESC LIMIT %s",
+        (*params, limit)
+    )
+    hits = cursor.fetchall()
+    for hit in hits:
+        text_column = next((column for column in SNIPPET_COLUMNS[source] if hit.get(column)), None)
+        hit['snippet'] = snippet(hit[text_column], terms) if text_column else ''
+        for column in SNIPPET_COLUMNS[source]:
+            hit.pop(column, None)
+        hit['score'] = float(hit['score'])
+    return hits
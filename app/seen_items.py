@@ -0,0 +1,132 @@
+import hashlib
+import math
+import os
+import threading
+
+# Processed GUIDs older than this are expired; keep it well beyond how long feeds keep republishing an item
+FEED_GUID_RETENTION_DAYS = int(os.environ.get("FEED_GUID_RETENTION_DAYS", 180))
+FEED_GUID_BLOOM_CAPACITY = int(os.environ.get("FEED_GUID_BLOOM_CAPACITY", 1000000))
+FEED_GUID_BLOOM_ERROR_RATE = float(os.environ.get("FEED_GUID_BLOOM_ERROR_RATE", 0.01))
+# GUIDs per IN (...) lookup and per retention DELETE
+LOOKUP_BATCH_SIZE = 1000
+PURGE_BATCH_SIZE = 10000
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on one blake2b digest)."""
+
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class SeenItemStore:
+    """Tracks which feed GUIDs were already processed without loading them all per request.
+
+    Candidates are checked in batched ``IN (...)`` lookups against the unique
+    index on ``processed_feed_items.item_guid``. An in-memory Bloom filter,
+    loaded once and fed every GUID marked since, answers "definitely new"
+    without a query; only its positives (mostly genuinely seen items, plus the
+    configured false-positive rate) go to MySQL. GUIDs marked by another
+    process can be missed by this process's filter, which only costs a
+    duplicate candidate: feed_items' unique key stops it being fanned out twice.
+    """
+
+    def __init__(self, capacity=FEED_GUID_BLOOM_CAPACITY, error_rate=FEED_GUID_BLOOM_ERROR_RATE):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._bloom = None
+        self._lock = threading.Lock()
+
+    def load(self, conn):
+        """(Re)build the Bloom filter from processed_feed_items, streamed in batches."""
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        cursor = conn.cursor()
+        cursor.execute("SELECT item_guid FROM processed_feed_items")
+        while True:
+            rows = cursor.fetchmany(LOOKUP_BATCH_SIZE * 10)
+            if not rows:
+                break
+            for (guid,) in rows:
+                bloom.add(guid)
+        cursor.close()
+        with self._lock:
+            self._bloom = bloom
+
+    def filter_unseen(self, conn, guids):
+        """Return the subset of ``guids`` that hasn't been processed yet."""
+        with self._lock:
+            if self._bloom is None or self._bloom.count > self.capacity:
+                # Rebuilt lazily, and again once overfull (its error rate climbs past the target)
+                self._bloom = None
+        if self._bloom is None:
+            self.load(conn)
+
+        candidates = list(dict.fromkeys(guids))
+        bloom = self._bloom
+        maybe_seen = [guid for guid in candidates if guid in bloom]
+        if not maybe_seen:
+            return set(candidates)
+
+        seen = set()
+        cursor = conn.cursor()
+        for start in range(0, len(maybe_seen), LOOKUP_BATCH_SIZE):
+            batch = maybe_seen[start:start + LOOKUP_BATCH_SIZE]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(
+                f"SELECT item_guid FROM processed_feed_items WHERE item_guid IN ({placeholders})", tuple(batch)
+            )
+            seen.update(guid for (guid,) in cursor.fetchall())
+        cursor.close()
+        return {guid for guid in candidates if guid not in seen}
+
+    def mark_seen(self, cursor, guids):
+        """Record ``guids`` as processed (part of the caller's transaction)."""
+        if not guids:
+            return
+        cursor.executemany(
+            "INSERT IGNORE INTO processed_feed_items (item_guid, processed_at) VALUES (%s, NOW())",
+            [(guid,) for guid in guids]
+        )
+        with self._lock:
+            if self._bloom is not None:
+                for guid in guids:
+                    self._bloom.add(guid)
+
+    def purge(self, conn, retention_days=FEED_GUID_RETENTION_DAYS):
+        """Delete GUIDs processed more than ``retention_days`` ago, in small batches; returns the count."""
+        deleted = 0
+        cursor = conn.cursor()
+        try:
+            while True:
+                cursor.execute(
+                    "DELETE FROM processed_feed_items WHERE processed_at < NOW() - INTERVAL %s DAY LIMIT %s",
+                    (retention_days, PURGE_BATCH_SIZE)
+                )
+                conn.commit()
+                deleted += cursor.rowcount
+                if cursor.rowcount < PURGE_BATCH_SIZE:
+                    break
+        finally:
+            cursor.close()
+        # Expired GUIDs stay set in the filter; they just fall through to the (now negative) DB check
+        return deleted
+
+
+seen_items = SeenItemStore()
@@ -0,0 +1,212 @@
+import bisect
+import os
+import re
+import threading
+import time
+
+from app.db import db_connection
+from app.versions import version_key
+
+# Rebuild at least this often (seconds), picking up writes made by other worker processes
+TECH_INDEX_MAX_AGE = float(os.environ.get("TECH_INDEX_MAX_AGE", 300))
+
+MAP_QUERY = (
+    "SELECT ctm.id, ctm.client_id, c.name AS client_name, ctm.tech_stack_id, ts.name AS tech_stack_name, "
+    "ctm.version "
+    "FROM client_tech_map ctm "
+    "JOIN clients c ON c.id = ctm.client_id "
+    "JOIN tech_stacks ts ON ts.id = ctm.tech_stack_id"
+)
+
+
+def like_pattern(pattern):
+    """Compile a SQL LIKE pattern (``%``, ``_``) to a case-insensitive regex, as MySQL's default collation matches."""
+    parts = []
+    for char in pattern:
+        if char == '%':
+            parts.append('.*')
+        elif char == '_':
+            parts.append('.')
+        else:
+            parts.append(re.escape(char))
+    return re.compile(''.join(parts), re.IGNORECASE | re.DOTALL)
+
+
+class TechIndex:
+    """In-process reverse index: tech stack -> client_tech_map rows -> contact emails, plus feed URLs.
+
+    Built in one pass per table and kept current by the write endpoints
+    (``reload_maps``, ``remove_map``, ``add_contact``, ``reload_feeds``), so
+    advisory fan-out and recipient resolution are dictionary lookups. It is
+    also rebuilt once it's older than ``TECH_INDEX_MAX_AGE``, which bounds
+    how stale it can get relative to writes handled by other processes.
+    Each stack's maps are also kept sorted by ``version_key``, so a version
+    range query bisects to the matching maps instead of scanning them all.
+    """
+
+    def __init__(self, max_age=TECH_INDEX_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._maps = {}
+        self._by_tech = {}
+        self._by_version = {}
+        self._by_client = {}
+        self._contacts = {}
+        self._feeds = {}
+        self._built_at = None
+
+    @property
+    def built(self):
+        return self._built_at is not None
+
+    # --- Maintenance ---
+
+    def build(self, conn):
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(MAP_QUERY)
+        maps = cursor.fetchall()
+        cursor.execute("SELECT id, client_tech_map_id, email FROM client_tech_contacts")
+        contacts = cursor.fetchall()
+        cursor.execute("SELECT tech_stack_id, url FROM rss_feeds")
+        feeds = cursor.fetchall()
+        cursor.close()
+
+        with self._lock:
+            self._maps = {}
+            self._by_tech = {}
+            self._by_version = {}
+            self._by_client = {}
+            self._contacts = {}
+            self._feeds = {}
+            for row in maps:
+                self._add_map(row)
+            for row in contacts:
+                self._contacts.setdefault(row['client_tech_map_id'], {})[row['id']] = row['email']
+            for row in feeds:
+                self._feeds.setdefault(row['tech_stack_id'], []).append(row['url'])
+            self._built_at = time.monotonic()
+
+    def ensure_current(self, conn=None):
+        """Build on first use or once older than max_age, using ``conn`` or a pooled connection."""
+        with self._lock:
+            if self.built and time.monotonic() - self._built_at < self.max_age:
+                return
+            if conn is not None:
+                self.build(conn)
+            else:
+                with db_connection() as own_conn:
+                    self.build(own_conn)
+
+    def _add_map(self, row):
+        self._remove_map(row['id'])
+        row['version_key'] = version_key(row['version'])
+        self._maps[row['id']] = row
+        self._by_tech.setdefault(row['tech_stack_id'], set()).add(row['id'])
+        if row['version_key'] is not None:
+            bisect.insort(self._by_version.setdefault(row['tech_stack_id'], []), (row['version_key'], row['id']))
+        self._by_client.setdefault(row['client_id'], set()).add(row['id'])
+
+    def _remove_map(self, map_id):
+        row = self._maps.pop(map_id, None)
+        if row is None:
+            return
+        for mapping, key in ((self._by_tech, row['tech_stack_id']), (self._by_client, row['client_id'])):
+            ids = mapping.get(key)
+            if ids is not None:
+                ids.discard(map_id)
+                if not ids:
+                    del mapping[key]
+        if row['version_key'] is not None:
+            keys = self._by_version.get(row['tech_stack_id'], [])
+            position = bisect.bisect_left(keys, (row['version_key'], map_id))
+            if position < len(keys) and keys[position][1] == map_id:
+                del keys[position]
+            if not keys:
+                self._by_version.pop(row['tech_stack_id'], None)
+
+    def reload_maps(self, conn, map_ids):
+        """Re-read client_tech_map rows (e.g. after an insert); a no-op until the index is built."""
+        with self._lock:
+            if not self.built or not map_ids:
+                return
+            placeholders = ', '.join(['%s'] * len(map_ids))
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(f"{MAP_QUERY} WHERE ctm.id IN ({placeholders})", tuple(map_ids))
+            for row in cursor.fetchall():
+                self._add_map(row)
+            cursor.close()
+
+    def remove_map(self, map_id):
+        with self._lock:
+            self._remove_map(map_id)
+            self._contacts.pop(map_id, None)
+
+    def add_contact(self, map_id, contact_id, email):
+        with self._lock:
+            if self.built:
+                self._contacts.setdefault(map_id, {})[contact_id] = email
+
+    def reload_feeds(self, conn, tech_stack_id):
+        with self._lock:
+            if not self.built:
+                return
+            cursor = conn.cursor()
+            cursor.execute("SELECT url FROM rss_feeds WHERE tech_stack_id = %s", (tech_stack_id,))
+            urls = [row[0] for row in cursor.fetchall()]
+            cursor.close()
+            if urls:
+                self._feeds[tech_stack_id] = urls
+            else:
+                self._feeds.pop(tech_stack_id, None)
+
+    # --- Queries ---
+
+    def clients_for_tech(self, tech_stack_id, version_like=None, version_intervals=None):
+        """One ``{client_id, client_name, tech_stack_name}`` per client mapped to the tech stack.
+
+        Optionally filtered by a LIKE pattern on the version text or by
+        half-open ``version_key`` intervals (see app/versions.py).
+        """
+        self.ensure_current()
+        matcher = like_pattern(version_like).fullmatch if version_like is not None else None
+        clients = {}
+        with self._lock:
+            if version_intervals is None:
+                map_ids = self._by_tech.get(tech_stack_id, ())
+            else:
+                keys = self._by_version.get(tech_stack_id, [])
+                map_ids = [map_id for low, high in version_intervals
+                           for _, map_id in keys[bisect.bisect_left(keys, (low,)):bisect.bisect_left(keys, (high,))]]
+            for map_id in map_ids:
+                row = self._maps[map_id]
+                if row['client_id'] in clients:
+                    continue
+                if matcher is not None and not matcher(row['version'] or ''):
+                    continue
+                clients[row['client_id']] = {
+                    "client_id": row['client_id'],
+                    "client_name": row['client_name'],
+                    "tech_stack_name": row['tech_stack_name'],
+                }
+        return list(clients.values())
+
+    def contacts_for_map(self, map_id):
+        self.ensure_current()
+        with self._lock:
+            return list(self._contacts.get(map_id, {}).values())
+
+    def client_for_map(self, map_id):
+        self.ensure_current()
+        with self._lock:
+            row = self._maps.get(map_id)
+            return row['client_id'] if row else None
+
+    def feed_urls_for_client(self, client_id):
+        self.ensure_current()
+        with self._lock:
+            tech_stack_ids = {self._maps[map_id]['tech_stack_id'] for map_id in self._by_client.get(client_id, ())}
+            return list(dict.fromkeys(url for tech_stack_id in tech_stack_ids
+                                      for url in self._feeds.get(tech_stack_id, ())))
+
+
+tech_index = TechIndex()
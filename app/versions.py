@@ -0,0 +1,123 @@
+import re
+
+# Each of major/minor/patch gets six decimal digits of a version key (see TechIndex)
+COMPONENT_LIMIT = 1000000
+MAX_KEY = COMPONENT_LIMIT ** 3 - 1
+
+_VERSION = re.compile(r'^v?(\d+)(?:\.(\d+|[x*]))?(?:\.(\d+|[x*]))?(?:[-+.].*)?$', re.IGNORECASE)
+_COMPARATOR = re.compile(r'^(<=|>=|==|=|<|>|\^|~)?\s*(\S+)$')
+# A targeting expression is a range (rather than a LIKE pattern) if it uses any of these
+_RANGE_OPERATORS = re.compile(r'[<>=^~]|\|\|')
+
+
+class VersionRangeError(ValueError):
+    """A version range expression can't be parsed."""
+
+
+def _components(text):
+    """``[major, minor, patch]`` with None for wildcard or missing parts, or None if unparseable."""
+    match = _VERSION.match((text or '').strip())
+    if not match:
+        return None
+    parts = []
+    for group in match.groups():
+        if group is None or not group.isdigit():
+            parts.append(None)
+        else:
+            parts.append(min(int(group), COMPONENT_LIMIT - 1))
+    # Nothing after a wildcard is meaningful ("1.x.3" is treated as "1.x")
+    if None in parts:
+        first_missing = parts.index(None)
+        parts[first_missing:] = [None] * (3 - first_missing)
+    return parts
+
+
+def _key(major, minor=0, patch=0):
+    return (major * COMPONENT_LIMIT + minor) * COMPONENT_LIMIT + patch
+
+
+def version_key(text):
+    """Sortable integer for a version string ("2.4.58" -> 2.4.58, "7.2" -> 7.2.0), or None.
+
+    Pre-release and build suffixes are ignored. Versions that aren't dotted
+    numbers (e.g. "22H2", "latest") get None and are only reachable through
+    LIKE patterns, not range expressions.
+    """
+    parts = _components(text)
+    if parts is None:
+        return None
+    return _key(*(part or 0 for part in parts))
+
+
+def is_range_expression(text):
+    return bool(_RANGE_OPERATORS.search(text or ''))
+
+
+def _partial_bounds(parts):
+    """Half-open ``[low, high)`` covered by a partial version: "7" -> [7.0.0, 8.0.0), "7.2" -> [7.2.0, 7.3.0)."""
+    if parts[0] is None:
+        return 0, MAX_KEY + 1
+    if parts[1] is None:
+        return _key(parts[0]), _key(parts[0] + 1)
+    if parts[2] is None:
+        return _key(parts[0], parts[1]), _key(parts[0], parts[1] + 1)
+    exact = _key(*parts)
+    return exact, exact + 1
+
+
+def _comparator_bounds(operator, version):
+    if version in ('*', 'x', 'X'):
+        parts = [None, None, None]
+    else:
+        parts = _components(version)
+        if parts is None:
+            raise VersionRangeError(f"Invalid version {version!r}")
+    low, high = _partial_bounds(parts)
+    if operator in (None, '=', '=='):
+        return low, high
+    if operator == '>=':
+        return low, MAX_KEY + 1
+    if operator == '>':
+        return high, MAX_KEY + 1
+    if operator == '<':
+        return 0, low
+    if operator == '<=':
+        return 0, high
+    filled = [part or 0 for part in parts]
+    if operator == '^':
+        # Compatible with: the first non-zero component stays fixed
+        if filled[0] > 0 or parts[1] is None:
+            return _key(*filled), _key(filled[0] + 1)
+        if filled[1] > 0 or parts[2] is None:
+            return _key(*filled), _key(0, filled[1] + 1)
+        return _key(*filled), _key(*filled) + 1
+    # '~': patch-level changes if a minor version is given, else minor-level
+    if parts[1] is None:
+        return _key(filled[0]), _key(filled[0] + 1)
+    return _key(*filled), _key(filled[0], filled[1] + 1)
+
+
+def parse_range(expression):
+    """Parse a range expression into half-open ``(low, high)`` version_key intervals.
+
+    Comparators in one clause (separated by commas or spaces) are ANDed;
+    clauses separated by ``||`` are ORed. Supports ``<``, ``<=``, ``>``,
+    ``>=``, ``=``, ``^`` (compatible), ``~`` (approximately) and ``x``/``*``
+    wildcards, e.g. ``"< 2.4.58"``, ``">= 7.0, < 7.2.3"``, ``"^1.2 || ~2.0.3"``.
+    """
+    intervals = []
+    for clause in (expression or '').split('||'):
+        # Glue "< 2.4" into one token so whitespace can separate comparators
+        tokens = re.sub(r'(<=|>=|==|=|<|>|\^|~)\s+', r'\1', clause.replace(',', ' ')).split()
+        if not tokens:
+            raise VersionRangeError(f"Empty clause in version range {expression!r}")
+        low, high = 0, MAX_KEY + 1
+        for token in tokens:
+            match = _COMPARATOR.match(token)
+            if not match:
+                raise VersionRangeError(f"Invalid comparator {token!r}")
+            token_low, token_high = _comparator_bounds(*match.groups())
+            low, high = max(low, token_low), min(high, token_high)
+        if low < high:
+            intervals.append((low, high))
+    return intervals
@@ -0,0 +1,114 @@
+"""Benchmark feed triage: one scan per rule vs. the compiled rule engine.
+
+    python bench_feed_rules.py [--entries 5000] [--rules 200] [--repeat 3]
+
+Builds a synthetic corpus of RSS-like entries (title + summary, some with CVE
+IDs and CVSS scores) and a rule set of keywords, phrases and regexes, then
+times matching plus CVE/CVSS extraction over the whole corpus both ways: one
+scan per rule, and the compiled rule set.
+"""
+import argparse
+import random
+import re
+import time
+
+from app.feed_rules import CompiledRuleSet, DEFAULT_KEYWORDS, CVE_PATTERN, CVSS_SCORE_PATTERN
+
+WORDS = (
+    "cisco fortinet palo alto juniper windows linux kernel openssl apache nginx "
+    "router firewall switch gateway vpn remote code execution denial service "
+    "privilege escalation authentication bypass memory corruption overflow "
+    "release notes new feature improved performance customers support version "
+    "firmware appliance cloud storage backup database server client agent"
+).split()
+
+
+def make_corpus(count, seed=7):
+    rng = random.Random(seed)
+    corpus = []
+    for index in range(count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(40, 120))]
+        if rng.random() < 0.3:
+            words.insert(rng.randrange(len(words)), f"CVE-{rng.randint(2015, 2025)}-{rng.randint(1000, 99999)}")
+        if rng.random() < 0.2:
+            words.insert(rng.randrange(len(words)), f"CVSS v3.1 base score {rng.randint(1, 9)}.{rng.randint(0, 9)}")
+        if rng.random() < 0.2:
+            words.insert(rng.randrange(len(words)), rng.choice(DEFAULT_KEYWORDS))
+        corpus.append(f"Entry {index}: " + " ".join(words))
+    return corpus
+
+
+def make_rules(count, seed=11):
+    rng = random.Random(seed)
+    rules = [{"rule_type": "keyword", "pattern": keyword} for keyword in DEFAULT_KEYWORDS]
+    while len(rules) < count:
+        kind = rng.random()
+        if kind < 0.7:
+            rules.append({"rule_type": "keyword", "pattern": f"{rng.choice(WORDS)}{rng.randint(0, 999)}"})
+        elif kind < 0.9:
+            rules.append({"rule_type": "phrase", "pattern": f"{rng.choice(WORDS)} {rng.choice(WORDS)}"})
+        else:
+            rules.append({"rule_type": "regex", "pattern": rf"\b{rng.choice(WORDS)}\s+v?\d+\.\d+\b"})
+    return rules[:count]
+
+
+def naive_matcher(rules):
+    """The previous approach generalised to the same rule set: one scan of the text per rule."""
+    keywords = [rule["pattern"].lower() for rule in rules if rule["rule_type"] == "keyword"]
+    patterns = [
+        re.compile(r"\b" + r"\s+".join(map(re.escape, rule["pattern"].split())) + r"\b", re.IGNORECASE)
+        if rule["rule_type"] == "phrase" else re.compile(rule["pattern"], re.IGNORECASE)
+        for rule in rules if rule["rule_type"] != "keyword"
+    ]
+
+    def match(text):
+        content_to_check = text.lower()
+        matched = [keyword for keyword in keywords if keyword in content_to_check]
+        matched += [pattern for pattern in patterns if pattern.search(text)]
+        CVE_PATTERN.findall(text)
+        CVSS_SCORE_PATTERN.findall(text)
+        return matched
+
+    return match
+
+
+def timed(label, func, corpus, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        matched = sum(1 for text in corpus if func(text))
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<28} {best * 1000:9.1f} ms  {best / len(corpus) * 1e6:8.1f} us/entry  "
+          f"{matched} relevant")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=5000)
+    parser.add_argument("--rules", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.entries)
+    rules = make_rules(args.rules)
+    counts = {rule_type: sum(rule["rule_type"] == rule_type for rule in rules)
+              for rule_type in ("keyword", "phrase", "regex")}
+
+    started = time.perf_counter()
+    ruleset = CompiledRuleSet(rules)
+    print(f"{len(corpus)} entries, {len(rules)} rules {counts}; "
+          f"compiled in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    naive = timed("per-rule scan", naive_matcher(rules), corpus, args.repeat)
+    compiled = timed("compiled rule set", lambda text: ruleset.match(text)["relevant"], corpus, args.repeat)
+    print(f"speedup: {naive / compiled:.1f}x")
+
+    sample = next(text for text in corpus if "CVE-" in text)
+    result = ruleset.match(sample)
+    print(f"sample: cves={result['cve_ids']} cvss={result['cvss_score']} rules={result['matched_rules'][:5]}")
+
+
+if __name__ == "__main__":
+    main()
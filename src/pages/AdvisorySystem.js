@@ -17,6 +17,9 @@ export default function AdvisorySystem() {
   const [clients, setClients] = useState([]);
   const [techStacks, setTechStacks] = useState([]);
   const [advisories, setAdvisories] = useState([]);
+  // Cursor for the next page of advisories (X-Next-Cursor), and advisory bodies fetched on demand
+  const [nextCursor, setNextCursor] = useState(null);
+  const [advisoryContent, setAdvisoryContent] = useState({});
   const [isLoading, setIsLoading] = useState(true);
 
   // --- UI and Filtering State ---
@@ -56,27 +59,39 @@ export default function AdvisorySystem() {
 
   // --- Data Fetching ---
 
-  const fetchAdvisories = useCallback(async () => {
-    // This function will now fetch the consolidated advisory from the backend
-    // It's only called when a client is selected, to match the new logic.
-    if (selectedClientId) {
-      try {
-        const response = await fetch(`http://localhost:5000/api/clients/${selectedClientId}/advisories`);
-        if (!response.ok) throw new Error('Failed to fetch advisories');
-        const data = await response.json();
+  const fetchAdvisories = useCallback(async (cursor = null) => {
+    // Summaries only, one page at a time; passing a cursor appends the next page
+    const base = selectedClientId
+      ? `http://localhost:5000/api/clients/${selectedClientId}/advisories`
+      : 'http://localhost:5000/api/advisories';
+    const url = cursor ? `${base}?cursor=${encodeURIComponent(cursor)}` : base;
+    try {
+      const response = await fetch(url);
+      if (!response.ok) throw new Error('Failed to fetch advisories');
+      const data = await response.json();
 
-        // The backend returns a single advisory in an array.
-        setAdvisories(data);
-      } catch (error) {
-        console.error("Error fetching advisories:", error);
+      setAdvisories(prev => (cursor ? [...prev, ...data] : data));
+      setNextCursor(response.headers.get('X-Next-Cursor'));
+      if (!cursor) setAdvisoryContent({});
+    } catch (error) {
+      console.error("Error fetching advisories:", error);
+      if (!cursor) {
         setAdvisories([]); // Clear advisories on error
+        setNextCursor(null);
       }
-    } else {
-      // If no client is selected, clear advisories
-      setAdvisories([]);
     }
   }, [selectedClientId]);
 
+  // The listing carries no advisory text; fetch one advisory's content when it's opened
+  const fetchAdvisoryContent = async (advisoryId) => {
+    if (advisoryContent[advisoryId] !== undefined) return advisoryContent[advisoryId];
+    const response = await fetch(`http://localhost:5000/api/advisories/${advisoryId}`);
+    if (!response.ok) throw new Error('Failed to fetch advisory');
+    const advisory = await response.json();
+    setAdvisoryContent(prev => ({ ...prev, [advisoryId]: advisory.advisory_content }));
+    return advisory.advisory_content;
+  };
+
   const [rssFeeds, setRssFeeds] = useState([]);
   const [newRssUrl, setNewRssUrl] = useState('');
   const [selectedTechStackId, setSelectedTechStackId] = useState('');
@@ -129,7 +144,7 @@ export default function AdvisorySystem() {
       try {
         const response = await fetch(`http://localhost:5000/api/clients/${selectedClientId}/feed-items`);
         const data = await response.json();
-        setRssItems(Array.isArray(data) ? data.map(item => ({ ...item, summary: stripHtml(item.summary) })) : []);
+        setRssItems(Array.isArray(data.items) ? data.items.map(item => ({ ...item, summary: stripHtml(item.summary) })) : []);
       } catch (error) {
         console.error("Error fetching RSS items:", error);
         setRssItems([]);
@@ -157,10 +172,16 @@ export default function AdvisorySystem() {
   }, []);
 
   // <<< NEW: Handlers for the Edit Advisory Modal >>>
-  const handleOpenEditModal = (advisory) => {
-    setEditingAdvisory(advisory);
-    setEditTextContent(advisory.advisory_content);
-    setShowEditModal(true);
+  const handleOpenEditModal = async (advisory) => {
+    try {
+      const content = await fetchAdvisoryContent(advisory.id);
+      setEditingAdvisory(advisory);
+      setEditTextContent(content);
+      setShowEditModal(true);
+    } catch (error) {
+      console.error("Error fetching advisory:", error);
+      alert(error.message);
+    }
   };
 
   const handleCloseEditModal = () => {
@@ -429,7 +450,8 @@ export default function AdvisorySystem() {
           content: advisory.content,
           // Assuming you have a way to link the advisory to the specific client-tech assignment
           // This ID needs to be part of the advisory object from the backend
-          clientTechMapId: advisory.client_tech_map_id
+          clientTechMapId: advisory.client_tech_map_id,
+          advisoryId: advisory.id
         }),
       });
 
@@ -501,7 +523,7 @@ export default function AdvisorySystem() {
               <option value="">-- Select Tech Stack --</option>
               {techStacks.map(stack => <option key={stack.id} value={stack.id}>{stack.name}</option>)}
             </select>
-            <input type="text" name="version" placeholder="Version (e.g., 22H2, 11.x, *)" value={newAdvisory.version} onChange={handleInputChange} required className="form-input" />
+            <input type="text" name="version" placeholder="Version (e.g., 22H2, 11.*, >= 7.0, < 7.2.3)" value={newAdvisory.version} onChange={handleInputChange} required className="form-input" />
             <select name="updateType" value={newAdvisory.updateType} onChange={handleInputChange} required className="form-input">
               <option value="">-- Select Update Type --</option>
               <option value="Security Patch">Security Patch</option>
@@ -536,7 +558,13 @@ export default function AdvisorySystem() {
           {advisories.map((advisory) => (
             <div key={advisory.id} className="advisory-card">
               <h3>{advisory.update_type}</h3>
-              <p>{advisory.advisory_content}</p>
+              {advisoryContent[advisory.id] !== undefined ? (
+                <p>{advisoryContent[advisory.id]}</p>
+              ) : (
+                <button onClick={() => fetchAdvisoryContent(advisory.id).catch(error => alert(error.message))} className="secondary-button">
+                  Show Content
+                </button>
+              )}
               {advisory.status === 'Draft' && (
                 <div className="flex justify-end mt-4">
                   <button onClick={() => handleOpenEditModal(advisory)} className="secondary-button">
@@ -555,6 +583,13 @@ export default function AdvisorySystem() {
           ))}
 
         </div>
+        {nextCursor && (
+          <div className="flex justify-center mt-6">
+            <button onClick={() => fetchAdvisories(nextCursor)} className="secondary-button">
+              Load More
+            </button>
+          </div>
+        )}
       </main>
 
       {/* Right Sidebar for RSS Feeds */}
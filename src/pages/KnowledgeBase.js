@@ -2,6 +2,9 @@ import React, { useState, useEffect, useRef } from "react";
 import { Search, Plus, Trash2 } from "lucide-react";
 import "../styles/KnowledgeBase.css";
 
+// Longest a KB import is polled before the page stops waiting for it
+const IMPORT_POLL_TIMEOUT_MS = 30 * 60 * 1000;
+
 const KnowledgeBase = () => {
   const [query, setQuery] = useState("");
   const [data, setData] = useState([]);
@@ -101,7 +104,32 @@ const KnowledgeBase = () => {
       });
       const result = await res.json();
       if (res.ok) {
-        alert("Import successful!");
+        // The import runs as a background job; poll until it finishes, gives up or stops reporting
+        let job = result;
+        const pollDeadline = Date.now() + IMPORT_POLL_TIMEOUT_MS;
+        while (["queued", "running"].includes(job.status)) {
+          if (Date.now() > pollDeadline) {
+            job = { status: "timed out", error: "no result after 30 minutes; check the import job later." };
+            break;
+          }
+          await new Promise((resolve) => setTimeout(resolve, 1000));
+          const jobRes = await fetch(`http://localhost:5000${result.status_url}`);
+          const body = await jobRes.json().catch(() => ({}));
+          if (!jobRes.ok) {
+            job = { status: "failed", error: body.error || `job status unavailable (HTTP ${jobRes.status})` };
+            break;
+          }
+          job = body;
+        }
+        if (job.status === "completed") {
+          alert(
+            job.rows_rejected
+              ? `Import finished: ${job.rows_inserted} rows imported, ${job.rows_rejected} rejected.`
+              : "Import successful!"
+          );
+        } else {
+          alert("Import " + (job.status || "ended with an unknown status") + ": " + (job.error || ""));
+        }
         fetchData();
       } else {
         alert("Import failed: " + result.message);
@@ -108,28 +108,19 @@ export default function OperationRunbook() {
 
   useEffect(() => {
     if (selectedClient) {
-      fetchAssetsAndEscalation(selectedClient);
-
-      fetch(`http://localhost:5000/api/get-client-pdf?clientId=${selectedClient}`)
+      // One request for everything on the page; the server caches it per client
+      fetch(`http://localhost:5000/api/clients/${selectedClient}/overview`)
         .then((res) => res.json())
         .then((data) => {
-          if (data.fileName) {
-            setClientPDF(data.fileName);
-          } else {
-            setClientPDF(null);
-          }
+          const safeAssets = Array.isArray(data.assets) ? data.assets : [];
+          setAssetData(safeAssets);
+          setFilteredAssets(safeAssets);
+          setEscalationData(Array.isArray(data.escalation_matrix) ? data.escalation_matrix : []);
+          setSlaData(data.sla || []);
+          setPasswords(data.passwords || []);
+          setClientPDF(data.pdf && data.pdf.fileName ? data.pdf.fileName : null);
         })
-        .catch(console.error);
-
-      fetch(`http://localhost:5000/api/sla?client=${selectedClient}`)
-        .then((res) => res.json())
-        .then((data) => setSlaData(data))
-        .catch((err) => console.error("SLA Fetch Error:", err));
-
-      fetch(`http://localhost:5000/api/passwords?client=${selectedClient}`)
-        .then((res) => res.json())
-        .then((data) => setPasswords(data))
-        .catch((err) => console.error("Password Fetch Error:", err));
+        .catch((err) => console.error("Client overview fetch error:", err));
     }
   }, [selectedClient]);
 
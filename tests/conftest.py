@@ -0,0 +1,74 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from flask import Flask
+
+import app.routes as routes
+
+
+@pytest.fixture
+def make_app_client(monkeypatch):
+    """A test client for the app's routes with ``db_connection`` replaced and no background threads."""
+    monkeypatch.setattr(routes, "warm_indexes", lambda: None)
+    monkeypatch.setattr(routes, "FEED_POLLER_ENABLED", False)
+    monkeypatch.setattr(routes, "MAIL_OUTBOX_ENABLED", False)
+    monkeypatch.setattr(routes, "MAIL_DIGEST_ENABLED", False)
+
+    def make(db_connection):
+        monkeypatch.setattr(routes, "db_connection", db_connection)
+        app = Flask(__name__)
+        routes.setup_routes(app)
+        return app.test_client()
+
+    return make
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Records each request on the server and answers with whatever its ``respond`` returns."""
+
+    def do_GET(self):
+        self._answer()
+
+    def do_POST(self):
+        self._answer()
+
+    def _answer(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.body = self.rfile.read(length) if length else b""
+        self.server.requests.append(self)
+        status, headers, payload = self.server.respond(self)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def http_stub():
+    """Start a local HTTP server answering with ``respond(handler) -> (status, headers, body)``.
+
+    The returned server has ``url`` and ``requests``, the handlers of the
+    requests it received in order.
+    """
+    servers = []
+
+    def serve(respond):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        server.daemon_threads = True
+        server.respond = respond
+        server.requests = []
+        server.url = f"http://127.0.0.1:{server.server_address[1]}"
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from app.feed_rules import CompiledRuleSet, DEFAULT_KEYWORDS
+
+# Keywords that are prefixes, suffixes or infixes of each other and of the cve-/cvss triggers
+OVERLAPPING_KEYWORDS = [
+    'cve', 'cve-', 'cvs', 'cvss', 'sec', 'security', 'insecure', 'patch', 'dispatch',
+    'ssl', 'openssl', 'open', 'abc', 'cde', 'bcd', 'update', 'date', 'exploit', 'loit',
+]
+
+
+def keywords(*patterns):
+    return CompiledRuleSet([{"rule_type": "keyword", "pattern": pattern} for pattern in patterns])
+
+
+def per_rule_matches(patterns, text):
+    """The original triage: one case-insensitive substring scan per keyword."""
+    lowered = text.lower()
+    return [pattern for pattern in patterns if pattern in lowered]
+
+
+@pytest.mark.parametrize("patterns, text, expected", [
+    (['cve'], "New CVE-2024-1234 found", ['cve']),
+    (['cvs'], "CVSS 9.8", ['cvs']),
+    (['sec', 'security'], "insecurity", ['sec', 'security']),
+    (['patch', 'dispatch'], "dispatch", ['patch', 'dispatch']),
+    (['ssl', 'openssl'], "openssl bug", ['ssl', 'openssl']),
+    (['abc', 'cde'], "abcde", ['abc', 'cde']),
+])
+def test_overlapping_keywords_all_match(patterns, text, expected):
+    assert keywords(*patterns).match(text)["matched_rules"] == expected
+
+
+def test_compiled_matcher_agrees_with_per_rule_scan():
+    rng = random.Random(13)
+    alphabet = "abcdeopnsluvtix -"
+    patterns = OVERLAPPING_KEYWORDS + DEFAULT_KEYWORDS
+    ruleset = keywords(*patterns)
+    fragments = patterns + ["CVE-2024-1234", "CVSS 9.8", "OpenSSL", "Dispatcher"]
+    for _ in range(2000):
+        pieces = [rng.choice(fragments) if rng.random() < 0.5
+                  else ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 6)))
+                  for _ in range(rng.randint(1, 8))]
+        text = ''.join(piece if rng.random() < 0.6 else piece.upper() for piece in pieces)
+        result = ruleset.match(text)
+        assert sorted(result["matched_rules"]) == sorted(per_rule_matches(patterns, text)), text
+        assert result["relevant"] == bool(per_rule_matches(patterns, text))
+
+
+def test_trigger_inside_keyword_still_extracts():
+    result = keywords('cve-2024', 'cvss score').match("cve-2024-1234 has CVSS score 9.8")
+    assert result["cve_ids"] == ['CVE-2024-1234']
+    assert result["cvss_score"] == 9.8
+    assert result["matched_rules"] == ['cve-2024', 'cvss score']
+
+
+def test_phrase_prefix_of_longer_literal_respects_word_boundaries():
+    ruleset = CompiledRuleSet([
+        {"rule_type": "phrase", "pattern": "remote code"},
+        {"rule_type": "keyword", "pattern": "remote code execution"},
+    ])
+    assert ruleset.match("Remote  code\nexecution")["matched_rules"] == ['remote code', 'remote code execution']
+    assert ruleset.match("remote code-execution")["matched_rules"] == ['remote code']
+    assert ruleset.match("remote codex")["matched_rules"] == []
@@ -0,0 +1,78 @@
+import pytest
+import requests
+
+from app import feeds
+from app.feeds import FeedCache, FeedTimeout, fetch_feed, fetch_feeds
+
+
+@pytest.mark.parametrize("error, status", [
+    (None, "ok"),
+    (FeedTimeout("Timed out after 10s"), "timeout"),
+    (requests.ReadTimeout("read timed out"), "timeout"),
+    (requests.ConnectionError("refused"), "failed"),
+    (ValueError("not a feed"), "failed"),
+])
+def test_fetch_status_distinguishes_timeouts(monkeypatch, error, status):
+    def fetch_feed(url, timeout, cache):
+        if error is not None:
+            raise error
+        return [{"title": "entry"}], "fetched"
+
+    monkeypatch.setattr(feeds, "fetch_feed", fetch_feed)
+    [(feed, entries, stats)] = list(fetch_feeds([{"url": "https://feeds.example/rss"}]))
+    assert stats["status"] == status
+    assert (entries is None) == (error is not None)
+
+
+RSS = (
+    b'<?xml version="1.0"?><rss version="2.0"><channel><title>Advisories</title>'
+    b'<item><title>CVE-2025-0001</title><link>https://feeds.example/1</link></item>'
+    b'</channel></rss>'
+)
+ETAG = '"v1"'
+LAST_MODIFIED = "Wed, 01 Oct 2025 00:00:00 GMT"
+
+
+def feed_origin(handler):
+    if handler.headers.get("If-None-Match") == ETAG:
+        return 304, {"ETag": ETAG}, b""
+    return 200, {"Content-Type": "application/rss+xml", "ETag": ETAG, "Last-Modified": LAST_MODIFIED}, RSS
+
+
+def test_feed_cache_serves_fresh_then_revalidates(http_stub):
+    server = http_stub(feed_origin)
+    cache = FeedCache(ttl=60, max_entries=10)
+    url = f"{server.url}/rss"
+
+    entries, outcome = fetch_feed(url, cache=cache)
+    assert outcome == "fetched"
+    assert [entry.title for entry in entries] == ["CVE-2025-0001"]
+    assert "If-None-Match" not in server.requests[0].headers
+
+    assert fetch_feed(url, cache=cache) == (entries, "fresh")
+    assert len(server.requests) == 1
+
+    cache.ttl = 0
+    assert fetch_feed(url, cache=cache) == (entries, "not_modified")
+    assert len(server.requests) == 2
+    assert server.requests[1].headers["If-None-Match"] == ETAG
+    assert server.requests[1].headers["If-Modified-Since"] == LAST_MODIFIED
+    stats = cache.stats()
+    assert (stats["fetched"], stats["fresh"], stats["not_modified"], stats["size"]) == (1, 1, 1, 1)
+
+
+def test_feed_cache_evicts_least_recently_used(http_stub):
+    server = http_stub(feed_origin)
+    cache = FeedCache(ttl=60, max_entries=2)
+    first, second, third = (f"{server.url}/{name}" for name in ("first", "second", "third"))
+
+    fetch_feed(first, cache=cache)
+    fetch_feed(second, cache=cache)
+    assert fetch_feed(first, cache=cache)[1] == "fresh"
+    fetch_feed(third, cache=cache)
+
+    assert cache.get(second) is None
+    assert cache.get(first) is not None and cache.get(third) is not None
+    assert cache.stats()["evictions"] == 1
+    assert fetch_feed(second, cache=cache)[1] == "fetched"
+    assert "If-None-Match" not in server.requests[-1].headers
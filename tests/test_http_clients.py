@@ -0,0 +1,28 @@
+import pytest
+
+from app.http_clients import BreakerSession, CircuitOpenError, GraphTokenProvider, HttpClient
+
+
+def test_breaker_session_requests_go_through_the_circuit_breaker(http_stub):
+    server = http_stub(lambda handler: (503, {}, b"unavailable"))
+    client = HttpClient("login-test")
+    client.breaker(server.url).failure_threshold = 2
+    session = BreakerSession(client)
+
+    assert session.get(f"{server.url}/token").status_code == 503
+    assert session.post(f"{server.url}/token", data={"grant_type": "client_credentials"}).status_code == 503
+    with pytest.raises(CircuitOpenError):
+        session.get(f"{server.url}/token")
+    assert len(server.requests) == 2
+
+
+def test_token_requests_fail_fast_while_the_login_circuit_is_open():
+    client = HttpClient("login-test")
+    breaker = client.breaker("https://login.microsoftonline.com")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+    provider = GraphTokenProvider("tenant", "client", "secret", ["https://graph.microsoft.com/.default"],
+                                  http_client=client)
+    with pytest.raises(CircuitOpenError):
+        provider()
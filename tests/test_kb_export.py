@@ -0,0 +1,50 @@
+import os
+import tempfile
+
+import pytest
+
+from app import kb_export
+
+
+@pytest.fixture
+def temp_files(monkeypatch, tmp_path):
+    """Directory the exporters' temporary files are created in."""
+    mkstemp = tempfile.mkstemp
+    monkeypatch.setattr(kb_export.tempfile, "mkstemp", lambda **kwargs: mkstemp(dir=str(tmp_path), **kwargs))
+    return tmp_path
+
+
+def test_failed_xlsx_save_leaves_no_temp_file(monkeypatch, temp_files):
+    openpyxl = pytest.importorskip("openpyxl")
+    save = openpyxl.Workbook.save
+
+    def save_then_fail(self, path):
+        save(self, path)
+        raise OSError("disk full")
+
+    monkeypatch.setattr(kb_export, "iter_kb_rows", lambda conn, fields, query='': iter([[{"id": 1, "location": "DC1"}]]))
+    monkeypatch.setattr(openpyxl.Workbook, "save", save_then_fail)
+    with pytest.raises(OSError):
+        kb_export.write_xlsx(None, ["location"])
+    assert list(temp_files.iterdir()) == []
+
+
+def test_failed_parquet_write_leaves_no_temp_file(monkeypatch, temp_files):
+    pytest.importorskip("pyarrow")
+
+    def rows_then_error(conn, fields, query=''):
+        yield [{"id": 1, "location": "DC1"}]
+        raise RuntimeError("connection lost mid-export")
+
+    monkeypatch.setattr(kb_export, "iter_kb_rows", rows_then_error)
+    with pytest.raises(RuntimeError):
+        kb_export.write_parquet(None, ["location"])
+    assert list(temp_files.iterdir()) == []
+
+
+def test_export_file_is_removed_after_streaming(tmp_path):
+    path = tmp_path / "kb-export-test.bin"
+    path.write_bytes(b"x" * 10)
+    assert b"".join(kb_export.iter_file(str(path))) == b"x" * 10
+    assert not os.path.exists(path)
+    kb_export.remove_file(str(path))
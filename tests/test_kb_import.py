@@ -0,0 +1,61 @@
+import io
+
+from app.kb_import import DATE_COLUMNS, import_knowledge_base
+from app.kb_index import KB_FIELDS
+
+
+class RecordingConnection:
+    """Accepts an upsert import against an empty knowledge_base, recording the rows written."""
+
+    def __init__(self):
+        self.written = []
+        self.result = []
+        self.rowcount = 0
+
+    def cursor(self, dictionary=False):
+        return self
+
+    def execute(self, sql, params=()):
+        if sql.startswith("SHOW INDEX"):
+            self.result = [{"Seq_in_index": 1}]
+        elif sql.startswith("SELECT COUNT(*)"):
+            self.result = [(0,)]
+        elif sql.startswith("INSERT INTO knowledge_base"):
+            rows = [params[start:start + len(KB_FIELDS)] for start in range(0, len(params), len(KB_FIELDS))]
+            self.written.extend(rows)
+            self.rowcount = len(rows)
+
+    def fetchall(self):
+        return self.result
+
+    def fetchone(self):
+        return self.result[0]
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_upsert_skips_keys_seen_in_earlier_chunks():
+    serials = ["A", "B", "A", "C", "", "B", "", "C"]
+    lines = [",".join(KB_FIELDS)]
+    for number, serial in enumerate(serials, 1):
+        values = {field: "2030-01-01" if field in DATE_COLUMNS else f"{field} {number}" for field in KB_FIELDS}
+        lines.append(",".join(dict(values, serial_number=serial)[field] for field in KB_FIELDS))
+    conn = RecordingConnection()
+
+    report = import_knowledge_base(conn, io.StringIO("\n".join(lines)), "kb.csv", chunksize=2,
+                                   mode="upsert", key="serial_number")
+
+    serial_position = KB_FIELDS.index("serial_number")
+    location_position = KB_FIELDS.index("location")
+    assert [(row[serial_position], row[location_position]) for row in conn.written] == [
+        ("A", "location 1"), ("B", "location 2"), ("C", "location 4"), (None, "location 5"), (None, "location 7"),
+    ]
+    assert report["duplicates_in_file"] == 3
+    assert report["inserted"] == 5 and report["rows_parsed"] == 8
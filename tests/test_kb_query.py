@@ -0,0 +1,55 @@
+import re
+
+import pytest
+
+from app import kb_query
+from app.kb_query import iter_kb_rows
+
+
+class FakeIndex:
+    def __init__(self, ids):
+        self.ids = ids
+
+    def ensure_current(self, conn):
+        pass
+
+    def search(self, query):
+        return list(self.ids)
+
+
+class KnowledgeBase:
+    """Answers ``WHERE id IN (...)`` for the rows that still exist."""
+
+    def __init__(self, ids):
+        self.ids = set(ids)
+        self.rows = []
+
+    def cursor(self, dictionary=False):
+        return self
+
+    def execute(self, sql, params=()):
+        assert re.search(r"WHERE id IN \(", sql)
+        self.rows = [{"id": row_id, "title": f"entry {row_id}"} for row_id in params if row_id in self.ids]
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def close(self):
+        pass
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 1000])
+def test_page_skips_rows_deleted_since_the_index_was_built(monkeypatch, chunk_size):
+    indexed = list(range(1, 21))
+    monkeypatch.setattr(kb_query, "kb_index", FakeIndex(indexed))
+    conn = KnowledgeBase(row_id for row_id in indexed if row_id % 4)
+
+    def page(after_id):
+        return [row["id"] for chunk in iter_kb_rows(conn, ["title"], "vpn", after_id=after_id, limit=6,
+                                                    chunk_size=chunk_size)
+                for row in chunk]
+
+    assert page(None) == [1, 2, 3, 5, 6, 7]
+    assert page(7) == [9, 10, 11, 13, 14, 15]
+    assert page(15) == [17, 18, 19]
@@ -0,0 +1,145 @@
+import re
+from contextlib import contextmanager
+
+import pytest
+
+from app.client_overview import load_client_overview
+from app.loaders import load_related, attach_related
+
+CONTACTS_QUERY = (
+    "SELECT id, client_tech_map_id, email FROM client_tech_contacts "
+    "WHERE client_tech_map_id IN ({keys}) ORDER BY id"
+)
+
+
+class FakeDatabase:
+    """Clients, each with ``size`` tech map rows of two contacts; records every statement executed."""
+
+    def __init__(self, size):
+        self.clients = [{"id": client_id, "name": f"client {client_id}"} for client_id in range(1, size + 1)]
+        self.maps = [
+            {"id": client_id * 1000 + index, "client_id": client_id, "tech_stack_name": f"stack {index}",
+             "version": "1.0"}
+            for client_id in range(1, size + 1) for index in range(size)
+        ]
+        self.contacts = [
+            {"id": tech_map["id"] * 10 + index, "client_tech_map_id": tech_map["id"],
+             "email": f"c{index}@{tech_map['id']}.example"}
+            for tech_map in self.maps for index in range(2)
+        ]
+        self.statements = []
+
+    def rows_for(self, sql, params):
+        if "FROM client_tech_contacts" in sql:
+            keys = set(params)
+            return [dict(row) for row in self.contacts if row["client_tech_map_id"] in keys]
+        if "FROM client_tech_map" in sql:
+            return [{key: row[key] for key in ("id", "tech_stack_name", "version")}
+                    for row in self.maps if row["client_id"] == params[0]]
+        if re.search(r"FROM clients\b", sql):
+            if params:
+                return [dict(row) for row in self.clients if row["id"] == params[0]]
+            return [dict(row) for row in self.clients]
+        return []
+
+    @contextmanager
+    def connection(self):
+        yield FakeConnection(self)
+
+
+class FakeConnection:
+    def __init__(self, database):
+        self.database = database
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self.database, dictionary)
+
+    def commit(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, database, dictionary):
+        self.database = database
+        self.dictionary = dictionary
+        self.rows = []
+
+    def execute(self, sql, params=()):
+        self.database.statements.append(sql)
+        self.rows = self.database.rows_for(sql, tuple(params or ()))
+        if not self.dictionary:
+            self.rows = [tuple(row.values()) for row in self.rows]
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def make_client(make_app_client):
+    """A test client for the app's routes backed by a FakeDatabase of the given size."""
+    def make(size):
+        database = FakeDatabase(size)
+        return make_app_client(database.connection), database
+
+    return make
+
+
+@pytest.mark.parametrize("size", [1, 10, 200])
+def test_client_tech_contacts_are_one_batched_query(make_client, size):
+    client, database = make_client(size)
+    assert client.get("/api/clients/1/tech").status_code == 200
+    [contacts_query] = [sql for sql in database.statements if "FROM client_tech_contacts" in sql]
+    assert contacts_query.count("%s") == size
+
+
+@pytest.mark.parametrize("size", [1, 10, 200])
+def test_client_tech_map_with_contacts_is_two_queries(make_client, size):
+    client, database = make_client(size)
+    response = client.get("/api/clients/1/tech")
+    assert response.status_code == 200
+    tech = response.get_json()
+    assert len(tech) == size
+    assert all(len(row["contacts"]) == 2 for row in tech)
+    assert all("client_tech_map_id" not in contact for row in tech for contact in row["contacts"])
+    assert len(database.statements) == 2
+
+
+def overview_statements(size, pdf_dir):
+    database = FakeDatabase(size)
+    with database.connection() as conn:
+        overview = load_client_overview(conn, 1, pdf_dir)
+    assert len(overview["tech"]) == size
+    assert all(len(row["contacts"]) == 2 for row in overview["tech"])
+    return len(database.statements)
+
+
+@pytest.mark.parametrize("size", [10, 200])
+def test_client_overview_query_count_is_constant(tmp_path, size):
+    assert overview_statements(size, str(tmp_path)) == overview_statements(1, str(tmp_path))
+
+
+@pytest.mark.parametrize("parents, batch_size, queries", [(0, 1000, 0), (1, 1000, 1), (2500, 1000, 3)])
+def test_load_related_batches_keys(parents, batch_size, queries):
+    database = FakeDatabase(0)
+    database.contacts = [{"id": key, "client_tech_map_id": key, "email": f"{key}@example"} for key in range(parents)]
+    cursor = FakeCursor(database, dictionary=True)
+    grouped = load_related(cursor, CONTACTS_QUERY, "client_tech_map_id", list(range(parents)) * 2,
+                           batch_size=batch_size)
+    assert len(database.statements) == queries
+    assert sorted(grouped) == list(range(parents))
+
+
+def test_attach_related_gives_childless_parents_an_empty_list():
+    database = FakeDatabase(0)
+    database.contacts = [{"id": 1, "client_tech_map_id": 7, "email": "a@example"}]
+    parents = attach_related(FakeCursor(database, dictionary=True), [{"id": 7}, {"id": 8}], "contacts",
+                             CONTACTS_QUERY, "client_tech_map_id")
+    assert parents == [{"id": 7, "contacts": [{"id": 1, "email": "a@example"}]}, {"id": 8, "contacts": []}]
+    assert len(database.statements) == 1
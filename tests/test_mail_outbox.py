@@ -0,0 +1,115 @@
+import json
+from contextlib import contextmanager
+
+import pytest
+
+from app import mail_outbox as outbox
+from app.http_clients import CircuitOpenError, HttpClient
+from app.mail_outbox import DeliveryResult, GraphMailSender, MailOutbox
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.statements = []
+
+    def cursor(self, dictionary=False):
+        return self
+
+    def execute(self, sql, params=()):
+        self.statements.append((" ".join(sql.split()), params))
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class StubSender:
+    def __init__(self, result):
+        self.result = result
+
+    def send(self, subject, body, recipients):
+        return self.result
+
+
+@pytest.fixture
+def connection(monkeypatch):
+    conn = RecordingConnection()
+
+    @contextmanager
+    def db_connection():
+        yield conn
+
+    monkeypatch.setattr(outbox, "db_connection", db_connection)
+    return conn
+
+
+JOB = {"id": 5, "claim_token": "abc", "subject": "s", "body": "b", "recipients": ["a@example"],
+       "attempts": outbox.MAIL_MAX_ATTEMPTS}
+
+
+def deliver(result, sender=None, job=JOB):
+    mail = MailOutbox(workers=0)
+    mail.sender = sender or StubSender(result)
+    mail._deliver(dict(job))
+
+
+def test_circuit_open_is_deferred_without_using_an_attempt(connection):
+    deliver(DeliveryResult(None, 42.5, "Circuit open for graph; retry in 43s", deferred=True))
+    [(sql, params)] = connection.statements
+    assert "status = 'pending'" in sql and "attempts = attempts - 1" in sql
+    assert params == ("Circuit open for graph; retry in 43s", 43, 5, "abc")
+
+
+def test_out_of_attempts_fails_the_message(connection):
+    deliver(DeliveryResult(503, None, "unavailable"))
+    [(sql, params)] = connection.statements
+    assert "status = 'failed'" in sql
+
+
+@pytest.mark.parametrize("result", [
+    DeliveryResult(202, None, None),
+    DeliveryResult(503, None, "unavailable"),
+    DeliveryResult(None, 10.0, "circuit open", deferred=True),
+])
+def test_results_are_written_only_under_the_workers_claim(connection, result):
+    deliver(result)
+    [(sql, params)] = connection.statements
+    assert sql.endswith("WHERE id = %s AND claim_token = %s")
+    assert params[-2:] == (5, "abc")
+
+
+def test_sender_reports_open_circuit_as_deferred():
+    class OpenCircuit:
+        timeout = (1, 1)
+
+        def post(self, url, **kwargs):
+            raise CircuitOpenError("graph", 30.0)
+
+    result = GraphMailSender(lambda: "token", endpoint="http://graph.test", sender="soc@example",
+                             http_client=OpenCircuit()).send("s", "b", ["a@example"])
+    assert result.deferred and result.retry_after == 30.0
+
+
+def test_throttled_send_is_rescheduled_for_retry_after_then_sent(connection, http_stub):
+    responses = iter([(429, {"Retry-After": "3600"}, b'{"error": {"code": "TooManyRequests"}}'), (202, {}, b"")])
+    graph = http_stub(lambda handler: next(responses))
+    sender = GraphMailSender(lambda: "token", endpoint=graph.url, sender="soc@example",
+                             http_client=HttpClient("graph-test"))
+    job = dict(JOB, attempts=1)
+
+    deliver(None, sender, job)
+    [(sql, params)] = connection.statements
+    assert "status = 'pending'" in sql and "attempts = attempts - 1" not in sql
+    assert params[0] == 429 and params[2] >= 3600
+
+    deliver(None, sender, job)
+    sql, params = connection.statements[-1]
+    assert "status = 'sent'" in sql and params == (202, 5, "abc")
+
+    first, second = graph.requests
+    assert first.path == second.path == "/users/soc@example/sendMail"
+    assert first.headers["Authorization"] == "Bearer token"
+    message = json.loads(second.body)["message"]
+    assert message["toRecipients"] == [{"emailAddress": {"address": "a@example"}}]
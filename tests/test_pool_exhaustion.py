@@ -0,0 +1,29 @@
+from contextlib import contextmanager
+
+import pytest
+
+from app.db import PoolExhaustedError
+
+
+@contextmanager
+def exhausted():
+    raise PoolExhaustedError("No database connection available within 5.0s (pool size 10)")
+    yield
+
+
+@pytest.fixture
+def client(make_app_client):
+    return make_app_client(exhausted)
+
+
+@pytest.mark.parametrize("method, path", [
+    ("get", "/api/shifts/1/notes"),
+    ("get", "/api/clients/1/advisories"),
+    ("get", "/api/clients/1/feed-items"),
+    ("delete", "/api/client-tech/1"),
+])
+def test_pool_exhaustion_is_503_with_retry_after(client, method, path):
+    response = getattr(client, method)(path)
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    assert "No database connection" in response.get_json()["error"]